@@ -0,0 +1,351 @@
+"""
+Archive segmentée (ajout seul) des tirages finalisés, prédictions et résolutions.
+Les enregistrements JSON (une ligne chacun) sont mis en file depuis le chemin
+de traitement puis écrits par un thread dédié : vidage périodique du tampon,
+fsync périodique. Un segment est clos à chaque changement de jour ou après
+`max_records` enregistrements, puis compressé par blocs gzip indépendants.
+Un index (.idx.json) donne, pour chaque bloc, sa plage de numéros de jeu et
+sa position : une plage de jeux se lit sans décompresser tout le segment.
+"""
+
+import os
+import re
+import gzip
+import time
+import queue
+import atexit
+import logging
+import threading
+from typing import Dict, Iterator, List, Optional, Set
+
+import json_codec
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = '.jsonl'
+COMPRESSED_SUFFIX = '.jsonl.gz'
+INDEX_SUFFIX = '.idx.json'
+
+# Nom de segment : <AAAAMMJJ>-<pid>-<séquence>.jsonl
+_SEGMENT_NAME = re.compile(r'^(\d{8})-(\d+)-(\d{4})\.jsonl$')
+
+_STOP = object()  # Fin de l'écrivain (close)
+
+
+def compress_segment(path: str, block_records: int = 1000, games: Optional[List[Optional[int]]] = None) -> Dict:
+    """Compresse un segment en blocs gzip concaténés et écrit son index ; supprime l'original.
+
+    `games` (numéro de jeu de chaque ligne, connu de l'écrivain) évite de relire le JSON.
+    """
+    base = path[:-len(SEGMENT_SUFFIX)]
+    blocks: List[Dict] = []
+    records = 0
+
+    with open(path, 'rb') as source, open(base + COMPRESSED_SUFFIX, 'wb') as target:
+        lines: List[bytes] = []
+        block_games: List[int] = []
+
+        def write_block():
+            payload = gzip.compress(b''.join(lines), compresslevel=6)
+            blocks.append({
+                'offset': target.tell(), 'length': len(payload), 'records': len(lines),
+                'min_game': min(block_games) if block_games else None,
+                'max_game': max(block_games) if block_games else None,
+            })
+            target.write(payload)
+
+        for line_number, line in enumerate(source):
+            if not line.endswith(b'\n'):
+                break  # Dernière ligne tronquée (arrêt brutal) : ignorée
+            if games is not None and line_number < len(games):
+                game = games[line_number]
+            else:
+                try:
+                    game = json_codec.loads(line).get('game')
+                except ValueError:
+                    continue
+            lines.append(line)
+            if isinstance(game, int):
+                block_games.append(game)
+            records += 1
+            if len(lines) >= block_records:
+                write_block()
+                lines, block_games = [], []
+        if lines:
+            write_block()
+        target.flush()
+        os.fsync(target.fileno())
+
+    game_bounds = [block['min_game'] for block in blocks if block['min_game'] is not None]
+    index = {
+        'segment': os.path.basename(base + COMPRESSED_SUFFIX),
+        'records': records,
+        'min_game': min(game_bounds) if game_bounds else None,
+        'max_game': max(block['max_game'] for block in blocks if block['max_game'] is not None) if game_bounds else None,
+        'blocks': blocks,
+    }
+    temporary = base + INDEX_SUFFIX + '.tmp'
+    with open(temporary, 'wb') as handle:
+        handle.write(json_codec.dumps(index))
+    os.replace(temporary, base + INDEX_SUFFIX)
+    os.remove(path)
+    return index
+
+
+def _overlaps(low: Optional[int], high: Optional[int], first_game: Optional[int], last_game: Optional[int]) -> bool:
+    if low is None or high is None:
+        return first_game is None and last_game is None
+    return (first_game is None or high >= first_game) and (last_game is None or low <= last_game)
+
+
+def read_range(directory: str, first_game: Optional[int] = None, last_game: Optional[int] = None,
+               kinds: Optional[set] = None) -> Iterator[Dict]:
+    """Enregistrements dont le jeu est dans [first_game, last_game], segment par segment.
+
+    Les segments compressés ne sont lus que sur les blocs dont la plage indexée
+    recoupe la demande ; les segments encore actifs sont lus en entier.
+    """
+    if not os.path.isdir(directory):
+        return
+    names = sorted(os.listdir(directory))
+
+    def wanted(record: Dict) -> bool:
+        game = record.get('game')
+        if kinds and record.get('kind') not in kinds:
+            return False
+        if first_game is not None and (game is None or game < first_game):
+            return False
+        if last_game is not None and (game is None or game > last_game):
+            return False
+        return True
+
+    def read_indexed(index_path: str) -> Iterator[Dict]:
+        with open(index_path, 'rb') as handle:
+            index = json_codec.loads(handle.read())
+        if not _overlaps(index['min_game'], index['max_game'], first_game, last_game):
+            return
+        with open(os.path.join(directory, index['segment']), 'rb') as segment:
+            for block in index['blocks']:
+                if not _overlaps(block['min_game'], block['max_game'], first_game, last_game):
+                    continue
+                segment.seek(block['offset'])
+                for line in gzip.decompress(segment.read(block['length'])).splitlines():
+                    record = json_codec.loads(line)
+                    if wanted(record):
+                        yield record
+
+    listed = set(names)
+    for name in names:
+        path = os.path.join(directory, name)
+        if name.endswith(INDEX_SUFFIX):
+            yield from read_indexed(path)
+        elif _SEGMENT_NAME.match(name):
+            index_name = name[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX
+            if index_name in listed:
+                continue  # Compression terminée entre deux étapes : déjà lu via l'index
+            try:
+                handle = open(path, 'rb')
+            except FileNotFoundError:
+                # Segment compressé depuis le listage (rotation, récupération)
+                yield from read_indexed(os.path.join(directory, index_name))
+                continue
+            with handle:
+                for line in handle:
+                    if not line.endswith(b'\n'):
+                        break
+                    record = json_codec.loads(line)
+                    if wanted(record):
+                        yield record
+
+
+class DrawArchive:
+    """Écriture en arrière-plan de l'archive (un segment actif par processus)."""
+
+    def __init__(self, directory: str, max_records: int = 50000, flush_interval: float = 1.0,
+                 fsync_interval: float = 5.0, block_records: int = 1000, queue_size: int = 100000,
+                 block_when_full: bool = False, clock=time.time):
+        self.directory = directory
+        self.max_records = max_records
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.block_records = block_records
+        self.block_when_full = block_when_full  # Import en masse : attendre plutôt qu'abandonner
+        self.clock = clock
+
+        self._queue: 'queue.Queue' = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()  # Écrivain et close() (atexit) ne se chevauchent pas
+        self._writer: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._handle = None
+        self._segment_path: Optional[str] = None
+        self._opened_segments: Set[str] = set()  # Segments ouverts par cette instance (jamais orphelins)
+        self._segment_day: Optional[str] = None
+        self._segment_records = 0
+        self._segment_games: List[Optional[int]] = []
+        self._sequence = 0
+        self._day_start, self._day = 0.0, ''
+
+    # --- Chemin chaud ---
+
+    def record(self, kind: str, game: Optional[int], **fields) -> Dict:
+        record = {'kind': kind, 'game': game, 'ts': round(self.clock(), 3)}
+        record.update(fields)
+        return record
+
+    def append(self, kind: str, game: Optional[int], **fields):
+        """Met un enregistrement en file (sans E/S) ; abandonné si la file est pleine, sauf block_when_full."""
+        self._put(self.record(kind, game, **fields))
+
+    def extend(self, records: List[Dict]):
+        """Met en file un lot d'enregistrements construits par record() (import en masse)."""
+        if records:
+            self._put(records)
+
+    def _put(self, item):
+        self._ensure_writer()
+        try:
+            self._queue.put(item, block=self.block_when_full)
+        except queue.Full:
+            metrics.incr('archive_dropped', len(item) if isinstance(item, list) else 1)
+
+    def _ensure_writer(self):
+        # Thread démarré au premier ajout, et redémarré après un fork (workers Gunicorn)
+        pid = os.getpid()
+        if self._pid == pid and self._writer is not None:
+            return
+        with self._lock:
+            if self._pid == pid and self._writer is not None:
+                return
+            self._pid = pid
+            self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._io_lock = threading.Lock()
+            self._handle = None
+            os.makedirs(self.directory, exist_ok=True)
+            self._writer = threading.Thread(target=self._write_loop, name='draw-archive', daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
+
+    # --- Thread d'écriture ---
+
+    def _write_loop(self):
+        self._recover_orphans()
+        last_flush = last_fsync = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                return
+
+            with self._io_lock:
+                if item is not None:
+                    self._write_item(item)
+
+                now = time.monotonic()
+                if self._handle is not None and now - last_flush >= self.flush_interval:
+                    self._handle.flush()
+                    last_flush = now
+                    if now - last_fsync >= self.fsync_interval:
+                        os.fsync(self._handle.fileno())
+                        last_fsync = now
+
+    def _write_item(self, item):
+        records = item if isinstance(item, list) else (item,)
+        try:
+            for record in records:
+                self._write(record)
+            metrics.incr('archive_records', len(records))
+        except Exception as e:
+            logger.error(f"❌ Écriture de l'archive impossible : {e}")
+            metrics.incr('archive_errors')
+
+    def _write(self, record: Dict):
+        ts = record['ts']
+        if not self._day_start <= ts < self._day_start + 86400:
+            self._day_start = ts - ts % 86400  # Minuit UTC
+            self._day = time.strftime('%Y%m%d', time.gmtime(ts))
+        day = self._day
+        if self._handle is not None and (day != self._segment_day or self._segment_records >= self.max_records):
+            self._rotate()
+        if self._handle is None:
+            self._open_segment(day)
+        self._handle.write(json_codec.dumps(record) + b'\n')
+        self._segment_games.append(record.get('game'))
+        self._segment_records += 1
+
+    def _open_segment(self, day: str):
+        while True:
+            self._sequence += 1
+            path = os.path.join(self.directory, f"{day}-{self._pid}-{self._sequence:04d}{SEGMENT_SUFFIX}")
+            if not os.path.exists(path) and not os.path.exists(path[:-len(SEGMENT_SUFFIX)] + COMPRESSED_SUFFIX):
+                break
+        self._opened_segments.add(path)
+        self._handle = open(path, 'ab', buffering=1 << 16)
+        self._segment_path, self._segment_day, self._segment_records = path, day, 0
+        self._segment_games = []
+
+    def _rotate(self):
+        handle, path = self._handle, self._segment_path
+        self._handle, self._segment_path = None, None
+        handle.flush()
+        os.fsync(handle.fileno())
+        handle.close()
+        index = compress_segment(path, self.block_records, self._segment_games)
+        metrics.incr('archive_segments_rotated')
+        logger.info(f"🗄️ Segment d'archive clos : {index['segment']} ({index['records']} enregistrements)")
+
+    def _recover_orphans(self):
+        """Compresse les segments laissés actifs par des processus arrêtés.
+        Un segment à notre pid vient d'une exécution précédente (conteneur redémarré avec le
+        même pid, souvent 1) s'il n'a pas été ouvert par cette instance."""
+        pid = os.getpid()
+        for name in sorted(os.listdir(self.directory)):
+            match = _SEGMENT_NAME.match(name)
+            path = os.path.join(self.directory, name)
+            if not match or path in self._opened_segments:
+                continue
+            owner = int(match.group(2))
+            if owner != pid and _process_alive(owner):
+                continue
+            try:
+                compress_segment(path, self.block_records)
+            except Exception as e:
+                logger.error(f"❌ Récupération du segment {name} impossible : {e}")
+
+    def close(self):
+        """Arrête l'écrivain après la file courante et synchronise le segment actif (arrêt du processus)."""
+        if self._pid != os.getpid() or self._writer is None or not self._writer.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._writer.join(timeout=30)
+        with self._io_lock:
+            if self._handle is not None:
+                self._handle.flush()
+                os.fsync(self._handle.fileno())
+
+
+class NullArchive:
+    """Archive désactivée (ARCHIVE_DIR vide)."""
+
+    def append(self, kind: str, game: Optional[int], **fields):
+        pass
+
+    def close(self):
+        pass
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def build_archive(directory: Optional[str], **options):
+    return DrawArchive(directory, **options) if directory else NullArchive()
@@ -3,54 +3,96 @@ Implémentation de l'interaction avec l'API Telegram (Webhook et requêtes).
 """
 import os
 import time
-import json
+import threading
 import requests
 import logging
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Union
+
+import json_codec
+from flight_recorder import span
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_API_BASE = "https://api.telegram.org"
+_JSON_HEADERS = {'Content-Type': 'application/json'}
+
 class TelegramBot:
     """Gère les requêtes API Telegram."""
 
-    def __init__(self, token: str):
-        self.api_url = f"https://api.telegram.org/bot{token}/"
+    def __init__(self, token: str, api_base: Optional[str] = None):
+        # api_base permet de viser un faux serveur local (tests de charge)
+        self.api_base = (api_base or DEFAULT_API_BASE).rstrip('/')
+        self.api_url = f"{self.api_base}/bot{token}/"
         self.token = token
+        self.session = requests.Session()  # Connexions HTTP réutilisées
+        self._errors = threading.local()  # Dernière erreur API, par thread (boîte d'envoi)
+
+    def last_error(self) -> Optional[Dict]:
+        """Dernière erreur de l'appel API précédent dans ce thread (None s'il a réussi).
+        Clés : error_code (None si pas de réponse HTTP), description, retry_after.
+        """
+        return getattr(self._errors, 'error', None)
+
+    def _set_error(self, error_code: Optional[int], description: str, parameters: Optional[Dict] = None):
+        self._errors.error = {
+            'error_code': error_code, 'description': description,
+            'retry_after': (parameters or {}).get('retry_after'),
+        }
 
     def _request(self, method: str, data: Optional[Dict] = None) -> Optional[Dict]:
-        """Méthode générique pour envoyer une requête à l'API Telegram."""
+        """Méthode générique pour envoyer une requête à l'API Telegram (étape telegram.<méthode> de la trace)."""
+        with span(f"telegram.{method}") as attrs:
+            result = self._post(method, data)
+            error = self.last_error()
+            if error is not None:
+                attrs['error'] = error['description'][:200]
+            return result
+
+    def _post(self, method: str, data: Optional[Dict] = None) -> Optional[Dict]:
         url = self.api_url + method
+        self._errors.error = None
         try:
             if not self.token:
+                 self._set_error(None, "BOT_TOKEN non configuré")
                  return None
-            response = requests.post(url, json=data, timeout=30)
+            response = self.session.post(
+                url, data=json_codec.dumps(data or {}), headers=_JSON_HEADERS, timeout=30
+            )
             response.raise_for_status()
-            result = response.json()
+            result = json_codec.loads(response.content)
             
             # Vérifier si l'API Telegram a retourné ok=false
             if not result.get('ok'):
                 logger.error(f"❌ API Telegram a retourné ok=false pour {method}")
                 logger.error(f"Description: {result.get('description', 'Aucune description')}")
                 logger.error(f"Données envoyées: {data}")
+                self._set_error(result.get('error_code'), result.get('description', ''), result.get('parameters'))
             
             return result
         except requests.exceptions.RequestException as e:
             logger.error(f"❌ Erreur API Telegram ({method}): {e}")
+            self._set_error(None, str(e))
             if hasattr(e, 'response') and e.response is not None:
                 try:
                     error_detail = e.response.json()
                     logger.error(f"Détails de l'erreur: {error_detail}")
+                    self._set_error(e.response.status_code, error_detail.get('description', str(e)),
+                                    error_detail.get('parameters'))
                 except:
                     logger.error(f"Réponse brute: {e.response.text}")
+                    self._set_error(e.response.status_code, str(e))
             return None
 
-    def set_webhook(self, webhook_url: str) -> bool:
+    def set_webhook(self, webhook_url: str, secret_token: Optional[str] = None) -> bool:
         """Configure l'URL du Webhook."""
         # drop_pending_updates=True résout l'erreur 409 Conflict en supprimant l'ancien Webhook
         data = {
             'url': webhook_url,
             'drop_pending_updates': True
         }
+        if secret_token:
+            # Renvoyé par Telegram dans l'en-tête X-Telegram-Bot-Api-Secret-Token
+            data['secret_token'] = secret_token
         result = self._request('setWebhook', data)
         if result and result.get('ok'):
             logger.info(f"✅ Webhook configuré : {webhook_url}")
@@ -70,9 +112,16 @@ class TelegramBot:
             logger.error(f"❌ Échec de la suppression du Webhook. Réponse : {result}")
             return False
 
+    def get_webhook_info(self) -> Optional[Dict]:
+        """Retourne l'état du Webhook côté Telegram (URL, updates en attente, dernière erreur)."""
+        result = self._request('getWebhookInfo')
+        if result and result.get('ok'):
+            return result.get('result', {})
+        return None
+
     # --- Méthodes API ---
 
-    def send_message(self, chat_id, text: str, parse_mode: Optional[str] = None, reply_markup: Optional[Dict] = None) -> Optional[int]:
+    def send_message(self, chat_id, text: str, parse_mode: Optional[str] = None, reply_markup: Optional[Union[Dict, str]] = None) -> Optional[int]:
         data = {
             'chat_id': chat_id,
             'text': text
@@ -80,14 +129,15 @@ class TelegramBot:
         if parse_mode:
             data['parse_mode'] = parse_mode
         if reply_markup:
-            data['reply_markup'] = json.dumps(reply_markup)
+            # Objet imbriqué dans le corps JSON, ou chaîne déjà sérialisée (claviers statiques)
+            data['reply_markup'] = reply_markup
 
         result = self._request('sendMessage', data)
         if result and result.get('ok') and 'result' in result:
             return result['result'].get('message_id')
         return None
 
-    def edit_message_text(self, chat_id, message_id: int, text: str, parse_mode: Optional[str] = None, reply_markup: Optional[Dict] = None):
+    def edit_message_text(self, chat_id, message_id: int, text: str, parse_mode: Optional[str] = None, reply_markup: Optional[Union[Dict, str]] = None) -> bool:
         data = {
             'chat_id': chat_id,
             'message_id': message_id,
@@ -96,9 +146,11 @@ class TelegramBot:
         if parse_mode:
             data['parse_mode'] = parse_mode
         if reply_markup:
-            data['reply_markup'] = json.dumps(reply_markup)
+            # Objet imbriqué dans le corps JSON, ou chaîne déjà sérialisée (claviers statiques)
+            data['reply_markup'] = reply_markup
 
-        self._request('editMessageText', data)
+        result = self._request('editMessageText', data)
+        return bool(result and result.get('ok'))
 
     def answer_callback_query(self, callback_query_id: str, text: str = ""):
         data = {
@@ -120,7 +172,7 @@ class TelegramBot:
                 files = {'document': (os.path.basename(file_path), file, 'application/zip')}
                 data = {'chat_id': chat_id}
                 logger.info(f"📤 Envoi du fichier {file_path}...")
-                response = requests.post(url, data=data, files=files, timeout=120)
+                response = self.session.post(url, data=data, files=files, timeout=120)
                 
                 if response.status_code == 200:
                     result = response.json()
@@ -139,6 +191,28 @@ class TelegramBot:
             logger.error(traceback.format_exc())
             return False
 
+    def send_document_bytes(self, chat_id, filename: str, payload: bytes, mime_type: str = 'application/zip') -> bool:
+        """Envoie un document déjà en mémoire, en flux multipart (sans recopier le contenu)."""
+        url = f"{self.api_url}sendDocument"
+        body = _MultipartStream({'chat_id': str(chat_id)}, 'document', filename, payload, mime_type)
+
+        try:
+            logger.info(f"📤 Envoi du document {filename} ({len(payload) / 1024:.1f} KB)...")
+            with span('telegram.sendDocument', bytes=len(payload)):
+                response = self.session.post(
+                    url, data=body, headers={'Content-Type': body.content_type, 'Content-Length': str(len(body))},
+                    timeout=120
+                )
+            result = response.json() if response.status_code == 200 else None
+            if result and result.get('ok'):
+                logger.info(f"✅ Document {filename} envoyé avec succès")
+                return True
+            logger.error(f"❌ HTTP {response.status_code}: {response.text[:500]}")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Exception lors de l'envoi du document: {e}")
+            return False
+
     def get_updates(self, offset: Optional[int] = None, timeout: int = 30) -> List[Dict]:
         """Récupère les mises à jour via polling (long polling)."""
         data = {
@@ -151,4 +225,45 @@ class TelegramBot:
         result = self._request('getUpdates', data)
         if result and result.get('ok'):
             return result.get('result', [])
-        return []
\ No newline at end of file
+        return []
+
+
+class _MultipartStream:
+    """Corps multipart/form-data lu par morceaux : le contenu du fichier n'est jamais recopié."""
+
+    def __init__(self, fields: Dict[str, str], file_field: str, filename: str, payload: bytes, mime_type: str):
+        boundary = os.urandom(16).hex()
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+
+        head = b''.join(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+            for name, value in fields.items()
+        )
+        head += (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+            f'Content-Type: {mime_type}\r\n\r\n'
+        ).encode()
+        tail = f'\r\n--{boundary}--\r\n'.encode()
+
+        self._parts = [memoryview(head), memoryview(payload), memoryview(tail)]
+        self._length = sum(len(part) for part in self._parts)
+        self._index = 0
+        self._offset = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self._length
+        chunks = []
+        while size > 0 and self._index < len(self._parts):
+            part = self._parts[self._index]
+            chunk = part[self._offset:self._offset + size]
+            chunks.append(bytes(chunk))
+            size -= len(chunk)
+            self._offset += len(chunk)
+            if self._offset >= len(part):
+                self._index += 1
+                self._offset = 0
+        return b''.join(chunks)
@@ -4,21 +4,56 @@ Ce module contient l'objet CardPredictor, le cœur de la stratégie.
 """
 
 import re
+import sys
+import pickle
 import logging
-from typing import Optional, Dict, Tuple
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
 import time
 import os
 
+from collections import OrderedDict
+
+from draw_parser import ParsedDraw, RecentDigests, content_digest, group_cards, group_points
+from draw_stats import DrawStats
+from pending_store import PendingEntry, PendingStore
+from prediction_record import Early, PredictionRecord, PredictionStatus
+from rule_engine import DAME_RULES, DrawFeatures, Rule, RuleEngine
+from rule_stats import ModePolicy, RuleStatsBook
+from shadow import GAME_RESET_GAP, ShadowBank, ShadowResults, ShadowSet
+from state_store import StateStore
+
 logger = logging.getLogger(__name__)
 
+# Carte Dame avec sa couleur (même motif que l'analyse /inter)
+DAME_CARD_PATTERN = re.compile(r'Q[♥️♠️♦️♣️❤️]')
+
+# Motifs précompilés de parse() (identiques à ceux des méthodes extract_*)
+_GAME_NUMBER_PATTERN = re.compile(r'#[nN](\d+)\.?')
+_GROUP_PATTERN = re.compile(r'\(.*?\)')
+_CARD_PATTERN = re.compile(r'[AKQJ\d]+[♥️♠️♦️♣️❤️]')
+_FIGURE_PATTERN = re.compile(r'\b[JjVvKkRrAa]\b')  # Lettres isolées : un seul passage pour J, K et A
+_DAME_PATTERN = re.compile(r'\b[Qq]\b|Dame')
+
 # --- Configuration de l'État ---
 
 class CardPredictor:
     """Handles card prediction logic and state management."""
 
-    def __init__(self):
-        self.predictions = {} 
-        self.processed_messages = set() 
+    # Attributs synchronisés avec le backend d'état partagé
+    STATE_FIELDS = (
+        'predictions', 'processed_messages', 'last_prediction_time', 'last_dame_prediction',
+        'consecutive_failures', 'intelligent_mode_active', 'draw_history', 'pending_messages',
+        'last_processed', 'cycle_stats', 'rule_stats', 'shadow_results',
+    )
+
+    def __init__(self, state_store: Optional[StateStore] = None, clock=time.time):
+        self.clock = clock  # Horloge injectable (simulée par le test d'endurance)
+        self.predictions = {}  # {(jeu cible, cible): PredictionRecord}
+        # Prédictions gardées après leur fenêtre (éditions, rapprochement ⏰), en jeux, puis oubliées
+        self.prediction_retention_games = 20
+        self.processed_messages = RecentDigests()
         self.last_prediction_time = 0.0
         self.last_dame_prediction = None 
 
@@ -27,12 +62,122 @@ class CardPredictor:
         self.intelligent_mode_active = False
         self.MAX_FAILURES_BEFORE_INTELLIGENT_MODE = 2
 
+        # Comptes glissants par règle (succès par décalage, échecs, séries), mis à jour à chaque résolution,
+        # et politique de bascule automatique du mode (None : bascule manuelle via /inter)
+        self.rule_stats = RuleStatsBook()
+        self.mode_policy: Optional[ModePolicy] = None
+
+        # Jeux de règles évalués en ombre (configuration) et leurs résultats (état partagé)
+        self.shadow_sets: Tuple[ShadowSet, ...] = ()
+        self._shadow_bank: Optional[ShadowBank] = None  # Règles réelles et candidates compilées ensemble
+        self.shadow_results: Dict[str, ShadowResults] = {}
+        self.shadow_window = 50
+
+        # Règles de prédiction (toutes cibles), évaluées en un passage par tirage
+        self.rule_engine = RuleEngine(DAME_RULES)
+
         # Gestion de l'historique
-        self.draw_history = {} 
+        # Ordre d'arrivée : la numérotation recommence chaque jour, le plus petit numéro n'est pas le plus ancien
+        self.draw_history = OrderedDict()
         self.history_limit = 10
 
+        # Statistiques cumulées des cycles Dame (N-2 → N), alimentées par record_draw
+        self.cycle_stats = {'draws': 0, 'dame_draws': 0, 'cycles': 0, 'triggers': {}}
+
+        # Historique encodé pour les probabilités conditionnelles (/stats), propre au processus
+        self.draw_stats = DrawStats()
+
         # Suivi des messages en attente (⏰)
-        self.pending_messages = {}  # {game_number: message_data} 
+        self.pending_messages = PendingStore(clock=clock)  # {game_number: PendingEntry}, TTL + plafond
+
+        # Dernier tirage reçu du canal source (propre au processus, pour la santé)
+        self.last_game_number = None
+        self.last_update_at = None
+
+        # Dernière version traitée de chaque message source : {(chat_id, message_id): signature}
+        self.last_processed = OrderedDict()
+        self.last_processed_limit = 256
+
+        # Backend d'état (mémoire par défaut, SQLite/Redis en multi-workers)
+        self.state_store = state_store or StateStore()
+        self._state_version = None
+        self._lock = threading.RLock()
+        self._tx_depth = 0
+
+    # --- État Partagé ---
+
+    def set_state_store(self, state_store: StateStore):
+        """Change le backend d'état ; l'état sera rechargé à la prochaine transaction."""
+        with self._lock:
+            self.state_store = state_store
+            self._state_version = None
+
+    def set_clock(self, clock):
+        """Change l'horloge du prédicteur et de son suivi des messages ⏰."""
+        self.clock = clock
+        self.pending_messages.clock = clock
+
+    def export_state(self) -> Dict:
+        return {field: getattr(self, field) for field in self.STATE_FIELDS}
+
+    def import_state(self, state: Dict):
+        for field in self.STATE_FIELDS:
+            if field in state:
+                setattr(self, field, state[field])
+        self.pending_messages.clock = self.clock
+        # État enregistré avant l'historique ordonné : dict (ordre d'insertion conservé)
+        if not isinstance(self.draw_history, OrderedDict):
+            self.draw_history = OrderedDict(self.draw_history)
+        # État enregistré avant RecentDigests : ensemble non borné des empreintes
+        if isinstance(self.processed_messages, set):
+            digests = RecentDigests()
+            for digest in self.processed_messages:
+                digests.add(digest)
+            self.processed_messages = digests
+        # État enregistré avant les PredictionRecord : prédictions sous forme de dict
+        if any(isinstance(record, dict) for record in self.predictions.values()):
+            converted = {}
+            for key, record in self.predictions.items():
+                if isinstance(record, dict):
+                    record = PredictionRecord.from_legacy(key, record)
+                converted[record.key] = record
+            self.predictions = converted
+
+    @contextmanager
+    def transaction(self, channel_key: str = 'default'):
+        """Mise à jour atomique de l'état d'un canal.
+        Recharge l'état partagé s'il a changé dans un autre worker, puis le
+        réenregistre à la sortie. Réentrant dans un même thread.
+        """
+        with self._lock:
+            if self._tx_depth:
+                self._tx_depth += 1
+                try:
+                    yield self
+                finally:
+                    self._tx_depth -= 1
+                return
+
+            self._tx_depth = 1
+            try:
+                with self.state_store.begin(channel_key) as tx:
+                    if self.state_store.shared and tx.version != self._state_version:
+                        blob = tx.load()
+                        if blob is not None:
+                            self.import_state(pickle.loads(blob))
+                        self._state_version = tx.version
+                    try:
+                        yield self
+                        if self.state_store.shared:
+                            self._state_version = tx.save(
+                                pickle.dumps(self.export_state(), protocol=pickle.HIGHEST_PROTOCOL)
+                            )
+                    except BaseException:
+                        # État local partiel ou non enregistré (verrou perdu) : forcer un rechargement
+                        self._state_version = None
+                        raise
+            finally:
+                self._tx_depth = 0
 
     # --- Utilitaires d'Extraction ---
 
@@ -106,6 +251,85 @@ class CardPredictor:
         # Vérifier si le message est finalisé
         return any(indicator in text for indicator in COMPLETION_INDICATORS)
 
+    def parse(self, text: str, digest: Optional[bytes] = None) -> ParsedDraw:
+        """Analyse complète d'un message source (appelée une fois par version du message).
+
+        Même résultat que les méthodes extract_* combinées, en un seul passage
+        sur les groupes et avec des motifs précompilés (chemin chaud et import).
+        """
+        game_match = _GAME_NUMBER_PATTERN.search(text)
+        groups = _GROUP_PATTERN.findall(text)
+        first_group = groups[0].strip('()') if groups else None
+        second_group = groups[1].strip('()') if len(groups) >= 2 else None
+
+        figures = set(_FIGURE_PATTERN.findall(text))
+        first_two_cards = None
+        if first_group is not None:
+            cards = _CARD_PATTERN.findall(first_group)
+            if len(cards) >= 2:
+                first_two_cards = cards[0] + cards[1]
+
+        return ParsedDraw(
+            game_number=int(game_match.group(1)) if game_match else None,
+            first_group=first_group,
+            second_group=second_group,
+            first_two_cards=first_two_cards,
+            signals=(
+                not figures.isdisjoint('JjVv') or 'Valet' in text,
+                not figures.isdisjoint('KkRr') or 'Roi' in text,
+                not figures.isdisjoint('Aa') or 'As' in text,
+            ),
+            has_dame=bool(first_group) and bool(_DAME_PATTERN.search(first_group)),
+            is_pending='⏰' in text,
+            is_complete='✅' in text or '🔰' in text,
+            digest=digest if digest is not None else content_digest(text),
+        )
+
+    def is_unchanged(self, chat_id: int, message_id: int, parsed: ParsedDraw) -> bool:
+        """Vrai si cette version du message n'apporte rien de nouveau pour la décision."""
+        return self.last_processed.get((chat_id, message_id)) == parsed.signature()
+
+    def mark_processed(self, chat_id: int, message_id: int, parsed: ParsedDraw):
+        key = (chat_id, message_id)
+        self.last_processed[key] = parsed.signature()
+        self.last_processed.move_to_end(key)
+        while len(self.last_processed) > self.last_processed_limit:
+            self.last_processed.popitem(last=False)
+
+    # --- Historique ---
+
+    def record_draw(self, game_number: int, text: str, parsed: ParsedDraw, message_id: Optional[int]) -> bool:
+        """Ajoute un tirage finalisé à l'historique borné et met à jour les statistiques de cycles."""
+        first_group = parsed.first_group
+        if not first_group:
+            return False
+
+        is_new = game_number not in self.draw_history
+        self.draw_history[game_number] = {
+            'text': text,
+            'first_group': first_group,
+            'message_id': message_id,
+            'first_two_cards': parsed.first_two_cards
+        }
+
+        # Un même jeu peut être réédité : ne le compter qu'une fois
+        if is_new:
+            self.draw_stats.append(game_number, first_group, parsed.second_group, parsed.has_dame)
+            stats = self.cycle_stats
+            stats['draws'] += 1
+            if DAME_CARD_PATTERN.search(first_group):
+                stats['dame_draws'] += 1
+                trigger_draw = self.draw_history.get(game_number - 2)
+                if trigger_draw and not DAME_CARD_PATTERN.search(trigger_draw.get('first_group', '')):
+                    stats['cycles'] += 1
+                    trigger = trigger_draw.get('first_two_cards') or 'N/A'
+                    stats['triggers'][trigger] = stats['triggers'].get(trigger, 0) + 1
+
+        # Limiter l'historique : le tirage arrivé en premier est oublié
+        while len(self.draw_history) > self.history_limit:
+            self.draw_history.popitem(last=False)
+        return True
+
     # --- Logique de Prédiction ---
 
     def check_dame_rule(self, signals: Dict[str, bool], first_group_content: str) -> Optional[str]:
@@ -125,13 +349,15 @@ class CardPredictor:
 
         return None 
 
-    def should_predict(self, message: str) -> Tuple[bool, Optional[int], Optional[str]]:
+    def should_predict(self, message: str, parsed: Optional[ParsedDraw] = None) -> Tuple[bool, Optional[int], Optional[str]]:
         """Vérifie si une prédiction de Dame doit être faite."""
-        game_number = self.extract_game_number(message)
+        parsed = parsed or self.parse(message)
+        game_number = parsed.game_number
         if not game_number: return False, None, None
 
-        signals = self.extract_figure_signals(message)
-        first_group = self.extract_first_group_content(message)
+        J, K, A = parsed.signals
+        signals = {'J': J, 'K': K, 'A': A}
+        first_group = parsed.first_group
 
         if not first_group: return False, None, None
 
@@ -141,10 +367,10 @@ class CardPredictor:
 
             if dame_prediction:
                 predicted_value = f"Q:{dame_prediction}"
-                message_hash = hash(message)
+                message_hash = parsed.digest
                 if message_hash not in self.processed_messages:
                     self.processed_messages.add(message_hash)
-                    self.last_prediction_time = time.time()
+                    self.last_prediction_time = self.clock()
                     self.last_dame_prediction = predicted_value
                     return True, game_number, predicted_value
 
@@ -154,7 +380,7 @@ class CardPredictor:
             predicted_rule = None
 
             # Extraire le contenu du deuxième groupe
-            second_group = self.extract_second_group_content(message)
+            second_group = parsed.second_group
             
             # Vérifier l'absence de figures (A, K, Q, J) dans le deuxième groupe
             has_figures_in_second_group = False
@@ -176,184 +402,254 @@ class CardPredictor:
 
             if should_predict_default and predicted_rule:
                 predicted_value = f"Q:{predicted_rule}"
-                message_hash = hash(message)
+                message_hash = parsed.digest
                 if message_hash not in self.processed_messages:
                     self.processed_messages.add(message_hash)
-                    self.last_prediction_time = time.time()
+                    self.last_prediction_time = self.clock()
                     self.last_dame_prediction = predicted_value
                     return True, game_number, predicted_value
 
         return False, None, None
 
-    def make_prediction(self, game_number: int, predicted_value_or_costume: str) -> Dict:
-        """Crée l'objet de prédiction et génère le message."""
-        dame_rule = predicted_value_or_costume.split(':')[1]
-
-        # Règles du Mode Intelligent - 2 Déclencheurs Fréquents
-        if dame_rule == "Q_INTELLIGENT_JJ":
-             target_game = game_number + 2  # Double Valet → N+2
-             prediction_text = f"🎯{target_game}🎯: Dame (Q) statut :⏳"
-
-        elif dame_rule == "Q_INTELLIGENT_J":
-             target_game = game_number + 2  # Valet seul → N+2
-             prediction_text = f"🎯{target_game}🎯: Dame (Q) statut :⏳"
+    def features(self, parsed: ParsedDraw) -> DrawFeatures:
+        """Caractéristiques du tirage, calculées une fois et partagées par toutes les règles."""
+        return DrawFeatures(parsed)
 
-        # Règles par Défaut - 2 règles uniquement
-        elif dame_rule == "Q_DEFAULT_JJ":
-             target_game = game_number + 2  # Deux J dans le premier groupe → N+2
-             prediction_text = f"🎯{target_game}🎯: Dame (Q) statut :⏳"
+    def set_rules(self, rules: Iterable[Rule]):
+        """Remplace le jeu de règles (les prédictions en cours gardent leur cible et leur fenêtre)."""
+        self.rule_engine = RuleEngine(rules)
 
-        elif dame_rule == "Q_DEFAULT_J_CLEAN":
-             target_game = game_number + 2  # Un J dans 1er groupe, pas de figures dans 2ème → N+2
-             prediction_text = f"🎯{target_game}🎯: Dame (Q) statut :⏳"
+    def predictions_for(self, parsed: ParsedDraw, features: Optional[DrawFeatures] = None) -> List[Tuple[int, str]]:
+        """Toutes les prédictions déclenchées par le tirage : [(jeu source, 'cible:règle')].
 
+        Une seule règle par (cible, décalage), dans l'ordre de priorité du jeu de
+        règles ; une même version de message ne déclenche qu'une fois.
+        """
+        game_number = parsed.game_number
+        if not game_number or not parsed.first_group:
+            return []
+
+        features = features or self.features(parsed)
+        bank = self.shadow_bank()
+        if bank is not None:
+            rules = bank.live_matches(features, self.intelligent_mode_active)  # Passage partagé avec l'ombre
         else:
-             target_game = game_number + 2
-             prediction_text = f"🎯{target_game}🎯: Dame (Q) statut :⏳"
-
-        self.predictions[target_game] = {
-            'predicted_costume_or_value': predicted_value_or_costume,
-            'status': 'pending',
-            'predicted_from': game_number,
-            'message_text': prediction_text,
-            'is_dame_prediction': predicted_value_or_costume.startswith('Q:'),
-            'verification_stopped': False,  # Flag pour arrêter la vérification
-            'prediction_message_id': None # Initialisé à None, sera mis à jour par le bot
-        }
-
-        return {'text': prediction_text, 'target_game': target_game}
-
-
-    def verify_prediction(self, text: str, message_id: Optional[int] = None) -> Optional[Dict]:
-        """Vérifie si une prédiction en attente correspond au tirage actuel.
-        ARRÊT immédiat après chaque succès ou échec final.
-        La Dame (Q) est recherchée UNIQUEMENT dans le premier groupe.
+            rules = self.rule_engine.matches(features, self.intelligent_mode_active)
+        if not rules or parsed.digest in self.processed_messages:
+            return []
+
+        self.processed_messages.add(parsed.digest)
+        self.last_prediction_time = self.clock()
+        predicted_values = [rule.predicted_value for rule in rules]
+        for rule, predicted_value in zip(rules, predicted_values):
+            if rule.target == 'Q':
+                self.last_dame_prediction = predicted_value
+        return [(game_number, predicted_value) for predicted_value in predicted_values]
+
+    # --- Prédiction anticipée (message ⏰) ---
+
+    def first_group_settled(self, parsed: ParsedDraw) -> bool:
+        """Premier groupe définitif sur un message ⏰ : trois cartes, ou deux cartes totalisant 6 à 9
+        (le joueur ne tire pas de troisième carte)."""
+        cards = group_cards(parsed.first_group)
+        return len(cards) >= 3 or (len(cards) == 2 and group_points(cards) >= 6)
+
+    def early_predictions(self, parsed: ParsedDraw, features: DrawFeatures,
+                          entry: PendingEntry) -> List[Tuple[int, str]]:
+        """Prédictions des règles du premier groupe, une seule fois par jeu : dès que ce groupe est
+        définitif, ou plus tôt pour les règles qu'une carte de plus ne peut pas invalider.
+        Le premier groupe est mémorisé dans l'entrée ⏰ ; les clés émises y sont ajoutées par l'appelant.
         """
-        game_number = self.extract_game_number(text)
-        if not game_number: return None
-
-        if not self.has_completion_indicators(text):
+        if entry.early is not None or not parsed.game_number or not parsed.first_group:
+            return []
+
+        settled = self.first_group_settled(parsed)
+        rules = self.rule_engine.early_matches(features, self.intelligent_mode_active, settled)
+        if not rules and not settled:
+            return []  # Réessayer sur la version ⏰ suivante
+
+        entry.first_group = parsed.first_group
+        entry.early = []
+        if rules:
+            self.last_prediction_time = self.clock()
+        for rule in rules:
+            if rule.target == 'Q':
+                self.last_dame_prediction = rule.predicted_value
+        return [(parsed.game_number, rule.predicted_value) for rule in rules]
+
+    def reconcile_early(self, entry: Optional[PendingEntry],
+                        final: List[Tuple[int, str]]) -> Tuple[List[Tuple[int, str]], List[Dict]]:
+        """À la finalisation : confirme les prédictions anticipées que le tirage final déclenche aussi
+        (même jeu cible, même cible), retire les autres.
+        Retourne les prédictions restant à émettre et les éditions de retrait.
+        """
+        early = list(entry.early) if entry is not None and entry.early else []
+        final_by_key = {}
+        for game_number, predicted_value in final:
+            rule = self._rule_of(predicted_value)
+            key = (game_number + rule.offset, rule.target)
+            final_by_key[key] = predicted_value
+            # Entrée ⏰ perdue (expirée, évincée) : la prédiction anticipée reste dans le dictionnaire
+            record = self.predictions.get(key)
+            if (record and record.early is Early.PENDING and record.source_game == game_number
+                    and all(key != known for known, _ in early)):
+                early.append((key, predicted_value))
+        if not early:
+            return final, []
+
+        retractions = []
+        for key, _ in early:
+            record = self.predictions.get(key)
+            if key in final_by_key:
+                if record is not None:
+                    record.rule = sys.intern(final_by_key[key])  # Règle retenue au final
+                    record.early = Early.CONFIRMED
+                del final_by_key[key]
+            elif record is not None and record.is_pending:
+                record.status = PredictionStatus.RETRACTED
+                retractions.append({'type': 'edit_message', 'key': key, 'predicted_game': record.target_game})
+
+        remaining = []
+        for game_number, predicted_value in final:
+            rule = self._rule_of(predicted_value)
+            if (game_number + rule.offset, rule.target) in final_by_key:
+                remaining.append((game_number, predicted_value))
+        return remaining, retractions
+
+    def _rule_of(self, predicted_value: str) -> Rule:
+        rule = self.rule_engine.rule_for(predicted_value)
+        if rule is None:
+            # Règle retirée du jeu courant : cible d'après le préfixe, paramètres historiques
+            rule = Rule(predicted_value.split(':', 1)[-1], predicted_value.split(':', 1)[0] or 'Q', bool)
+        return rule
+
+    def shadow_bank(self) -> Optional[ShadowBank]:
+        """Moteur commun au jeu réel et aux jeux en ombre (None sans jeu en ombre)."""
+        if not self.shadow_sets:
             return None
-
-        if not self.predictions: return None
-
-        for predicted_game in sorted(self.predictions.keys()):
-            prediction = self.predictions[predicted_game]
-
-            # Si la vérification a déjà été arrêtée pour cette prédiction, passer
-            if prediction.get('verification_stopped', False):
+        bank = self._shadow_bank
+        if bank is None or bank.sets is not self.shadow_sets or bank.live_engine is not self.rule_engine:
+            bank = self._shadow_bank = ShadowBank(self.shadow_sets, self.rule_engine)
+        return bank
+
+    def evaluate_shadows(self, parsed: ParsedDraw, features: DrawFeatures) -> List[Dict]:
+        """Fait voir le tirage finalisé à chaque jeu en ombre (même analyse, aucune publication).
+        En Mode Intelligent, les règles par défaut résolues en ombre (autre mode, règles réelles)
+        alimentent la politique de mode ; retourne la bascule éventuelle."""
+        game_number = parsed.game_number
+        if not self.shadow_sets or not game_number or not parsed.is_complete:
+            return []
+        intelligent = self.intelligent_mode_active
+        matched = self.shadow_bank().matches(intelligent, features)
+        fed = False
+        for shadow, rules in zip(self.shadow_sets, matched):
+            results = self.shadow_results.get(shadow.name)
+            if results is None:
+                results = self.shadow_results[shadow.name] = ShadowResults(self.shadow_window)
+            resolved = results.observe(game_number, features, rules)
+            if intelligent and shadow.engine is None and shadow.mode == 'other':
+                for record in resolved:
+                    if self._rule_of(record.rule).mode == 'default':
+                        self.rule_stats.record_default(
+                            record.offset if record.status is PredictionStatus.CORRECT else None
+                        )
+                        fed = True
+        return self.apply_mode_policy() if fed else []
+
+    def apply_mode_policy(self) -> List[Dict]:
+        """Bascule du mode si la politique automatique l'exige (résultat mode_switched), sinon rien."""
+        if self.mode_policy is None:
+            return []
+        intelligent = self.mode_policy.decide(self.rule_stats, self.intelligent_mode_active)
+        if intelligent is None:
+            return []
+        window = self.rule_stats.default_rules
+        self.set_intelligent_mode(intelligent)
+        return [{'type': 'mode_switched', 'intelligent': intelligent,
+                 'hit_rate': window.hit_rate, 'samples': window.length}]
+
+    def set_intelligent_mode(self, active: bool):
+        """Change de mode (admin ou politique automatique) et repart de zéro échec."""
+        self.intelligent_mode_active = active
+        self.consecutive_failures = 0
+        self.rule_stats.mode_switched()
+
+    def prediction_target(self, game_number: int, predicted_value_or_costume: str) -> int:
+        """Jeu visé par une prédiction (N + décalage de la règle)."""
+        return game_number + self._rule_of(predicted_value_or_costume).offset
+
+    def make_prediction(self, game_number: int, predicted_value_or_costume: str,
+                        early: bool = False) -> PredictionRecord:
+        """Crée l'enregistrement de prédiction ; le texte est rendu par record.text() à l'envoi."""
+        rule = self._rule_of(predicted_value_or_costume)
+        record = PredictionRecord(
+            predicted_value_or_costume, rule.target, game_number, game_number + rule.offset, rule.window,
+            counts_failures=rule.mode != 'always',  # Règles de la stratégie (défaut/intelligent)
+            early=Early.PENDING if early else Early.NO,  # Émise sur le message ⏰
+        )
+        self.predictions[record.key] = record
+        return record
+
+    def prune_predictions(self, game_number: int) -> int:
+        """Oublie les prédictions dont la fenêtre est passée depuis plus de prediction_retention_games
+        jeux, et celles d'une numérotation précédente (jeu cible loin devant le tirage actuel).
+        Retourne le nombre de prédictions abandonnées sans avoir été vérifiées (tirages manqués)."""
+        abandoned = 0
+        for key, record in list(self.predictions.items()):
+            if (game_number - record.target_game - record.window > self.prediction_retention_games
+                    or record.target_game - game_number >= GAME_RESET_GAP):
+                abandoned += record.is_pending
+                del self.predictions[key]
+        return abandoned
+
+    def verify_prediction(self, text: str, message_id: Optional[int] = None,
+                          parsed: Optional[ParsedDraw] = None,
+                          features: Optional[DrawFeatures] = None) -> List[Dict]:
+        """Vérifie toutes les prédictions en attente sur le tirage actuel.
+        Chaque prédiction est cherchée dans le premier groupe, de son jeu cible
+        jusqu'à la fin de sa fenêtre, et s'ARRÊTE au premier succès ou à l'échec final.
+        """
+        parsed = parsed or self.parse(text)
+        game_number = parsed.game_number
+        if not game_number or not parsed.is_complete or not self.predictions:
+            return []
+
+        features = features or self.features(parsed)
+        results = []
+        for key in sorted(self.predictions, key=_prediction_order):
+            record = self.predictions[key]
+            if not record.is_pending:
                 continue
 
-            if prediction.get('status') != 'pending': 
+            if not record.resolve(game_number, features):
                 continue
+            if record.counts_failures:
+                if record.status is PredictionStatus.CORRECT:
+                    self.consecutive_failures = 0  # Cible trouvée → ✅k️⃣ et ARRÊT
+                else:
+                    self.consecutive_failures += 1  # ÉCHEC FINAL → ❌ et ARRÊT
 
-            verification_offset = game_number - predicted_game
-            is_dame_prediction = prediction.get('is_dame_prediction', False) 
-
-            # Traitement uniquement si c'est une prédiction de Dame
-            if not is_dame_prediction: continue
-
-            if verification_offset < 0: continue # Le tirage n'est pas encore arrivé
-
-            # Vérifier la présence de Q UNIQUEMENT dans le premier groupe
-            costume_or_value_found = self.check_dame_in_first_group(text)
-            original_message = prediction.get('message_text')
-
-            # Séquence de vérification avec ARRÊT après chaque succès
-            if verification_offset == 0:
-                # Numéro prédit exact (N)
-                if costume_or_value_found:
-                    # Q trouvée → ✅0️⃣ et ARRÊT
-                    updated_message = original_message.replace("statut :⏳", "statut :✅0️⃣")
-                    prediction['status'] = 'correct'
-                    prediction['verification_stopped'] = True  # ARRÊT
-                    self.consecutive_failures = 0
-                    return {
-                        'type': 'edit_message', 'predicted_game': predicted_game, 
-                        'new_message': updated_message, 'original_message': original_message,
-                        'prediction_message_id': message_id
-                    }
-                # Pas trouvé, continuer à N+1
-                continue
+            self.rule_stats.record(record.rule, record.offset if record.status is PredictionStatus.CORRECT else None,
+                                   record.counts_failures, default_rule=self._rule_of(record.rule).mode == 'default')
+            results.append({
+                'type': 'edit_message', 'key': key, 'predicted_game': record.target_game,
+                'prediction_message_id': message_id
+            })
+            # Déclenchement du prompt /inter pour l'administrateur (sans politique automatique)
+            if (self.mode_policy is None and record.status is PredictionStatus.FAILED and record.counts_failures
+                    and self.consecutive_failures == self.MAX_FAILURES_BEFORE_INTELLIGENT_MODE):
+                results.append({'type': 'fail_threshold_reached', 'key': key, 'predicted_game': record.target_game})
 
-            elif verification_offset == 1:
-                # Prédit +1 (N+1)
-                if costume_or_value_found:
-                    # Q trouvée → ✅1️⃣ et ARRÊT
-                    updated_message = original_message.replace("statut :⏳", "statut :✅1️⃣")
-                    prediction['status'] = 'correct'
-                    prediction['verification_stopped'] = True  # ARRÊT
-                    self.consecutive_failures = 0
-                    return {
-                        'type': 'edit_message', 'predicted_game': predicted_game, 
-                        'new_message': updated_message, 'original_message': original_message,
-                        'prediction_message_id': message_id
-                    }
-                # Pas trouvé, continuer à N+2
-                continue
+        # Politique automatique : bascule selon le taux de succès glissant, sans aller-retour admin
+        if results:
+            results += self.apply_mode_policy()
 
-            elif verification_offset == 2:
-                # Prédit +2 (N+2)
-                if costume_or_value_found:
-                    # Q trouvée → ✅2️⃣ et ARRÊT
-                    updated_message = original_message.replace("statut :⏳", "statut :✅2️⃣")
-                    prediction['status'] = 'correct'
-                    prediction['verification_stopped'] = True  # ARRÊT
-                    self.consecutive_failures = 0
-                    return {
-                        'type': 'edit_message', 'predicted_game': predicted_game, 
-                        'new_message': updated_message, 'original_message': original_message,
-                        'prediction_message_id': message_id
-                    }
-                # Pas trouvé, continuer à N+3
-                continue
+        return results
 
-            elif verification_offset == 3:
-                # Prédit +3 (dernière chance)
-                if costume_or_value_found:
-                    # Q trouvée → ✅3️⃣ et ARRÊT
-                    updated_message = original_message.replace("statut :⏳", "statut :✅3️⃣")
-                    prediction['status'] = 'correct'
-                    prediction['verification_stopped'] = True  # ARRÊT
-                    self.consecutive_failures = 0
-                    return {
-                        'type': 'edit_message', 'predicted_game': predicted_game, 
-                        'new_message': updated_message, 'original_message': original_message,
-                        'prediction_message_id': message_id
-                    }
-                else:
-                    # ÉCHEC FINAL → ❌ et ARRÊT
-                    updated_message = original_message.replace("statut :⏳", "statut :❌")
-                    prediction['status'] = 'failed'
-                    prediction['verification_stopped'] = True  # ARRÊT
-                    self.consecutive_failures += 1
-
-                    # Déclenchement du prompt /inter pour l'administrateur
-                    if self.consecutive_failures == self.MAX_FAILURES_BEFORE_INTELLIGENT_MODE:
-                        return {'type': 'fail_threshold_reached'} 
-
-                    return {
-                        'type': 'edit_message', 'predicted_game': predicted_game, 
-                        'new_message': updated_message, 'original_message': original_message,
-                        'prediction_message_id': message_id
-                    }
-
-            elif verification_offset > 3:
-                # Au-delà de +3, marquer comme échec et ARRÊT
-                updated_message = original_message.replace("statut :⏳", "statut :❌")
-                prediction['status'] = 'failed'
-                prediction['verification_stopped'] = True  # ARRÊT
-                self.consecutive_failures += 1
-
-                if self.consecutive_failures == self.MAX_FAILURES_BEFORE_INTELLIGENT_MODE:
-                    return {'type': 'fail_threshold_reached'}
-
-                return {
-                    'type': 'edit_message', 'predicted_game': predicted_game, 
-                    'new_message': updated_message, 'original_message': original_message,
-                    'prediction_message_id': message_id
-                }
 
-        return None
+def _prediction_order(key) -> tuple:
+    """Tri des clés de prédiction : (jeu cible, cible) ; les anciennes clés entières sont des Dames."""
+    return key if isinstance(key, tuple) else (key, 'Q')
+
 
 card_predictor = CardPredictor()
\ No newline at end of file
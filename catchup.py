@@ -0,0 +1,174 @@
+"""
+Mode rattrapage : traitement en masse d'un arriéré d'updates après une coupure.
+Détecté d'après l'âge des messages et la taille du lot getUpdates. Pendant le
+rattrapage, les journaux détaillés sont coupés, les prédictions dont la cible
+a déjà été tirée sont supprimées et les éditions du canal de prédiction sont
+regroupées (la dernière version de chaque message) puis envoyées à débit limité.
+"""
+
+import re
+import time
+import queue
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import metrics
+from shadow import GAME_RESET_GAP
+
+logger = logging.getLogger(__name__)
+
+_GAME_NUMBER = re.compile(r'#[nN](\d+)')
+
+# Loggers rendus silencieux (niveau WARNING) pendant le rattrapage
+VERBOSE_LOGGERS = ('handlers', 'bot')
+
+
+def _message_of(update: Dict) -> Optional[Dict]:
+    return (update.get('message') or update.get('edited_message')
+            or update.get('channel_post') or update.get('edited_channel_post'))
+
+
+class _BatchingBot:
+    """Proxy du bot : les éditions sont mémorisées (dernière version gagnante), le reste passe."""
+
+    def __init__(self, bot, pending_edits: 'OrderedDict'):
+        self._bot = bot
+        self.direct = bot  # Bot réel (la boîte d'envoi regroupe et cadence elle-même ses éditions)
+        self._pending_edits = pending_edits
+
+    def edit_message_text(self, chat_id, message_id: int, text: str, parse_mode=None, reply_markup=None):
+        key = (str(chat_id), message_id)
+        self._pending_edits.pop(key, None)
+        self._pending_edits[key] = (text, parse_mode, reply_markup)
+        return True
+
+    def __getattr__(self, name):
+        return getattr(self._bot, name)
+
+
+class CatchUpController:
+    """Bascule entre mode direct et mode rattrapage, lot par lot (mode polling)."""
+
+    def __init__(self, lag_threshold: float = 120.0, batch_threshold: int = 50,
+                 edit_interval: float = 1.0, clock=time.time):
+        self.lag_threshold = lag_threshold
+        self.batch_threshold = batch_threshold
+        self.edit_interval = edit_interval
+        self.clock = clock
+
+        self.active = False
+        self.horizon_game: Optional[int] = None  # Dernier jeu reçu dans l'arriéré (journée en cours)
+        self.last_update_id: Optional[int] = None  # Dernier update_id reçu (acquitté par l'offset)
+        self._pending_edits: 'OrderedDict' = OrderedDict()
+        self._edit_queue: 'queue.Queue' = queue.Queue()
+        self._sender: Optional[threading.Thread] = None
+        self._saved_levels: Dict[str, int] = {}
+
+    # --- Détection ---
+
+    def begin_batch(self, updates: List[Dict]):
+        """Analyse un lot getUpdates et active/désactive le rattrapage.
+        L'arriéré se mesure depuis le dernier update_id reçu (updates perdues
+        ou expirées comprises), pas seulement sur l'étendue du lot."""
+        now = self.clock()
+        oldest_date, newest_date = None, None
+        game_numbers = []
+
+        for update in updates:
+            message = _message_of(update)
+            if not message:
+                continue
+            date = message.get('edit_date') or message.get('date')
+            if date:
+                oldest_date = date if oldest_date is None else min(oldest_date, date)
+                newest_date = date if newest_date is None else max(newest_date, date)
+            match = _GAME_NUMBER.search(message.get('text', ''))
+            if match:
+                game_numbers.append(int(match.group(1)))
+
+        update_ids = [update['update_id'] for update in updates if 'update_id' in update]
+        span = 0
+        if update_ids:
+            first = self.last_update_id + 1 if self.last_update_id is not None else min(update_ids)
+            span = max(update_ids) - first + 1
+            # Chaque update du lot est acquittée par l'offset suivant, traitée ou non
+            self.last_update_id = max(update_ids)
+        oldest_lag = now - oldest_date if oldest_date else 0.0
+        newest_lag = now - newest_date if newest_date else 0.0
+
+        backlog = span >= self.batch_threshold or oldest_lag > self.lag_threshold
+        if backlog and not self.active:
+            self._enter(max(span, len(updates)), oldest_lag)
+        elif self.active and not backlog and newest_lag <= self.lag_threshold:
+            self._leave()
+
+        if self.active:
+            for game_number in game_numbers:
+                self._advance_horizon(game_number)
+
+    def _advance_horizon(self, game_number: int):
+        """Numérotation recommencée (recul d'au moins GAME_RESET_GAP) : l'horizon repart du
+        nouveau jeu ; un jeu très en avance sur l'horizon (édition tardive de la veille) est ignoré."""
+        horizon = self.horizon_game
+        if horizon is None or horizon - game_number >= GAME_RESET_GAP:
+            self.horizon_game = game_number
+        elif horizon < game_number < horizon + GAME_RESET_GAP:
+            self.horizon_game = game_number
+
+    def bot_for(self, bot):
+        """Bot à utiliser pour le lot courant (éditions regroupées en rattrapage)."""
+        return _BatchingBot(bot, self._pending_edits) if self.active else bot
+
+    def target_already_drawn(self, target_game: int) -> bool:
+        """Vrai si, en rattrapage, le jeu cible figure déjà dans l'arriéré reçu."""
+        return self.active and self.horizon_game is not None and target_game <= self.horizon_game
+
+    def end_batch(self, bot):
+        """Transmet les éditions regroupées à l'envoi différé, à débit limité."""
+        if not self._pending_edits:
+            return
+        metrics.incr('catchup_edits_coalesced', len(self._pending_edits))
+        for (chat_id, message_id), (text, parse_mode, reply_markup) in self._pending_edits.items():
+            self._edit_queue.put((bot, chat_id, message_id, text, parse_mode, reply_markup))
+        self._pending_edits.clear()
+
+        if self._sender is None or not self._sender.is_alive():
+            self._sender = threading.Thread(target=self._send_edits, name='catchup-edits', daemon=True)
+            self._sender.start()
+
+    # --- Transitions ---
+
+    def _enter(self, batch_size: int, oldest_lag: float):
+        logger.warning(
+            f"⏩ MODE RATTRAPAGE : {batch_size} updates en attente (plus ancienne : {oldest_lag:.0f} s) - "
+            "journaux détaillés suspendus"
+        )
+        self.active = True
+        self.horizon_game = None
+        metrics.incr('catchup_entered')
+        for name in VERBOSE_LOGGERS:
+            target = logging.getLogger(name)
+            self._saved_levels[name] = target.level
+            target.setLevel(logging.WARNING)
+
+    def _leave(self):
+        for name, level in self._saved_levels.items():
+            logging.getLogger(name).setLevel(level)
+        self._saved_levels.clear()
+        self.active = False
+        self.horizon_game = None
+        logger.warning("▶️ Rattrapage terminé - retour au mode direct")
+
+    def _send_edits(self):
+        while True:
+            try:
+                bot, chat_id, message_id, text, parse_mode, reply_markup = self._edit_queue.get(timeout=5)
+            except queue.Empty:
+                return
+            try:
+                bot.edit_message_text(chat_id, message_id, text, parse_mode=parse_mode, reply_markup=reply_markup)
+            except Exception as e:
+                logger.error(f"❌ Édition différée impossible ({message_id}) : {e}")
+            time.sleep(self.edit_interval)
@@ -4,7 +4,9 @@ Avec IDs pré-configurés pour le déploiement
 Détection automatique de l'environnement (Replit vs Render.com)
 """
 import os
+import hashlib
 import logging
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +30,80 @@ class Config:
             self.PORT = 10000
         else:
             self.PORT = int(os.environ.get('PORT') or 10000)
+
+        # URL de base de l'API Bot (surchargée pour viser un faux serveur local)
+        self.TELEGRAM_API_BASE = os.environ.get('TELEGRAM_API_BASE') or "https://api.telegram.org"
+
+        # Protection du webhook : jeton secret (dérivé du BOT_TOKEN par défaut, identique
+        # pour tous les workers) et taille maximale du corps accepté
+        self.WEBHOOK_SECRET_TOKEN = os.environ.get('WEBHOOK_SECRET_TOKEN') or derive_webhook_secret(self.BOT_TOKEN)
+        self.WEBHOOK_MAX_BODY_BYTES = int(os.environ.get('WEBHOOK_MAX_BODY_BYTES') or 131072)
+
+        # Rattrapage après coupure (polling) : âge d'update ou taille de lot déclenchant le mode,
+        # et intervalle entre deux éditions regroupées
+        self.CATCHUP_LAG_SECONDS = float(os.environ.get('CATCHUP_LAG_SECONDS') or 120)
+        self.CATCHUP_BATCH_THRESHOLD = int(os.environ.get('CATCHUP_BATCH_THRESHOLD') or 50)
+        self.CATCHUP_EDIT_INTERVAL = float(os.environ.get('CATCHUP_EDIT_INTERVAL') or 1.0)
+
+        # Durée de validité du cache getWebhookInfo servi par les routes de santé
+        self.HEALTH_CACHE_TTL = float(os.environ.get('HEALTH_CACHE_TTL') or 60)
+
+        # Watchdog : durée maximale d'une update, silence maximal de getUpdates (polling) ;
+        # au-delà, /health répond 503 (degraded) et la pile des threads est journalisée
+        self.WATCHDOG_STALL_SECONDS = float(os.environ.get('WATCHDOG_STALL_SECONDS') or 60)
+        self.WATCHDOG_POLL_SECONDS = float(os.environ.get('WATCHDOG_POLL_SECONDS') or 90)
+
+        # Enregistreur de vol : traces gardées (par processus), part échantillonnée (0 : seulement
+        # les updates lentes ou en erreur) et seuil de lenteur en millisecondes
+        self.FLIGHT_RECORDER_SIZE = int(os.environ.get('FLIGHT_RECORDER_SIZE') or 500)
+        self.FLIGHT_RECORDER_SAMPLE = float(os.environ.get('FLIGHT_RECORDER_SAMPLE', '0.05') or 0)
+        self.FLIGHT_RECORDER_SLOW_MS = float(os.environ.get('FLIGHT_RECORDER_SLOW_MS') or 1000)
+
+        # Séries temporelles (minute, heure, jour) par canal et par règle : fichier de conservation
+        # entre redémarrages (un fichier TIMESERIES_PATH.<pid> par processus ; vide : en mémoire seulement)
+        # et nombre maximal de séries
+        self.TIMESERIES_PATH = os.environ.get('TIMESERIES_PATH', 'timeseries.pickle')
+        self.TIMESERIES_MAX_SERIES = int(os.environ.get('TIMESERIES_MAX_SERIES') or 64)
+
+        # État partagé entre workers : memory (défaut), sqlite ou redis
+        self.STATE_BACKEND = os.environ.get('STATE_BACKEND', 'memory')
+        self.STATE_URL = os.environ.get('STATE_URL')
+
+        # Archive des tirages, prédictions et résolutions (ARCHIVE_DIR vide : désactivée)
+        self.ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', 'archive')
+        self.ARCHIVE_SEGMENT_RECORDS = int(os.environ.get('ARCHIVE_SEGMENT_RECORDS') or 50000)
+        self.ARCHIVE_FSYNC_SECONDS = float(os.environ.get('ARCHIVE_FSYNC_SECONDS') or 5.0)
+
+        # Table des règles de prédiction (JSON, ou YAML si PyYAML est installé), rechargée à chaud
+        self.RULES_FILE = os.environ.get('RULES_FILE', 'rules.json')
+
+        # Prédiction anticipée : règles du premier groupe évaluées dès le message ⏰
+        # (confirmées ou retirées à la finalisation) ; EARLY_PREDICTION=0 pour attendre la finalisation
+        self.EARLY_PREDICTION = os.environ.get('EARLY_PREDICTION', '1') != '0'
+
+        # Comptes glissants par règle (/status) et bascule automatique du mode (AUTO_MODE=1) :
+        # Mode Intelligent sous AUTO_MODE_LOW, retour au défaut dès AUTO_MODE_HIGH (taux de succès des
+        # règles par défaut, réelles ou en ombre, sur leurs AUTO_MODE_WINDOW dernières résolutions,
+        # AUTO_MODE_MIN_SAMPLES après chaque bascule)
+        self.RULE_STATS_WINDOW = int(os.environ.get('RULE_STATS_WINDOW') or 50)
+        self.AUTO_MODE = os.environ.get('AUTO_MODE', '0') == '1'
+        self.AUTO_MODE_WINDOW = int(os.environ.get('AUTO_MODE_WINDOW') or 20)
+        self.AUTO_MODE_LOW = float(os.environ.get('AUTO_MODE_LOW') or 0.4)
+        self.AUTO_MODE_HIGH = float(os.environ.get('AUTO_MODE_HIGH') or 0.6)
+        self.AUTO_MODE_MIN_SAMPLES = int(os.environ.get('AUTO_MODE_MIN_SAMPLES') or 10)
+
+        # Jeux de règles évalués en ombre (jamais publiés) : le mode opposé au mode réel, et des
+        # fichiers de règles candidates (chemins séparés par des virgules)
+        self.SHADOW_OTHER_MODE = os.environ.get('SHADOW_OTHER_MODE', '1') != '0'
+        self.SHADOW_RULES = [path.strip() for path in os.environ.get('SHADOW_RULES', '').split(',') if path.strip()]
+
+        # Boîte d'envoi durable du canal de prédiction (OUTBOX_PATH vide : en mémoire, non rejouée)
+        self.OUTBOX_PATH = os.environ.get('OUTBOX_PATH', 'outbox.sqlite3')
+        self.OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS') or 15)
+
+        # Messages en attente (⏰) : durée de vie et plafond
+        self.PENDING_TTL_SECONDS = float(os.environ.get('PENDING_TTL_SECONDS') or 600)
+        self.PENDING_MAX_ENTRIES = int(os.environ.get('PENDING_MAX_ENTRIES') or 200)
         
         # Validation et logs détaillés
         logger.info("=" * 50)
@@ -56,4 +132,23 @@ class Config:
             logger.info(f"✅ ADMIN_CHAT_ID: {self.ADMIN_CHAT_ID}")
         
         logger.info(f"✅ PORT: {self.PORT}")
+        logger.info(f"✅ STATE_BACKEND: {self.STATE_BACKEND}")
         logger.info("=" * 50)
+
+
+def derive_webhook_secret(bot_token: Optional[str]) -> Optional[str]:
+    """Jeton secret stable dérivé du BOT_TOKEN (caractères autorisés par Telegram : [A-Za-z0-9_-])."""
+    if not bot_token:
+        return None
+    return hashlib.sha256(f"webhook-secret:{bot_token}".encode()).hexdigest()[:48]
+
+
+_config: Optional['Config'] = None
+
+
+def get_config() -> 'Config':
+    """Retourne l'unique instance de Config du processus (construite au premier appel)."""
+    global _config
+    if _config is None:
+        _config = Config()
+    return _config
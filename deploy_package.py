@@ -0,0 +1,107 @@
+"""
+Génération du package re300.zip (déploiement Render.com en mode webhook).
+Le ZIP est construit en mémoire, dans le processus, et mis en cache selon
+l'empreinte des fichiers sources : des /deploy successifs sans changement
+réutilisent le même artefact. La tâche tourne dans un thread d'arrière-plan
+pour ne pas bloquer le traitement des tirages.
+"""
+
+import os
+import io
+import glob
+import hashlib
+import logging
+import zipfile
+import threading
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PACKAGE_NAME = 're300.zip'
+
+# Fichiers de configuration Render ajoutés aux modules Python de la racine
+PACKAGE_EXTRA_FILES = ['Procfile_render', 'rules.json', 'render_re300.yaml', 'requirements_render.txt', 'README_RENDER_RE300.md']
+
+
+def package_sources(root: str) -> List[str]:
+    """Liste (relative à root) des fichiers inclus dans le package."""
+    files = sorted(os.path.basename(path) for path in glob.glob(os.path.join(root, '*.py')))
+    files += [name for name in PACKAGE_EXTRA_FILES if os.path.exists(os.path.join(root, name))]
+    return files
+
+
+def sources_digest(root: str, files: List[str]) -> str:
+    """Empreinte SHA-256 des noms et contenus des fichiers sources."""
+    digest = hashlib.sha256()
+    for name in files:
+        digest.update(name.encode() + b'\0')
+        with open(os.path.join(root, name), 'rb') as source:
+            digest.update(source.read())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def build_zip(root: str, files: List[str]) -> bytes:
+    """Construit le ZIP en mémoire."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name in files:
+            archive.write(os.path.join(root, name), arcname=name)
+    return buffer.getvalue()
+
+
+class DeployPackageCache:
+    """Dernier package construit, réutilisé tant que les sources n'ont pas changé."""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.path.dirname(os.path.abspath(__file__))
+        self._digest = None
+        self._payload = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Tuple[bytes, str, bool]:
+        """Retourne (contenu du ZIP, empreinte, vrai si servi depuis le cache)."""
+        with self._lock:
+            files = package_sources(self.root)
+            digest = sources_digest(self.root, files)
+            if digest == self._digest and self._payload is not None:
+                return self._payload, digest, True
+
+            payload = build_zip(self.root, files)
+            self._digest, self._payload = digest, payload
+            logger.info(f"📦 Package {PACKAGE_NAME} construit ({len(files)} fichiers, {len(payload) / 1024:.1f} KB)")
+            return payload, digest, False
+
+
+class BackgroundJob:
+    """Exécute au plus une tâche à la fois dans un thread démon."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, target: Callable, *args) -> bool:
+        """Lance la tâche ; retourne False si une exécution est déjà en cours."""
+        with self._lock:
+            if self.running:
+                return False
+            self._thread = threading.Thread(target=self._run, args=(target,) + args, name=self.name, daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self, target: Callable, *args):
+        try:
+            target(*args)
+        except Exception as e:
+            logger.error(f"❌ Erreur dans la tâche {self.name} : {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+
+
+package_cache = DeployPackageCache()
+deploy_job = BackgroundJob('deploy-re300')
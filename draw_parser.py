@@ -0,0 +1,113 @@
+"""
+Résultat d'analyse d'un message du canal source et cache LRU associé.
+Le canal source édite plusieurs fois le même message (⏰, résultats, ✅/🔰) :
+chaque version est analysée une seule fois, indexée par
+(chat_id, message_id, empreinte du contenu).
+"""
+
+import re
+import hashlib
+from collections import OrderedDict
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+RANKS = ('A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K')
+SUITS = ('♥', '♠', '♦', '♣')
+
+# Carte : rang puis couleur (❤ est une variante de ♥ ; le sélecteur U+FE0F éventuel suit)
+CARD_PATTERN = re.compile(r'(10|[AKQJ2-9])([♥♠♦♣❤])')
+
+
+def group_cards(group: Optional[str]) -> List[Tuple[str, str]]:
+    """Cartes (rang, couleur normalisée) d'un groupe de parenthèses."""
+    return [(rank, '♥' if suit == '❤' else suit) for rank, suit in CARD_PATTERN.findall(group or '')]
+
+
+# Valeur des cartes au baccara (le total d'une main est pris modulo 10)
+CARD_POINTS = {'A': 1, '10': 0, 'J': 0, 'Q': 0, 'K': 0, **{str(value): value for value in range(2, 10)}}
+
+
+def group_points(cards: List[Tuple[str, str]]) -> int:
+    return sum(CARD_POINTS[rank] for rank, _ in cards) % 10
+
+
+def content_digest(text: str) -> bytes:
+    """Empreinte stable du texte (identique d'un processus à l'autre, contrairement à hash())."""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+class ParsedDraw(NamedTuple):
+    """Champs d'un message source utilisés par la vérification et la prédiction."""
+    game_number: Optional[int]
+    first_group: Optional[str]
+    second_group: Optional[str]
+    first_two_cards: Optional[str]
+    signals: Tuple[bool, bool, bool]  # Figures J, K, A détectées dans le message
+    has_dame: bool                    # Q dans le premier groupe
+    is_pending: bool                  # ⏰ présent
+    is_complete: bool                 # ✅ ou 🔰 présent
+    digest: bytes
+
+    def signature(self) -> tuple:
+        """Champs pertinents pour la décision (l'empreinte du texte brut est exclue)."""
+        return self[:-1]
+
+
+class RecentDigests:
+    """Empreintes des versions de messages déjà traitées : ensemble borné, les plus anciennes oubliées."""
+
+    def __init__(self, limit: int = 1024):
+        self.limit = limit
+        self._digests: 'OrderedDict[bytes, None]' = OrderedDict()
+
+    def __contains__(self, digest: bytes) -> bool:
+        return digest in self._digests
+
+    def __len__(self) -> int:
+        return len(self._digests)
+
+    def add(self, digest: bytes):
+        self._digests[digest] = None
+        while len(self._digests) > self.limit:
+            self._digests.popitem(last=False)
+
+    def clear(self):
+        self._digests.clear()
+
+    # Pickle compact (état partagé entre workers)
+    def __getstate__(self):
+        return (self.limit, list(self._digests))
+
+    def __setstate__(self, state):
+        self.limit, digests = state
+        self._digests = OrderedDict.fromkeys(digests)
+
+
+class DrawParseCache:
+    """Cache LRU des analyses, clé (chat_id, message_id, empreinte)."""
+
+    def __init__(self, parse: Callable[[str, bytes], ParsedDraw], maxsize: int = 256):
+        self._parse = parse
+        self.maxsize = maxsize
+        self._entries: 'OrderedDict[tuple, ParsedDraw]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, chat_id: int, message_id: int, text: str) -> ParsedDraw:
+        digest = content_digest(text)
+        key = (chat_id, message_id, digest)
+
+        parsed = self._entries.get(key)
+        if parsed is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return parsed
+
+        self.misses += 1
+        parsed = self._parse(text, digest)
+        self._entries[key] = parsed
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return parsed
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,277 @@
+"""
+Statistiques conditionnelles déclencheur → Dame sur l'historique encodé.
+
+Chaque tirage est encodé à l'ajout (Python pur, tableaux compacts `array`) :
+nombre de Valets et présence Roi/As dans le premier groupe, deux premières
+cartes, couleur de la première carte, figures du deuxième groupe, et Dame
+(Q) au premier groupe. compute() estime en un passage vectorisé NumPy
+P(Q au premier groupe de N+k | caractéristique de N) pour k = 0..4, avec
+intervalles de Wilson à 95 %. Les lignes dont les cinq cibles sont connues
+sont cumulées une fois pour toutes : un nouveau calcul ne traite que la fin.
+NumPy n'est importé qu'au premier calcul (démarrage à froid inchangé).
+"""
+
+import re
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from draw_parser import CARD_PATTERN, RANKS, SUITS
+from shadow import GAME_RESET_GAP
+
+HORIZON = 5  # k = 0..4
+OUTCOMES = 3 ** HORIZON  # Issues des cinq cibles (absent, sans Q, avec Q)
+
+_RANK_INDEX = {rank: index for index, rank in enumerate(RANKS)}
+_SUIT_INDEX = {suit: index for index, suit in enumerate(SUITS)}
+_SUIT_INDEX['❤'] = _SUIT_INDEX['♥']
+# Rangs seuls des cartes d'un groupe (figures du deuxième groupe)
+_RANK_PATTERN = re.compile(r'(10|[AKQJ2-9])[♥♠♦♣❤]')  # CARD_PATTERN sans capture de la couleur
+
+
+def _figure_mask_label(mask: int) -> str:
+    return ''.join(figure for bit, figure in enumerate('AKQJ') if mask & (1 << bit)) or 'aucune'
+
+
+# (clé, libellé, catégories) ; chaque code tient sur un octet
+FEATURES = (
+    ('j_count', 'Valets (1er groupe)', ('0', '1', '2', '3+')),
+    ('king', 'Roi (1er groupe)', ('non', 'oui')),
+    ('ace', 'As (1er groupe)', ('non', 'oui')),
+    ('pair', 'Deux premières cartes', tuple(f"{a}-{b}" for a in RANKS for b in RANKS) + ('N/A',)),
+    ('first_suit', 'Couleur 1re carte', SUITS + ('N/A',)),
+    ('second_figures', 'Figures du 2e groupe', tuple(_figure_mask_label(mask) for mask in range(16))),
+)
+_OFFSETS = []
+_total = 0
+for _key, _label, _categories in FEATURES:
+    _OFFSETS.append(_total)
+    _total += len(_categories)
+N_CATEGORIES = _total
+N_FEATURES = len(FEATURES)
+FEATURE_INDEX = {key: index for index, (key, _, _) in enumerate(FEATURES)}
+
+
+def encode_draw(first_group: Optional[str], second_group: Optional[str]) -> Tuple[int, ...]:
+    """Codes des caractéristiques d'un tirage (ordre de FEATURES).
+    Appelée pour chaque tirage (import compris) : un findall par groupe, couleur ❤ indexée comme ♥."""
+    cards = CARD_PATTERN.findall(first_group or '')
+    ranks = [rank for rank, _ in cards]
+    second = set(_RANK_PATTERN.findall(second_group or ''))
+    return (
+        min(ranks.count('J'), 3),
+        'K' in ranks,
+        'A' in ranks,
+        _RANK_INDEX[ranks[0]] * 13 + _RANK_INDEX[ranks[1]] if len(ranks) >= 2 else 169,
+        _SUIT_INDEX[cards[0][1]] if cards else 4,
+        ('A' in second) | ('K' in second) << 1 | ('Q' in second) << 2 | ('J' in second) << 3,
+    )
+
+
+def _numpy():
+    import numpy
+    return numpy
+
+
+def _tally(counts):
+    """Comptage (catégorie, code d'issues) → succès et effectifs par (k, catégorie)."""
+    np = _numpy()
+    cube = counts.reshape((N_CATEGORIES,) + (3,) * HORIZON)  # Axes : catégorie, issue k=4 … k=0
+    hits = np.empty((HORIZON, N_CATEGORIES))
+    totals = np.empty((HORIZON, N_CATEGORIES))
+    for k in range(HORIZON):
+        axis = HORIZON - k
+        per_outcome = cube.sum(axis=tuple(a for a in range(1, HORIZON + 1) if a != axis))
+        hits[k] = per_outcome[:, 2]
+        totals[k] = per_outcome[:, 1] + per_outcome[:, 2]
+    return hits, totals
+
+
+def wilson_interval(hits, totals, z: float = 1.96):
+    """Intervalle de Wilson (bornes basse, haute), vectorisé ; [0, 1] sans observation."""
+    np = _numpy()
+    hits = np.asarray(hits, dtype=np.float64)
+    totals = np.asarray(totals, dtype=np.float64)
+    safe = np.maximum(totals, 1.0)
+    p = hits / safe
+    z2 = z * z
+    denominator = 1.0 + z2 / safe
+    centre = (p + z2 / (2 * safe)) / denominator
+    margin = z * np.sqrt(p * (1 - p) / safe + z2 / (4 * safe * safe)) / denominator
+    empty = totals == 0
+    return np.where(empty, 0.0, centre - margin), np.where(empty, 1.0, centre + margin)
+
+
+class StatsTable:
+    """Résultat de compute() : succès et effectifs par (k, catégorie)."""
+
+    def __init__(self, hits, totals, draws: int):
+        np = _numpy()
+        self.hits = hits.astype(np.int64)      # (HORIZON, N_CATEGORIES)
+        self.totals = totals.astype(np.int64)
+        self.draws = draws
+        self.low, self.high = wilson_interval(self.hits, self.totals)
+
+    def base_rate(self, k: int) -> Tuple[int, int]:
+        """(succès, effectif) toutes catégories confondues pour N+k."""
+        start = _OFFSETS[FEATURE_INDEX['king']]
+        return int(self.hits[k, start:start + 2].sum()), int(self.totals[k, start:start + 2].sum())
+
+    def row(self, feature: str, category: str, k: int) -> Dict:
+        index = FEATURE_INDEX[feature]
+        column = _OFFSETS[index] + FEATURES[index][2].index(category)
+        return self._entry(k, column, index)
+
+    def best(self, k: int, min_support: int = 30, limit: int = 5, features: Optional[Iterable[str]] = None) -> List[Dict]:
+        """Catégories dont la borne basse dépasse le taux de base de Q en N+k, meilleure borne d'abord."""
+        base_hits, base_total = self.base_rate(k)
+        base = base_hits / base_total if base_total else 0.0
+        wanted = [FEATURE_INDEX[key] for key in features] if features else range(len(FEATURES))
+        columns = []
+        for index in wanted:
+            start = _OFFSETS[index]
+            columns.extend(
+                (column, index) for column in range(start, start + len(FEATURES[index][2]))
+                if self.totals[k, column] >= min_support and self.low[k, column] > base
+            )
+        columns.sort(key=lambda item: float(self.low[k, item[0]]), reverse=True)
+        return [self._entry(k, column, index) for column, index in columns[:limit]]
+
+    def _entry(self, k: int, column: int, feature_index: int) -> Dict:
+        key, label, categories = FEATURES[feature_index]
+        hits, total = int(self.hits[k, column]), int(self.totals[k, column])
+        base_hits, base_total = self.base_rate(k)
+        p = hits / total if total else 0.0
+        base = base_hits / base_total if base_total else 0.0
+        return {
+            'feature': key, 'feature_label': label,
+            'category': categories[column - _OFFSETS[feature_index]],
+            'k': k, 'hits': hits, 'total': total, 'p': p,
+            'low': float(self.low[k, column]), 'high': float(self.high[k, column]),
+            'lift': p / base if base else None,
+        }
+
+
+class DrawStats:
+    """Historique encodé (ajout seul) et calcul incrémental des probabilités conditionnelles."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._games = array('q')
+        self._positions = array('q')  # Numéro de jeu rendu croissant malgré les remises à zéro
+        self._codes = array('B')  # N_FEATURES codes par tirage, à la suite
+        self._dame = array('B')
+        self._offset = 0
+        self.skipped = 0
+
+        # Lignes cumulées (toutes leurs cibles N..N+4 sont connues)
+        self._settled = 0
+        self._settled_hits = None
+        self._settled_totals = None
+        self._cache: Optional[StatsTable] = None
+
+    def __len__(self) -> int:
+        return len(self._dame)
+
+    @property
+    def last_game(self) -> Optional[int]:
+        return self._games[-1] if self._games else None
+
+    def append(self, game_number: int, first_group: Optional[str], second_group: Optional[str], has_dame: bool) -> bool:
+        """Ajoute un tirage ; ignoré s'il n'est pas postérieur au dernier (réédition, désordre)."""
+        return self.append_codes(game_number, encode_draw(first_group, second_group), has_dame)
+
+    def append_codes(self, game_number: int, codes: Tuple[int, ...], has_dame: bool) -> bool:
+        with self._lock:
+            if self._games:
+                last_game = self._games[-1]
+                if game_number <= last_game:
+                    if last_game - game_number < GAME_RESET_GAP:
+                        self.skipped += 1
+                        return False
+                    # Nouvelle numérotation : écart > HORIZON pour ne rien relier entre les séries
+                    self._offset = self._positions[-1] + HORIZON + 1 - game_number
+            self._games.append(game_number)
+            self._positions.append(game_number + self._offset)
+            self._codes.extend(codes)
+            self._dame.append(1 if has_dame else 0)
+            self._cache = None
+            return True
+
+    def merge_newer(self, other: 'DrawStats') -> int:
+        """Ajoute les tirages de `other` postérieurs au dernier tirage connu.
+        Si ce dernier tirage figure dans `other` (même jeu, même tirage), seuls les suivants
+        sont repris ; chacun passe par append_codes (rééditions ignorées, numérotation recommencée)."""
+        with other._lock:
+            codes = other._codes
+            rows = [(other._games[i], tuple(codes[i * N_FEATURES:(i + 1) * N_FEATURES]), other._dame[i])
+                    for i in range(len(other._games))]
+        with self._lock:
+            last = (self._games[-1], tuple(self._codes[-N_FEATURES:]), self._dame[-1]) if self._games else None
+        start = next((index + 1 for index in range(len(rows) - 1, -1, -1) if rows[index] == last), 0)
+        added = 0
+        for game_number, codes, dame in rows[start:]:
+            added += self.append_codes(game_number, codes, bool(dame))
+        return added
+
+    # --- Calcul vectorisé ---
+
+    def compute(self) -> StatsTable:
+        with self._lock:
+            if self._cache is not None:
+                return self._cache
+            np = _numpy()
+            n = len(self._dame)
+            lo = self._settled
+            if self._settled_hits is None:
+                self._settled_hits = np.zeros((HORIZON, N_CATEGORIES))
+                self._settled_totals = np.zeros((HORIZON, N_CATEGORIES))
+            if n == 0:
+                self._cache = StatsTable(self._settled_hits, self._settled_totals, 0)
+                return self._cache
+
+            # Copie de la fin non cumulée (les tableaux `array` restent redimensionnables)
+            positions = np.array(self._positions[lo:], dtype=np.int64)
+            dame = np.array(self._dame[lo:], dtype=bool)
+            codes = (np.array(self._codes[lo * N_FEATURES:], dtype=np.int32).reshape(-1, N_FEATURES).T
+                     + np.array(_OFFSETS, dtype=np.int32)[:, None])
+            m = len(positions)
+
+            # Issue de chaque cible N+k : 0 absent, 1 tiré sans Q, 2 tiré avec Q ; les cinq
+            # issues forment un code en base 3 (0..242) pour un seul comptage par ligne
+            outcome = np.zeros(m, dtype=np.int32)
+            span = int(positions[-1] - positions[0]) + 1
+            if span <= 4 * m + HORIZON:
+                # Numérotation quasi contiguë : table dense position → issue
+                dense = np.zeros(span + HORIZON, dtype=np.int32)
+                dense[positions - positions[0]] = 1 + dame
+                for k in range(HORIZON):
+                    outcome += dense[positions - positions[0] + k] * 3 ** k
+            else:
+                for k in range(HORIZON):
+                    wanted = positions + k
+                    index = np.minimum(np.searchsorted(positions, wanted), m - 1)
+                    outcome += np.where(positions[index] == wanted, 1 + dame[index], 0).astype(np.int32) * 3 ** k
+
+            # Lignes dont N+4 ne peut plus arriver : cumulées définitivement
+            settled = int(np.searchsorted(positions, positions[-1] - (HORIZON - 1), side='right'))
+            bins = codes * OUTCOMES + outcome
+            settled_hits, settled_totals = _tally(np.bincount(bins[:, :settled].ravel(), minlength=N_CATEGORIES * OUTCOMES))
+            tail_hits, tail_totals = _tally(np.bincount(bins[:, settled:].ravel(), minlength=N_CATEGORIES * OUTCOMES))
+            self._settled_hits += settled_hits
+            self._settled_totals += settled_totals
+
+            self._settled = lo + settled
+            self._cache = StatsTable(self._settled_hits + tail_hits, self._settled_totals + tail_totals, n)
+            return self._cache
+
+
+def load_archive_stats(directory: str) -> DrawStats:
+    """Reconstruit les statistiques depuis les tirages de l'archive (ordre chronologique)."""
+    from archive import read_range
+
+    records = sorted(read_range(directory, kinds={'draw'}), key=lambda record: record.get('ts') or 0)
+    stats = DrawStats()
+    for record in records:
+        stats.append(record['game'], record.get('first_group'), record.get('second_group'), bool(record.get('has_dame')))
+    return stats
@@ -0,0 +1,196 @@
+"""
+Enregistreur de vol : traces par update, gardées dans un tampon circulaire.
+Chaque update traitée par process_update reçoit un identifiant de trace et
+des étapes chronométrées (analyse, dédoublonnage, historique, vérification,
+prédiction, chaque appel Telegram). Une fraction échantillonnée des traces
+est conservée, ainsi que toutes les updates lentes ou en erreur, dans un
+tampon de taille fixe (propre au processus), exporté en JSON par /traces
+et /debug/traces. Hors trace (scripts, threads de fond), span() ne coûte
+qu'une lecture de variable locale au thread.
+"""
+
+import os
+import hmac
+import time
+import random
+import logging
+import threading
+import itertools
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# En-tête des routes /debug/traces : doit porter le jeton secret du webhook (WEBHOOK_SECRET_TOKEN)
+DEBUG_TOKEN_HEADER = 'X-Debug-Token'
+
+
+class Trace:
+    """Update en cours de traitement : étapes (nom, début, durée, profondeur, attributs) et attributs."""
+
+    __slots__ = ('pid', 'sequence', 'started_at', 'start', 'duration', 'spans', 'attrs', 'error', 'depth', 'sampled',
+                 'slow')
+
+    def __init__(self, pid: int, sequence: int, started_at: float, start: float, sampled: bool):
+        self.pid = pid
+        self.sequence = sequence
+        self.started_at = started_at  # Horodatage (epoch)
+        self.start = start  # Compteur haute résolution
+        self.duration: Optional[float] = None
+        self.spans: List[tuple] = []
+        self.attrs: Dict = {}
+        self.error: Optional[str] = None
+        self.depth = 0
+        self.sampled = sampled
+        self.slow = False
+
+    @property
+    def trace_id(self) -> str:
+        """Identifiant de trace : processus et numéro d'ordre (formaté seulement pour les traces gardées)."""
+        return f"{self.pid:x}-{self.sequence:06x}"
+
+    def to_dict(self) -> Dict:
+        return {
+            'trace_id': self.trace_id,
+            'started_at': round(self.started_at, 3),
+            'duration_ms': round(self.duration * 1000, 2) if self.duration is not None else None,
+            'error': self.error,
+            'sampled': self.sampled,
+            'slow': self.slow,
+            **self.attrs,
+            'spans': [
+                {'name': name, 'start_ms': round((start - self.start) * 1000, 2),
+                 'duration_ms': round(duration * 1000, 2), 'depth': depth, **attrs}
+                for name, start, duration, depth, attrs in sorted(self.spans, key=lambda span: (span[1], span[3]))
+            ],
+        }
+
+
+class Span:
+    """Étape d'une trace (gestionnaire de contexte en classe : plusieurs par update, il doit rester léger)."""
+
+    __slots__ = ('recorder', 'name', 'attrs', 'trace', 'depth', 'start')
+
+    def __init__(self, recorder: 'FlightRecorder', name: str, attrs: Dict):
+        self.recorder = recorder
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self) -> Dict:
+        self.trace = trace = getattr(self.recorder._local, 'trace', None)
+        if trace is not None:
+            self.depth = trace.depth
+            trace.depth += 1
+            self.start = self.recorder.clock()
+        return self.attrs
+
+    def __exit__(self, *exc_info):
+        trace = self.trace
+        if trace is not None:
+            trace.depth = self.depth
+            trace.spans.append((self.name, self.start, self.recorder.clock() - self.start, self.depth, self.attrs))
+            error = self.attrs.get('error')
+            if error:  # Appel en échec (Telegram...) : la trace est gardée comme une exception
+                trace.error = trace.error or f"{self.name}: {error}"
+        return False
+
+
+class FlightRecorder:
+    """Tampon circulaire des traces échantillonnées, lentes ou en erreur."""
+
+    def __init__(self, capacity: int = 500, sample_rate: float = 0.05, slow_seconds: float = 1.0,
+                 clock=time.perf_counter, wall_clock=time.time, rng=random.random):
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.rng = rng
+        self.traces: deque = deque(maxlen=capacity)
+        self.recorded = 0
+        self.kept = 0
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+
+    def configure(self, capacity: int, sample_rate: float, slow_seconds: float):
+        with self._lock:
+            self.traces = deque(self.traces, maxlen=capacity)
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+
+    @property
+    def current(self) -> Optional[Trace]:
+        return getattr(self._local, 'trace', None)
+
+    @contextmanager
+    def trace(self, **attrs):
+        """Trace d'une update ; conservée si échantillonnée, lente ou en erreur."""
+        if self.current is not None:  # Déjà tracée plus haut dans la pile
+            yield self.current
+            return
+        trace = Trace(os.getpid(), next(self._ids), self.wall_clock(), self.clock(), self.rng() < self.sample_rate)
+        trace.attrs.update(attrs)
+        self._local.trace = trace
+        try:
+            yield trace
+        except BaseException as e:
+            trace.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self._local.trace = None
+            trace.duration = self.clock() - trace.start
+            self._finish(trace)
+
+    def _finish(self, trace: Trace):
+        trace.slow = trace.duration >= self.slow_seconds
+        self.recorded += 1
+        if not (trace.sampled or trace.slow or trace.error):
+            return
+        with self._lock:
+            self.traces.append(trace)
+            self.kept += 1
+        if trace.slow:
+            logger.warning(f"🐢 Update {trace.attrs.get('update_id')} lente ({trace.duration * 1000:.0f} ms) : "
+                           f"trace {trace.trace_id}")
+
+    def span(self, name: str, **attrs) -> 'Span':
+        """Étape chronométrée de la trace courante (sans effet hors trace) ; produit ses attributs,
+        complétables pendant l'étape (issue d'un appel API...)."""
+        return Span(self, name, attrs)
+
+    def annotate(self, **attrs):
+        """Ajoute des attributs (jeu, issue...) à la trace courante."""
+        trace = self.current
+        if trace is not None:
+            trace.attrs.update(attrs)
+
+    def dump(self, slow_only: bool = False) -> Dict:
+        """Traces conservées (plus anciennes d'abord), prêtes pour JSON."""
+        with self._lock:
+            traces = list(self.traces)
+            capacity = self.traces.maxlen
+        if slow_only:
+            traces = [trace for trace in traces if trace.slow or trace.error]
+        return {
+            'pid': os.getpid(),
+            'capacity': capacity,
+            'sample_rate': self.sample_rate,
+            'slow_ms': round(self.slow_seconds * 1000),
+            'recorded': self.recorded,
+            'kept': self.kept,
+            'traces': [trace.to_dict() for trace in traces],
+        }
+
+
+def token_matches(received: Optional[str], secret_token: Optional[str]) -> bool:
+    """Jeton des routes de débogage ; refusé si aucun secret n'est configuré."""
+    if not secret_token or not received:
+        return False
+    return hmac.compare_digest(received.encode(), secret_token.encode())
+
+
+recorder = FlightRecorder()
+span = recorder.span
+annotate = recorder.annotate
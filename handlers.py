@@ -2,15 +2,89 @@
 Contient les gestionnaires de commandes et la logique de traitement des mises à jour.
 """
 
-import os
 import re
+import time
 import logging
+import threading
 from typing import Dict, Optional
+import json_codec
+import metrics
+from archive import build_archive
 from card_predictor import card_predictor
-from config import Config
+from catchup import CatchUpController
+from deploy_package import PACKAGE_NAME, BackgroundJob, deploy_job, package_cache
+from draw_parser import DrawParseCache
+from draw_stats import load_archive_stats
+from flight_recorder import annotate, recorder, span
+from config import get_config
+from outbox import build_outbox
+from pending_store import PendingStore
+from prediction_record import PredictionStatus
+from rule_engine import Condition, RuleFile, target_label
+from rule_stats import ModePolicy, RuleStatsBook
+from shadow import book_totals, build_shadow_sets
+from stall_watchdog import Watchdog
+from state_store import build_state_store
+from timeseries import TimeSeriesStore
 
 logger = logging.getLogger(__name__)
-config = Config()
+config = get_config()
+card_predictor.set_state_store(build_state_store(config.STATE_BACKEND, config.STATE_URL))
+card_predictor.pending_messages = PendingStore(config.PENDING_TTL_SECONDS, config.PENDING_MAX_ENTRIES,
+                                                clock=card_predictor.clock)
+card_predictor.rule_stats = RuleStatsBook(config.RULE_STATS_WINDOW, config.AUTO_MODE_WINDOW)
+if config.AUTO_MODE:
+    # Bascule automatique du mode selon le taux de succès glissant (remplace le prompt /inter)
+    card_predictor.mode_policy = ModePolicy(config.AUTO_MODE_LOW, config.AUTO_MODE_HIGH, config.AUTO_MODE_MIN_SAMPLES)
+
+# Jeux de règles en ombre : évalués sur les mêmes tirages, jamais publiés (/ombre pour comparer)
+# (autre_mode est toujours évalué avec AUTO_MODE : il mesure les règles par défaut en Mode Intelligent)
+card_predictor.shadow_sets = build_shadow_sets(config.SHADOW_OTHER_MODE or config.AUTO_MODE, config.SHADOW_RULES)
+card_predictor.shadow_window = config.RULE_STATS_WINDOW
+
+# Archive des tirages finalisés, prédictions et résolutions (écrite en arrière-plan)
+archive = build_archive(config.ARCHIVE_DIR, max_records=config.ARCHIVE_SEGMENT_RECORDS,
+                        fsync_interval=config.ARCHIVE_FSYNC_SECONDS)
+
+# Boîte d'envoi durable du canal de prédiction : envois et éditions enregistrés avant l'appel,
+# réessayés en arrière-plan et rejoués au redémarrage
+outbox = build_outbox(config.OUTBOX_PATH, max_attempts=config.OUTBOX_MAX_ATTEMPTS)
+
+# Surveillance des blocages (démarrée par le point d'entrée, lue par /health)
+watchdog = Watchdog(config.WATCHDOG_STALL_SECONDS)
+
+# Enregistreur de vol : traces par update (échantillonnées, lentes ou en erreur), /traces et /debug/traces
+recorder.configure(config.FLIGHT_RECORDER_SIZE, config.FLIGHT_RECORDER_SAMPLE, config.FLIGHT_RECORDER_SLOW_MS / 1000)
+UPDATE_KINDS = ('message', 'edited_message', 'channel_post', 'edited_channel_post', 'callback_query')
+
+# Séries temporelles en mémoire fixe (minute, heure, jour) : volume, latence et succès par canal et par règle
+timeseries = TimeSeriesStore(config.TIMESERIES_PATH, max_series=config.TIMESERIES_MAX_SERIES)
+
+# Statistiques des tirages : reconstruites depuis l'archive en arrière-plan au premier /stats ou /inter
+stats_job = BackgroundJob('draw-stats')
+stats_loaded = threading.Event()
+if not config.ARCHIVE_DIR:
+    stats_loaded.set()
+
+# Table des règles (RULES_FILE), rechargée quand le fichier change ou via /regles recharger
+rule_file = RuleFile(config.RULES_FILE)
+rule_file.refresh(card_predictor)
+
+# Analyses mémorisées par version de message (le canal source édite souvent)
+parse_cache = DrawParseCache(card_predictor.parse)
+
+# Rattrapage des arriérés d'updates (mode polling)
+catch_up = CatchUpController(config.CATCHUP_LAG_SECONDS, config.CATCHUP_BATCH_THRESHOLD, config.CATCHUP_EDIT_INTERVAL)
+
+# Clavier OUI/NON de /inter, sérialisé une seule fois
+INTER_KEYBOARD = json_codec.dumps_str({
+    "inline_keyboard": [
+        [
+            {"text": "✅ OUI (Activer Mode Intelligent)", "callback_data": "activate_intelligent_mode"},
+            {"text": "❌ NON (Rester en Règle par Défaut)", "callback_data": "deactivate_intelligent_mode"}
+        ]
+    ]
+})
 
 # --- Gestionnaires de Commandes ---
 # Chaque handler prend l'instance du bot et le chat_id
@@ -25,6 +99,10 @@ def handle_help_command(bot, chat_id):
         "/status - Affiche l'état du Mode Intelligent et les échecs.\n"
         "/inter - Analyse les déclencheurs de Dame et permet l'activation interactive de la stratégie.\n"
         "/defaut - Désactive le Mode Intelligent et réinitialise les règles.\n"
+        "/stats - Probabilités de Dame en N+k selon les caractéristiques du tirage N.\n"
+        "/regles - Liste les règles de prédiction ; /regles recharger relit le fichier (admin).\n"
+        "/ombre - Compare le jeu réel aux jeux de règles évalués en ombre (admin).\n"
+        "/traces - Traces récentes du traitement des updates, en JSON (admin).\n"
         "/deploy - Génère un package ZIP pour déploiement sur Render.com.\n"
     )
     bot.send_message(chat_id, help_text)
@@ -34,98 +112,292 @@ def handle_status_command(bot, chat_id):
 
     mode_status = "🟢 ACTIF (Règles appliquées)" if card_predictor.intelligent_mode_active else "🔴 INACTIF (Veille)"
     failure_count = card_predictor.consecutive_failures
+    card_predictor.pending_messages.expire()
+    pending = card_predictor.pending_messages.metrics()
 
     status_text = (
         "📊 Statut du Predictor (Webhook) :\n"
         f"Mode Intelligent : {mode_status}\n"
         f"Échecs consécutifs : {failure_count}/{card_predictor.MAX_FAILURES_BEFORE_INTELLIGENT_MODE}\n"
         f"Dernière prédiction Dame (Q): {card_predictor.last_dame_prediction if card_predictor.last_dame_prediction else 'Aucune'}\n"
+        f"Messages ⏰ en attente : {pending['pending']} (finalisés : {pending['finalized']}, "
+        f"expirés : {pending['expired']}, évincés : {pending['evicted']})\n"
+    )
+
+    # Comptes glissants : stratégie, règles par défaut (politique de mode) puis chaque règle résolue au moins une fois
+    stats = card_predictor.rule_stats
+    policy = card_predictor.mode_policy
+    status_text += (
+        f"\nBascule automatique : {('✅ ' + policy.describe()) if policy else '❌ (prompt /inter)'}\n"
+        f"Stratégie ({stats.strategy.size} dernières) : {stats.strategy.summary()}\n"
     )
+    if policy:
+        status_text += (f"Règles par défaut, réelles ou en ombre ({stats.default_rules.size} dernières) : "
+                        f"{stats.default_rules.summary()}\n")
+    if stats.rules:
+        status_text += f"Règles ({stats.window} dernières résolutions) :\n" + "\n".join(
+            f"• {rule.split(':', 1)[-1]} : {counter.summary()}" for rule, counter in stats.items()
+        ) + "\n"
+
+    # Historique long (séries temporelles) : succès, volume et latence par canal puis par règle
+    names = timeseries.names()
+    if names:
+        status_text += (f"\n📈 Historique {' / '.join(label for label, _ in SERIES_WINDOWS)} "
+                        f"(succès · volume · latence moyenne) :\n")
+        status_text += "\n".join(
+            f"• {series_label(name)} : "
+            + " | ".join(format_series_window(timeseries.totals(name, seconds)) for _, seconds in SERIES_WINDOWS)
+            for name in names
+        ) + "\n"
 
     logger.info(f"   Mode intelligent: {'ACTIF' if card_predictor.intelligent_mode_active else 'INACTIF'}")
     logger.info(f"   Échecs: {failure_count}/{card_predictor.MAX_FAILURES_BEFORE_INTELLIGENT_MODE}")
 
     bot.send_message(chat_id, status_text)
 
+SERIES_WINDOWS = (('1 h', 3600), ('24 h', 86400), ('30 j', 30 * 86400))
+
+def series_label(name: str) -> str:
+    kind, key = name.split(':', 1)
+    if kind == 'rule':
+        return f"règle {key.split(':', 1)[-1]}"
+    if key == str(config.TARGET_CHANNEL_ID):
+        return "canal source"
+    return "admin" if key == str(config.ADMIN_CHAT_ID) else "autres chats"
+
+def format_series_window(totals: Dict) -> str:
+    resolved = totals['hits'] + totals['misses']
+    parts = [f"{totals['hits']}/{resolved} ({totals['hit_rate'] * 100:.0f} %)" if resolved else "-"]
+    if totals['updates']:
+        parts.append(f"{totals['updates']} upd.")
+    if totals['predictions']:
+        parts.append(f"{totals['predictions']} préd.")
+    if totals['updates']:
+        parts.append(f"{totals['latency_avg_ms']:.1f} ms")
+    return " · ".join(parts)
+
+def load_statistics():
+    """Tirages archivés (imports, redémarrages), puis ceux reçus depuis le démarrage."""
+    started = time.time()
+    live_stats = card_predictor.draw_stats
+    card_predictor.draw_stats = load_archive_stats(config.ARCHIVE_DIR)
+    card_predictor.draw_stats.merge_newer(live_stats)
+    stats_loaded.set()
+    logger.info(f"📊 Statistiques chargées : {len(card_predictor.draw_stats)} tirages en {time.time() - started:.1f} s")
+
+
+def draw_statistics():
+    """Table des probabilités conditionnelles ; None pendant le chargement ou sans NumPy."""
+    if not stats_loaded.is_set():
+        stats_job.start(load_statistics)
+        return None
+    try:
+        return card_predictor.draw_stats.compute()
+    except ImportError:
+        logger.warning("⚠️ NumPy n'est pas installé - statistiques indisponibles")
+        return None
+
+
+def format_signal(entry: Dict) -> str:
+    return (
+        f"{entry['feature_label']} {entry['category']} : {entry['p'] * 100:.1f} % "
+        f"[{entry['low'] * 100:.1f}–{entry['high'] * 100:.1f}] (n={entry['total']})"
+    )
+
+
+def handle_stats_command(bot, chat_id):
+    """Probabilités de Dame (1er groupe) en N+k selon les caractéristiques du tirage N."""
+    logger.info(f"📊 Commande /stats reçue de chat_id: {chat_id}")
+
+    table = draw_statistics()
+    if table is None:
+        if not stats_loaded.is_set():
+            bot.send_message(chat_id, "⏳ Chargement des statistiques depuis l'archive, réessayez dans quelques secondes.")
+        else:
+            bot.send_message(chat_id, "⚠️ Statistiques indisponibles (NumPy n'est pas installé).")
+        return
+    if table.draws < 10:
+        bot.send_message(chat_id, f"⚠️ Historique insuffisant pour les statistiques ({table.draws} tirages).")
+        return
+
+    lines = [f"📊 STATISTIQUES DAME ({table.draws} tirages)", ""]
+    base_rates = []
+    for k in range(5):
+        hits, total = table.base_rate(k)
+        base_rates.append(f"N+{k} : {hits / total * 100:.1f} %" if total else f"N+{k} : -")
+    lines.append("P(Q) de base : " + ", ".join(base_rates))
+
+    lines += ["", "🃏 Double Valet (JJ) au tirage N :"]
+    lines.append(", ".join(
+        f"N+{row['k']} : {row['p'] * 100:.1f} % (n={row['total']})"
+        for row in (table.row('j_count', '2', k) for k in range(5))
+    ))
+
+    lines += ["", "🎯 Signaux au-dessus du taux de base pour N+2 (IC 95 %) :"]
+    best = table.best(2, min_support=30, limit=8)
+    lines += [f"• {format_signal(entry)}" for entry in best] or ["Aucun signal significatif (n ≥ 30)."]
+
+    bot.send_message(chat_id, "\n".join(lines))
+
+
 def handle_defaut_command(bot, chat_id):
     logger.info(f"⏹️ Commande /defaut reçue de chat_id: {chat_id}")
 
-    card_predictor.intelligent_mode_active = False
-    card_predictor.consecutive_failures = 0
+    card_predictor.set_intelligent_mode(False)
 
     logger.info(f"   Mode Intelligent DÉSACTIVÉ, échecs réinitialisés à 0")
 
     bot.send_message(chat_id, "✅ Mode Intelligent DÉSACTIVÉ. Les prédictions automatiques sont maintenant basées sur la règle initiale (Veille).")
 
-def handle_deploy_command(bot, chat_id):
-    """Génère le package re300.zip de déploiement pour Render.com (Mode Webhook)."""
-    import subprocess
+def handle_rules_command(bot, chat_id, text: str):
+    """Affiche les règles actives ; `/regles recharger` relit RULES_FILE sans redémarrage (admin)."""
+    logger.info(f"📐 Commande /regles reçue de chat_id: {chat_id}")
+
+    if text.split()[1:2] == ['recharger']:
+        if str(chat_id) != config.ADMIN_CHAT_ID:
+            bot.send_message(chat_id, "⛔ Rechargement des règles réservé à l'administrateur.")
+            return
+        if not rule_file.path:
+            bot.send_message(chat_id, "⚠️ RULES_FILE non configuré : règles Dame intégrées.")
+            return
+        if not rule_file.refresh(card_predictor, force=True):
+            bot.send_message(chat_id, f"❌ Règles NON rechargées (règles actuelles conservées) :\n{rule_file.error}")
+            return
+
+    engine = card_predictor.rule_engine
+    lines = [f"📐 RÈGLES ({len(engine.rules)}) - source : {rule_file.path if rule_file.loaded_at else 'intégrées'}"]
+    for rule in engine.rules:
+        trigger = str(rule.trigger) if isinstance(rule.trigger, Condition) else 'code Python'
+        lines.append(
+            f"• {rule.rule_id} [{rule.mode}] → {target_label(rule.target)} "
+            f"N+{rule.offset} (fenêtre {rule.window}) si {trigger}"
+        )
+    if rule_file.error:
+        lines.append(f"\n⚠️ Dernier chargement en échec : {rule_file.error}")
+    bot.send_message(chat_id, "\n".join(lines))
+
+def format_totals(totals) -> str:
+    window_hits, window_total, hits, total = totals
+    if not total:
+        return "aucune résolution"
+    window = f"{window_hits}/{window_total} ({window_hits / window_total * 100:.0f} %)" if window_total else "-"
+    return f"fenêtre {window} · total {hits}/{total} ({hits / total * 100:.0f} %)"
+
 
+def handle_shadow_command(bot, chat_id, text: str):
+    """Compare le jeu de règles réel aux jeux en ombre ; `/ombre raz` remet leurs comptes à zéro (admin)."""
+    logger.info(f"🌓 Commande /ombre reçue de chat_id: {chat_id}")
+
+    if str(chat_id) != config.ADMIN_CHAT_ID:
+        bot.send_message(chat_id, "⛔ Comparaison des jeux en ombre réservée à l'administrateur.")
+        return
+    if not card_predictor.shadow_sets:
+        bot.send_message(chat_id, "⚠️ Aucun jeu en ombre configuré (SHADOW_OTHER_MODE, SHADOW_RULES).")
+        return
+    if text.split()[1:2] == ['raz']:
+        card_predictor.shadow_results.clear()
+
+    mode = "INTELLIGENT" if card_predictor.intelligent_mode_active else "PAR DÉFAUT"
+    lines = [
+        "🌓 JEUX EN OMBRE (mêmes tirages, aucune publication)",
+        f"Réel (mode {mode}) : {format_totals(book_totals(card_predictor.rule_stats))}",
+    ]
+    for shadow in card_predictor.shadow_sets:
+        results = card_predictor.shadow_results.get(shadow.name)
+        lines += ["", f"🔸 {shadow.name} - {shadow.describe()}"]
+        if results is None:
+            lines.append("Aucun tirage observé.")
+            continue
+        lines.append(f"{format_totals(book_totals(results.stats))}")
+        lines.append(f"{results.draws} tirages, {results.predicted} prédictions, "
+                     f"{len(results.predictions)} en cours, {results.expired} expirées")
+        lines += [f"• {rule.split(':', 1)[-1]} : {counter.summary()}" for rule, counter in results.stats.items()]
+
+    bot.send_message(chat_id, "\n".join(lines))
+
+
+def handle_traces_command(bot, chat_id, text: str):
+    """Envoie les traces de l'enregistreur de vol en JSON ; `/traces lentes` : lentes ou en erreur seulement (admin)."""
+    logger.info(f"🛰️ Commande /traces reçue de chat_id: {chat_id}")
+
+    if str(chat_id) != config.ADMIN_CHAT_ID:
+        bot.send_message(chat_id, "⛔ Traces réservées à l'administrateur.")
+        return
+    dump = recorder.dump(slow_only=text.split()[1:2] == ['lentes'])
+    traces = dump['traces']
+    if not traces:
+        bot.send_message(chat_id, f"🛰️ Aucune trace conservée ({dump['recorded']} updates tracées).")
+        return
+
+    slowest = max(traces, key=lambda trace: trace['duration_ms'])
+    errors = sum(1 for trace in traces if trace['error'])
+    bot.send_message(
+        chat_id,
+        f"🛰️ {len(traces)} trace(s) sur {dump['recorded']} updates (processus {dump['pid']}, "
+        f"échantillon {dump['sample_rate'] * 100:g} %, lente ≥ {dump['slow_ms']} ms)\n"
+        f"{errors} en erreur · plus lente : {slowest['trace_id']} ({slowest['duration_ms']:.0f} ms)"
+    )
+    bot.send_document_bytes(chat_id, 'traces.json', json_codec.dumps(dump), mime_type='application/json')
+
+
+def handle_deploy_command(bot, chat_id):
+    """Génère le package re300.zip de déploiement pour Render.com (Mode Webhook).
+    La génération et l'envoi tournent en arrière-plan : les tirages continuent d'être traités.
+    """
     logger.info(f"📦 Commande /deploy reçue de chat_id: {chat_id}")
 
+    if not deploy_job.start(run_deploy_job, bot, chat_id):
+        bot.send_message(chat_id, "⏳ Un /deploy est déjà en cours, patientez...")
+
+def run_deploy_job(bot, chat_id):
+    """Construit (ou réutilise) re300.zip puis l'envoie à l'admin, avec suivi de progression."""
     bot.send_message(chat_id, "📦 Génération du package re300.zip en cours...")
 
     try:
-        # Générer le package re300
-        result = subprocess.run(
-            ['python3', 'scripts/deploy_re300.py'],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            cwd=os.getcwd()
-        )
-
-        if result.returncode == 0:
-            # Envoyer le message d'information
-            bot.send_message(
-                chat_id,
-                "✅ Package re300.zip créé avec succès !\n\n"
-                "📦 CARACTÉRISTIQUES :\n"
-                "   ✅ Mode WEBHOOK avec Flask\n"
-                "   ✅ 📨 Notification automatique après déploiement\n"
-                "   ✅ 📨 Message de test envoyé à votre Telegram\n"
-                "   ✅ Configuration webhook automatique\n"
-                "   ✅ 4 variables d'environnement seulement\n"
-                "   ✅ 2 règles de prédiction + 2 déclencheurs intelligents\n\n"
-                "📥 Envoi du fichier..."
-            )
-
-            # Envoyer le fichier re300.zip
-            if os.path.exists('re300.zip'):
-                file_size = os.path.getsize('re300.zip') / 1024
-                success = bot.send_document(chat_id, 're300.zip')
-                if success:
-                    bot.send_message(
-                        chat_id, 
-                        f"✅ re300.zip envoyé ({file_size:.2f} KB)\n\n"
-                        "🚀 DÉPLOIEMENT SUR RENDER.COM :\n\n"
-                        "1️⃣ Uploadez TOUS les fichiers sur GitHub\n"
-                        "2️⃣ RENOMMEZ :\n"
-                        "   • Procfile_render → Procfile\n"
-                        "   • render_re300.yaml → render.yaml\n"
-                        "   • requirements_render.txt → requirements.txt\n"
-                        "3️⃣ Créez un Web Service sur Render.com\n"
-                        "4️⃣ Configurez 4 variables d'environnement :\n"
-                        "   • BOT_TOKEN\n"
-                        "   • ADMIN_CHAT_ID\n"
-                        "   • TARGET_CHANNEL_ID\n"
-                        "   • PREDICTION_CHANNEL_ID\n"
-                        "5️⃣ Cliquez sur 'Create Web Service'\n"
-                        "6️⃣ 📨 Vous recevrez un message de test automatiquement !\n\n"
-                        "📖 Consultez README_RENDER_RE300.md pour les détails"
-                    )
-                else:
-                    bot.send_message(chat_id, "⚠️ Erreur lors de l'envoi de re300.zip")
-            else:
-                bot.send_message(chat_id, "⚠️ Fichier re300.zip introuvable")
-        else:
-            error_msg = result.stderr or "Erreur inconnue"
-            bot.send_message(chat_id, f"❌ Erreur lors de la génération :\n{error_msg[:500]}")
-    except subprocess.TimeoutExpired:
-        bot.send_message(chat_id, "❌ La génération a pris trop de temps (timeout).")
+        payload, digest, cached = package_cache.get()
     except Exception as e:
         logger.error(f"❌ Erreur lors de /deploy : {e}")
-        bot.send_message(chat_id, f"❌ Erreur inattendue : {str(e)}")
+        bot.send_message(chat_id, f"❌ Erreur lors de la génération :\n{str(e)[:500]}")
+        return
+
+    origin = "♻️ réutilisé depuis le cache" if cached else "créé"
+    # Envoyer le message d'information
+    bot.send_message(
+        chat_id,
+        f"✅ Package re300.zip {origin} (empreinte {digest[:12]}) !\n\n"
+        "📦 CARACTÉRISTIQUES :\n"
+        "   ✅ Mode WEBHOOK avec Flask\n"
+        "   ✅ 📨 Notification automatique après déploiement\n"
+        "   ✅ 📨 Message de test envoyé à votre Telegram\n"
+        "   ✅ Configuration webhook automatique\n"
+        "   ✅ 4 variables d'environnement seulement\n"
+        "   ✅ 2 règles de prédiction + 2 déclencheurs intelligents\n\n"
+        "📥 Envoi du fichier..."
+    )
+
+    file_size = len(payload) / 1024
+    if bot.send_document_bytes(chat_id, PACKAGE_NAME, payload):
+        bot.send_message(
+            chat_id, 
+            f"✅ re300.zip envoyé ({file_size:.2f} KB)\n\n"
+            "🚀 DÉPLOIEMENT SUR RENDER.COM :\n\n"
+            "1️⃣ Uploadez TOUS les fichiers sur GitHub\n"
+            "2️⃣ RENOMMEZ :\n"
+            "   • Procfile_render → Procfile\n"
+            "   • render_re300.yaml → render.yaml\n"
+            "   • requirements_render.txt → requirements.txt\n"
+            "3️⃣ Créez un Web Service sur Render.com\n"
+            "4️⃣ Configurez 4 variables d'environnement :\n"
+            "   • BOT_TOKEN\n"
+            "   • ADMIN_CHAT_ID\n"
+            "   • TARGET_CHANNEL_ID\n"
+            "   • PREDICTION_CHANNEL_ID\n"
+            "5️⃣ Cliquez sur 'Create Web Service'\n"
+            "6️⃣ 📨 Vous recevrez un message de test automatiquement !\n\n"
+            "📖 Consultez README_RENDER_RE300.md pour les détails"
+        )
+    else:
+        bot.send_message(chat_id, "⚠️ Erreur lors de l'envoi de re300.zip")
 
 def handle_inter_command(bot, chat_id):
     """Analyse l'historique et détecte les 2 déclencheurs fréquents de Dame (Q) selon N-2 → N."""
@@ -137,12 +409,13 @@ def handle_inter_command(bot, chat_id):
         bot.send_message(chat_id, "⚠️ Historique insuffisant (minimum 3 tirages). Attendez plus de résultats.")
         return
 
-    sorted_game_numbers = sorted(history.keys())
+    # Ordre d'arrivée (la numérotation recommence chaque jour)
+    game_numbers = list(history.keys())
 
     # Analyser les cycles Dame : N-2 → N avec 2 déclencheurs fréquents
     cycle_list = []
 
-    for game_number in sorted_game_numbers:
+    for game_number in game_numbers:
         current_draw = history[game_number]
         first_group_text = current_draw.get('first_group', '')
 
@@ -185,19 +458,27 @@ def handle_inter_command(bot, chat_id):
             "Continuez à observer les tirages."
         )
 
-    reply_markup = {
-        "inline_keyboard": [
-            [
-                {"text": "✅ OUI (Activer Mode Intelligent)", "callback_data": "activate_intelligent_mode"},
-                {"text": "❌ NON (Rester en Règle par Défaut)", "callback_data": "deactivate_intelligent_mode"}
-            ]
-        ]
-    }
+    # Statistiques cumulées (incluant l'historique importé) au-delà de la fenêtre récente
+    stats = card_predictor.cycle_stats
+    if stats['draws'] > len(history):
+        top_triggers = sorted(stats['triggers'].items(), key=lambda item: item[1], reverse=True)[:5]
+        message_text += (
+            f"\n\n📈 CUMUL : {stats['cycles']} cycle(s) sur {stats['draws']} tirages "
+            f"({stats['dame_draws']} avec Dame)"
+            + "".join(f"\nDéclencheur {trigger} : {count}" for trigger, count in top_triggers)
+        )
+
+    # Déclencheurs les plus probants (Dame en N+2) d'après les statistiques conditionnelles
+    table = draw_statistics()
+    if table is not None and table.draws >= 100:
+        best = table.best(2, min_support=30, limit=2, features=('j_count', 'pair'))
+        if best:
+            message_text += "\n\n🎯 SIGNAUX N+2 :\n" + "\n".join(format_signal(entry) for entry in best)
 
     bot.send_message(
         chat_id,
         f"{message_text}\n\nVoulez-vous activer le Mode Intelligent (2 déclencheurs fréquents) ?",
-        reply_markup=reply_markup
+        reply_markup=INTER_KEYBOARD
     )
 
 
@@ -207,12 +488,11 @@ def handle_callback_query(bot, callback_query_id: str, chat_id: int, message_id:
 
     if data == 'activate_intelligent_mode':
         # Mise à jour du mode intelligent avec 2 déclencheurs fréquents
-        card_predictor.intelligent_mode_active = True
-        card_predictor.consecutive_failures = 0
+        card_predictor.set_intelligent_mode(True)
         # Les déclencheurs spécifiques (JJ, J) sont gérés dans la logique de prédiction elle-même
         new_text = "✅ **Mode Intelligent ACTIVÉ !** Les 2 déclencheurs fréquents sont maintenant appliqués pour les prédictions automatiques (N+2)."
     elif data == 'deactivate_intelligent_mode':
-        card_predictor.intelligent_mode_active = False
+        card_predictor.set_intelligent_mode(False)
         new_text = "❌ **Mode Intelligent DÉSACTIVÉ.** Les prédictions restent en mode Veille."
     else:
         new_text = "Action non reconnue."
@@ -221,11 +501,241 @@ def handle_callback_query(bot, callback_query_id: str, chat_id: int, message_id:
 
 # --- Logique de Traitement Principal des Mises à Jour ---
 
+def archive_resolution(key, game_number: int):
+    """Archive l'issue d'une prédiction (succès avec décalage, échec ou retrait)."""
+    record = card_predictor.predictions.get(key)
+    if record is None:
+        return
+    archive.append('resolution', record.target_game, status=record.status.label,
+                   resolved_at=game_number, offset=game_number - record.target_game,
+                   rule=record.rule, target=record.target)
+
+
+def record_resolution(key):
+    """Compte le succès ou l'échec d'une prédiction dans les séries de sa règle et du canal source."""
+    record = card_predictor.predictions.get(key)
+    if record is not None and record.status in (PredictionStatus.CORRECT, PredictionStatus.FAILED):
+        timeseries.record_resolution(record.rule, config.TARGET_CHANNEL_ID, record.status is PredictionStatus.CORRECT)
+
+
+def announce_mode_switch(bot, switch: Dict):
+    """Journalise et signale à l'admin une bascule de mode décidée par la politique automatique."""
+    mode = "INTELLIGENT" if switch['intelligent'] else "PAR DÉFAUT"
+    summary = (f"taux de succès des règles par défaut {switch['hit_rate'] * 100:.0f} % "
+               f"sur les {switch['samples']} dernières résolutions")
+    logger.warning(f"🤖 BASCULE AUTOMATIQUE → Mode {mode} ({summary})")
+    metrics.incr('mode_switches_auto')
+    if config.ADMIN_CHAT_ID:
+        bot.send_message(config.ADMIN_CHAT_ID, f"🤖 Mode {mode} activé automatiquement : {summary}.")
+
+
+def publish_edit(bot, edit_result: Dict):
+    """Met à jour le message de prédiction via la boîte d'envoi (texte rendu selon le statut)."""
+    prediction_channel_id = config.PREDICTION_CHANNEL_ID
+    predicted_game_number = edit_result['predicted_game']
+
+    record = card_predictor.predictions.get(edit_result['key'])
+    if record is None:
+        logger.warning(f"⚠️ Prédiction N{predicted_game_number} non trouvée dans le dictionnaire")
+        return
+
+    direct_bot = getattr(bot, 'direct', bot)
+    if outbox.get(record.message_key) is None:
+        # Prédiction publiée avant la boîte d'envoi (état antérieur) : édition directe
+        if record.message_id:
+            direct_bot.edit_message_text(prediction_channel_id, record.message_id, record.text())
+        else:
+            logger.warning(f"⚠️ prediction_message_id non trouvé pour N{predicted_game_number}")
+        return
+
+    # Envoi pas encore livré : son texte est remplacé ; sinon édition (dernière version livrée)
+    # En rattrapage, livraison par le thread de la boîte d'envoi, éditions regroupées
+    if outbox.edit(direct_bot, record.message_key, record.text(), inline=not catch_up.active):
+        logger.info(f"✅ Message de prédiction N{predicted_game_number} mis à jour")
+    else:
+        logger.info(f"📮 Mise à jour de N{predicted_game_number} en file (boîte d'envoi)")
+
+
+def publish_prediction(bot, game_number: int, predicted_value: str, early: bool = False):
+    """Crée, archive et envoie une prédiction ; retourne sa clé (None si ignorée en rattrapage)."""
+    prediction_channel_id = config.PREDICTION_CHANNEL_ID
+
+    target_game = card_predictor.prediction_target(game_number, predicted_value)
+    if catch_up.target_already_drawn(target_game):
+        # Rattrapage : le jeu cible est déjà dans l'arriéré, la prédiction n'a plus de sens
+        metrics.incr('catchup_predictions_suppressed')
+        logger.info(f"⏩ Prédiction N{target_game} ignorée (jeu déjà tiré, rattrapage)")
+        return None
+
+    mode = "INTELLIGENT" if card_predictor.intelligent_mode_active else "PAR DÉFAUT"
+    logger.info(f"🎯 PRÉDICTION AUTOMATIQUE activée (Mode: {mode}{', anticipée ⏰' if early else ''})")
+    logger.info(f"   Jeu source: N{game_number}")
+    logger.info(f"   Règle: {predicted_value}")
+
+    record = card_predictor.make_prediction(game_number, predicted_value, early=early)
+    timeseries.record_prediction(record.rule, config.TARGET_CHANNEL_ID)
+    archive.append('prediction', record.target_game, source_game=game_number,
+                   rule=predicted_value, intelligent_mode=card_predictor.intelligent_mode_active, early=early)
+    prediction_text = record.text()
+    logger.info(f"📤 Envoi de la prédiction au CANAL DE PRÉDICTION (ID: {prediction_channel_id})")
+    logger.info(f"   Message: {prediction_text}")
+
+    # Enregistrée avant l'appel : une prédiction déjà envoyée (update rejoué) n'est pas renvoyée
+    result = outbox.send(getattr(bot, 'direct', bot), record.message_key, prediction_channel_id, prediction_text)
+    if result:
+        logger.info(f"✅ Prédiction envoyée avec succès (message_id: {result})")
+        # Stocker l'ID du message pour mise à jour ultérieure
+        record.message_id = result
+    else:
+        logger.warning(f"📮 Prédiction N{record.target_game} non livrée : nouvelle tentative en arrière-plan")
+    return record.key
+
+
+def process_source_message(bot, text: str, chat_id: int, message_id: int):
+    """Traite un message du canal source : historique, vérification et prédiction."""
+    admin_chat_id = config.ADMIN_CHAT_ID
+
+    rule_file.refresh(card_predictor)
+    with span('parse'):
+        parsed = parse_cache.get(chat_id, message_id, text)
+    if parsed.game_number:
+        card_predictor.last_game_number = parsed.game_number
+        card_predictor.last_update_at = card_predictor.clock()
+    annotate(game_number=parsed.game_number)
+
+    # Édition sans changement utile (mêmes groupes, mêmes indicateurs) : rien à refaire
+    with span('dedup'):
+        unchanged = card_predictor.is_unchanged(chat_id, message_id, parsed)
+        if not unchanged:
+            card_predictor.mark_processed(chat_id, message_id, parsed)
+    if unchanged:
+        logger.info(f"⏩ Message {message_id} inchangé pour la prédiction - ignoré")
+        annotate(outcome='inchangé')
+        return
+
+    # Extraire le numéro de jeu
+    game_number = parsed.game_number
+
+    # Vérifier si le message est en attente (⏰)
+    if parsed.is_pending:
+        annotate(outcome='en attente')
+        if game_number:
+            # Mémoriser le message en attente (ID et premier groupe, avec TTL)
+            entry = card_predictor.pending_messages.remember(game_number, message_id)
+            logger.info(f"⏰ Message en attente mémorisé pour N{game_number} - Attente que ⏰ disparaisse")
+
+            # Prédiction anticipée : les règles du premier groupe n'attendent pas la finalisation
+            if config.EARLY_PREDICTION:
+                with span('predict.early'):
+                    features = card_predictor.features(parsed)
+                    early = card_predictor.early_predictions(parsed, features, entry)
+                for source_game, predicted_value in early:
+                    key = publish_prediction(bot, source_game, predicted_value, early=True)
+                    if key is not None:
+                        entry.early.append((key, predicted_value))
+                        metrics.incr('early_predictions')
+        # Pas de vérification ni d'historique tant que ⏰ est présent
+        return
+
+    # Vérifier si ce message était en attente et vient d'être finalisé
+    finalized = card_predictor.pending_messages.finalize(game_number) if game_number else None
+    if finalized:
+        logger.info(f"✅ Message N{game_number} finalisé - ⏰ a disparu, traitement en cours")
+
+    # Construire l'historique pour les messages finalisés
+    with span('history'):
+        if game_number and card_predictor.record_draw(game_number, text, parsed, message_id):
+            logger.info(f"📝 Historique mis à jour : N{game_number} ajouté ({len(card_predictor.draw_history)} tirages)")
+        if game_number and parsed.is_complete:
+            archive.append('draw', game_number, message_id=message_id, first_group=parsed.first_group,
+                           second_group=parsed.second_group, has_dame=parsed.has_dame)
+
+    # Prédictions anciennes (fenêtre passée, numérotation précédente) : oubliées avant la vérification
+    if game_number and parsed.is_complete:
+        abandoned = card_predictor.prune_predictions(game_number)
+        if abandoned:
+            metrics.incr('predictions_abandoned', abandoned)
+            logger.warning(f"⚠️ {abandoned} prédiction(s) abandonnée(s) sans vérification (tirages manqués)")
+
+    # Caractéristiques du tirage, partagées par la vérification et toutes les règles
+    with span('verify'):
+        features = card_predictor.features(parsed)
+        verification_results = card_predictor.verify_prediction(text, message_id, parsed=parsed, features=features)
+    with span('shadow'):
+        verification_results += card_predictor.evaluate_shadows(parsed, features)
+    annotate(outcome='traité', resolved=len(verification_results))
+
+    threshold_reached = False
+    for verification_result in verification_results:
+        if verification_result['type'] == 'fail_threshold_reached':
+            threshold_reached = True
+            continue
+        if verification_result['type'] == 'mode_switched':
+            announce_mode_switch(bot, verification_result)
+            continue
+
+        logger.info(f"🔍 VÉRIFICATION de prédiction en cours...")
+        archive_resolution(verification_result['key'], game_number)
+        record_resolution(verification_result['key'])
+        logger.info(f"✅ Prédiction vérifiée pour N{verification_result['predicted_game']}")
+        record = card_predictor.predictions.get(verification_result['key'])
+        if record is not None:
+            logger.info(f"   Statut: {record.text()}")
+        publish_edit(bot, verification_result)
+
+    if threshold_reached:
+        annotate(outcome='seuil atteint')
+        logger.warning(f"⚠️ SEUIL D'ÉCHECS ATTEINT ({card_predictor.consecutive_failures} échecs)")
+        logger.info(f"📨 Envoi de /inter automatique à l'admin (ID: {admin_chat_id})")
+        if admin_chat_id:
+            handle_inter_command(bot, admin_chat_id)
+        return
+
+    # Prédiction Automatique : toutes les règles déclenchées par ce tirage ; les prédictions
+    # anticipées sur le message ⏰ sont confirmées (pas de nouvel envoi) ou retirées
+    with span('predict'):
+        predictions, retractions = card_predictor.reconcile_early(
+            finalized, card_predictor.predictions_for(parsed, features)
+        )
+    annotate(predicted=len(predictions))
+    if finalized and finalized.early:
+        metrics.incr('early_predictions_confirmed', len(finalized.early) - len(retractions))
+    for retraction in retractions:
+        logger.info(f"🚫 Prédiction anticipée N{retraction['predicted_game']} retirée (tirage final différent)")
+        metrics.incr('early_predictions_retracted')
+        archive_resolution(retraction['key'], game_number)
+        publish_edit(bot, retraction)
+
+    for source_game, predicted_value in predictions:
+        with span('publish', game=source_game):
+            publish_prediction(bot, source_game, predicted_value)
+
+
 def process_update(bot, update: Dict):
+    """Processes a single Telegram Update, sous la surveillance du watchdog et tracée (enregistreur de vol)."""
+    update_id = update.get('update_id')
+    kind = next((kind for kind in UPDATE_KINDS if kind in update), 'autre')
+    started = time.perf_counter()
+    try:
+        with watchdog.processing(update_id), recorder.trace(update_id=update_id, kind=kind):
+            _process_update(bot, update)
+    finally:
+        timeseries.record_update(update_channel(update, kind), time.perf_counter() - started)
+
+
+def update_channel(update: Dict, kind: str):
+    """Canal de l'update pour les séries temporelles : canal source ou admin, sinon 'autres' (séries bornées)."""
+    message = update.get(kind) or {}
+    if kind == 'callback_query':
+        message = message.get('message') or {}
+    chat_id = str((message.get('chat') or {}).get('id'))
+    return chat_id if chat_id in (str(config.TARGET_CHANNEL_ID), str(config.ADMIN_CHAT_ID)) else 'autres'
+
+
+def _process_update(bot, update: Dict):
     """Processes a single Telegram Update (Message or Callback)."""
 
     target_channel_id = config.TARGET_CHANNEL_ID
-    prediction_channel_id = config.PREDICTION_CHANNEL_ID
     admin_chat_id = config.ADMIN_CHAT_ID
 
     if 'message' in update or 'edited_message' in update or 'channel_post' in update or 'edited_channel_post' in update:
@@ -258,107 +768,10 @@ def process_update(bot, update: Dict):
             logger.info(f"📡 Message reçu du CANAL SOURCE (ID: {target_channel_id})")
             logger.info(f"📝 Contenu: {text[:100]}...")
 
-            # Extraire le numéro de jeu
-            game_number = card_predictor.extract_game_number(text)
-
-            # Vérifier si le message est en attente (⏰)
-            if card_predictor.is_pending_message(text):
-                if game_number:
-                    # Mémoriser le message en attente
-                    card_predictor.pending_messages[game_number] = {
-                        'text': text,
-                        'message_id': message_id
-                    }
-                    logger.info(f"⏰ Message en attente mémorisé pour N{game_number} - Attente que ⏰ disparaisse")
-                # Ne pas traiter tant que ⏰ est présent
-                return
-
-            # Vérifier si ce message était en attente et vient d'être finalisé
-            if game_number and game_number in card_predictor.pending_messages:
-                logger.info(f"✅ Message N{game_number} finalisé - ⏰ a disparu, traitement en cours")
-                # Supprimer de la liste d'attente
-                del card_predictor.pending_messages[game_number]
-
-            # Construire l'historique pour les messages finalisés
-            if game_number:
-                first_group = card_predictor.extract_first_group_content(text)
-                first_two_cards = card_predictor.extract_first_two_cards_with_value(text)
-
-                if first_group:
-                    card_predictor.draw_history[game_number] = {
-                        'text': text,
-                        'first_group': first_group,
-                        'message_id': message_id,
-                        'first_two_cards': first_two_cards
-                    }
-                    logger.info(f"📝 Historique mis à jour : N{game_number} ajouté ({len(card_predictor.draw_history)} tirages)")
-
-                    # Limiter l'historique
-                    if len(card_predictor.draw_history) > card_predictor.history_limit:
-                        oldest_key = min(card_predictor.draw_history.keys())
-                        del card_predictor.draw_history[oldest_key]
-
-            verification_result = card_predictor.verify_prediction(text, message_id)
-
-            if verification_result:
-                logger.info(f"🔍 VÉRIFICATION de prédiction en cours...")
-
-                if verification_result['type'] == 'fail_threshold_reached':
-                    logger.warning(f"⚠️ SEUIL D'ÉCHECS ATTEINT ({card_predictor.consecutive_failures} échecs)")
-                    logger.info(f"📨 Envoi de /inter automatique à l'admin (ID: {admin_chat_id})")
-                    if admin_chat_id:
-                        handle_inter_command(bot, admin_chat_id)
-                    return
-
-                elif verification_result['type'] == 'edit_message':
-                    edit_result = verification_result
-                    predicted_game_number = edit_result['predicted_game']
-                    logger.info(f"✅ Prédiction vérifiée pour N{predicted_game_number}")
-                    logger.info(f"   Statut: {edit_result['new_message']}")
-
-                    # Récupérer l'ID du message de prédiction depuis le dictionnaire des prédictions
-                    prediction_obj = card_predictor.predictions.get(predicted_game_number)
-                    if prediction_obj:
-                        original_msg_id = prediction_obj.get('prediction_message_id')
-                        if original_msg_id:
-                            logger.info(f"🔄 Mise à jour du message de prédiction (message_id: {original_msg_id})")
-                            bot.edit_message_text(
-                                prediction_channel_id,
-                                original_msg_id,
-                                edit_result['new_message']
-                            )
-                            logger.info(f"✅ Message de prédiction mis à jour avec succès")
-                        else:
-                            logger.warning(f"⚠️ prediction_message_id non trouvé pour N{predicted_game_number}")
-                            # Fallback : envoyer un nouveau message
-                            bot.send_message(
-                                prediction_channel_id,
-                                f"✅ **VÉRIFICATION** N{predicted_game_number}:\n{edit_result['new_message']}"
-                            )
-                    else:
-                        logger.warning(f"⚠️ Prédiction N{predicted_game_number} non trouvée dans le dictionnaire")
-
-            # Prédiction Automatique (même sur les messages en attente ⏰)
-            should_predict, game_number, predicted_value = card_predictor.should_predict(text)
-            if should_predict and game_number is not None and predicted_value is not None:
-                mode = "INTELLIGENT" if card_predictor.intelligent_mode_active else "PAR DÉFAUT"
-                logger.info(f"🎯 PRÉDICTION AUTOMATIQUE activée (Mode: {mode})")
-                logger.info(f"   Jeu source: N{game_number}")
-                logger.info(f"   Règle: {predicted_value}")
-
-                prediction_data = card_predictor.make_prediction(game_number, predicted_value)
-                logger.info(f"📤 Envoi de la prédiction au CANAL DE PRÉDICTION (ID: {prediction_channel_id})")
-                logger.info(f"   Message: {prediction_data['text']}")
-
-                result = bot.send_message(prediction_channel_id, prediction_data['text'])
-                if result:
-                    logger.info(f"✅ Prédiction envoyée avec succès (message_id: {result})")
-                    # Stocker l'ID du message pour mise à jour ultérieure
-                    target_game = prediction_data['target_game']
-                    if target_game in card_predictor.predictions:
-                        card_predictor.predictions[target_game]['prediction_message_id'] = result
-                else:
-                    logger.error(f"❌ Échec de l'envoi de la prédiction")
+            annotate(chat_id=chat_id)
+            # L'étape inclut le chargement et l'enregistrement de l'état partagé
+            with span('transaction'), card_predictor.transaction(str(target_channel_id)):
+                process_source_message(bot, text, chat_id, message_id)
 
         # 2. Traitement des commandes utilisateur (messages privés et groupes)
         elif text.startswith('/'):
@@ -368,16 +781,29 @@ def process_update(bot, update: Dict):
             # Traiter les commandes seulement si c'est un message privé ou d'un admin
             if chat_type == 'private' or str(chat_id) == admin_chat_id:
                 logger.info(f"✅ Traitement de la commande autorisé (private ou admin)")
+                annotate(chat_id=chat_id, command=text.split()[0][:32])
                 if text.startswith('/start'):
                     handle_start_command(bot, chat_id)
                 elif text.startswith('/help'):
                     handle_help_command(bot, chat_id)
                 elif text.startswith('/status'):
-                    handle_status_command(bot, chat_id)
+                    with card_predictor.transaction(str(target_channel_id)):
+                        handle_status_command(bot, chat_id)
                 elif text.startswith('/inter'):
-                    handle_inter_command(bot, chat_id)
+                    with card_predictor.transaction(str(target_channel_id)):
+                        handle_inter_command(bot, chat_id)
                 elif text.startswith('/defaut'):
-                    handle_defaut_command(bot, chat_id)
+                    with card_predictor.transaction(str(target_channel_id)):
+                        handle_defaut_command(bot, chat_id)
+                elif text.startswith('/stats'):
+                    handle_stats_command(bot, chat_id)
+                elif text.startswith('/regles'):
+                    handle_rules_command(bot, chat_id, text)
+                elif text.startswith('/ombre'):
+                    with card_predictor.transaction(str(target_channel_id)):
+                        handle_shadow_command(bot, chat_id, text)
+                elif text.startswith('/traces'):
+                    handle_traces_command(bot, chat_id, text)
                 elif text.startswith('/deploy'):
                     handle_deploy_command(bot, chat_id)
             else:
@@ -392,4 +818,5 @@ def process_update(bot, update: Dict):
         chat_id = callback_query['message']['chat']['id']
         message_id = callback_query['message']['message_id']
 
-        handle_callback_query(bot, callback_query_id, chat_id, message_id, data)
\ No newline at end of file
+        with card_predictor.transaction(str(target_channel_id)):
+            handle_callback_query(bot, callback_query_id, chat_id, message_id, data)
\ No newline at end of file
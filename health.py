@@ -0,0 +1,96 @@
+"""
+État de service servi par les routes de santé et d'accueil.
+Les informations Telegram (getWebhookInfo) sont rafraîchies en arrière-plan
+avec un TTL : une sonde de santé ne déclenche jamais d'appel réseau et
+répond en temps constant avec l'état courant du prédicteur. Le watchdog
+y ajoute les délais de traitement : statut 'degraded' (HTTP 503) quand une
+update est bloquée ou que getUpdates ne revient plus.
+"""
+
+import time
+import logging
+import threading
+from typing import Dict, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceStatus:
+    """Instantané de l'état du bot, mis à jour hors du chemin des requêtes."""
+
+    def __init__(self, bot, predictor, mode: str, ttl_seconds: float = 60.0, clock=time.time, outbox=None,
+                 watchdog=None):
+        self.bot = bot
+        self.predictor = predictor
+        self.outbox = outbox
+        self.watchdog = watchdog
+        self.mode = mode
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.started_at = clock()
+
+        self.webhook_info: Dict = {}
+        self.webhook_info_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # --- Rafraîchissement en arrière-plan ---
+
+    def start(self, refresh_webhook: bool = True):
+        """Démarre le rafraîchissement périodique de getWebhookInfo (mode webhook)."""
+        if not refresh_webhook or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._refresh_loop, name='service-status', daemon=True)
+        self._thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            self.refresh()
+            time.sleep(self.ttl_seconds)
+
+    def refresh(self):
+        try:
+            info = self.bot.get_webhook_info()
+            if info is not None:
+                self.webhook_info = info
+                self.webhook_info_at = self.clock()
+        except Exception as e:
+            logger.warning(f"⚠️ Rafraîchissement getWebhookInfo impossible : {e}")
+
+    # --- Lecture (O(1), sans réseau) ---
+
+    def snapshot(self) -> Dict:
+        now = self.clock()
+        predictor = self.predictor
+        last_update_at = predictor.last_update_at
+        watchdog = self.watchdog.status() if self.watchdog is not None else None
+
+        return {
+            'status': 'degraded' if watchdog and watchdog['reasons'] else 'healthy',
+            'bot_mode': self.mode,
+            'uptime_seconds': round(now - self.started_at, 1),
+            'predictor': {
+                'intelligent_mode_active': predictor.intelligent_mode_active,
+                'consecutive_failures': predictor.consecutive_failures,
+                'last_game_number': predictor.last_game_number,
+                'lag_seconds': round(now - last_update_at, 1) if last_update_at else None,
+                'pending_messages': len(predictor.pending_messages),
+                'predictions_tracked': len(predictor.predictions),
+                'history_size': len(predictor.draw_history),
+            },
+            'metrics': metrics.snapshot(),
+            'outbox': self.outbox.stats() if self.outbox is not None else None,
+            'watchdog': watchdog,
+            'webhook': {
+                'url': self.webhook_info.get('url') or None,
+                'pending_update_count': self.webhook_info.get('pending_update_count'),
+                'last_error_message': self.webhook_info.get('last_error_message'),
+                'age_seconds': round(now - self.webhook_info_at, 1) if self.webhook_info_at else None,
+            },
+        }
+
+
+def health_code(snapshot: Dict) -> int:
+    """Code HTTP de la sonde : 503 quand le traitement est bloqué (la plateforme redémarre l'instance)."""
+    return 200 if snapshot['status'] == 'healthy' else 503
@@ -0,0 +1,183 @@
+"""
+Import en flux d'un export de canal pour préremplir l'historique.
+Formats acceptés : export Telegram Desktop (result.json, souvent plusieurs
+centaines de Mo) et JSONL (un message par ligne). Le fichier est lu par
+morceaux, jamais chargé en entier. Chaque message passe par l'analyseur du
+canal source puis par record_draw (et dans l'archive si elle est fournie). L'import reprend après le dernier ID
+de message importé pour le canal (fichier de reprise) : un export plus récent
+du même canal n'ajoute que les nouveaux messages.
+"""
+
+import os
+import re
+import json
+import time
+import logging
+from typing import Dict, Iterator, Optional, TextIO
+
+logger = logging.getLogger(__name__)
+
+_MESSAGES_KEY = re.compile(r'"messages"\s*:\s*\[')
+_READ_SIZE = 1 << 20
+
+
+def message_text(message: Dict) -> str:
+    """Texte brut d'un message exporté (chaîne ou liste d'entités)."""
+    text = message.get('text', '')
+    if isinstance(text, str):
+        return text
+    return ''.join(part if isinstance(part, str) else part.get('text', '') for part in text)
+
+
+def iter_export_array(stream: TextIO) -> Iterator[Dict]:
+    """Parcourt le tableau "messages" d'un export Telegram Desktop, objet par objet."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+
+    # Avancer jusqu'au début du tableau des messages
+    while True:
+        chunk = stream.read(_READ_SIZE)
+        if not chunk:
+            return
+        buffer += chunk
+        match = _MESSAGES_KEY.search(buffer)
+        if match:
+            buffer = buffer[match.end():]
+            break
+        buffer = buffer[-64:]  # Garder de quoi reconnaître une clé coupée entre deux morceaux
+
+    index = 0
+    eof = False
+    while True:
+        # Sauter séparateurs et blancs
+        length = len(buffer)
+        while index < length and buffer[index] in ' \t\r\n,':
+            index += 1
+        if index < length and buffer[index] == ']':
+            return
+
+        try:
+            item, index = decoder.raw_decode(buffer, index)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = stream.read(_READ_SIZE)
+            eof = not chunk
+            buffer = buffer[index:] + chunk
+            index = 0
+            continue
+        yield item
+
+        if index > _READ_SIZE:
+            buffer = buffer[index:]
+            index = 0
+
+
+def iter_jsonl(stream: TextIO) -> Iterator[Dict]:
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_messages(path: str) -> Iterator[Dict]:
+    """Détecte le format (export Desktop ou JSONL) et produit les messages en flux."""
+    with open(path, 'r', encoding='utf-8') as stream:
+        head = stream.read(4096)
+        stream.seek(0)
+        is_jsonl = path.endswith('.jsonl') or (head.lstrip().startswith('{') and '\n{' in head and '"messages"' not in head)
+        yield from (iter_jsonl(stream) if is_jsonl else iter_export_array(stream))
+
+
+class HistoryImporter:
+    """Rejoue un export de canal dans le prédicteur, par lots transactionnels."""
+
+    def __init__(self, predictor, channel_key: str = 'default', checkpoint_path: Optional[str] = None,
+                 batch_size: int = 10000, archive=None):
+        self.predictor = predictor
+        self.archive = archive  # Archive des tirages (archive.DrawArchive), optionnelle
+        self.channel_key = channel_key
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = batch_size
+
+    # --- Reprise ---
+
+    def load_checkpoint(self) -> int:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return 0
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as handle:
+            checkpoint = json.load(handle)
+        if checkpoint.get('channel') != self.channel_key:
+            return 0
+        return int(checkpoint.get('last_message_id') or 0)
+
+    def save_checkpoint(self, path: str, last_message_id: int):
+        if not self.checkpoint_path:
+            return
+        temporary = self.checkpoint_path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as handle:
+            json.dump({
+                'channel': self.channel_key, 'source': os.path.abspath(path), 'last_message_id': last_message_id,
+            }, handle)
+        os.replace(temporary, self.checkpoint_path)
+
+    # --- Import ---
+
+    def run(self, path: str, resume: bool = True) -> Dict:
+        """Importe le fichier ; retourne les compteurs (messages lus, tirages importés, débit)."""
+        start_after = self.load_checkpoint() if resume else 0
+        if start_after:
+            logger.info(f"⏩ Reprise de l'import après le message {start_after}")
+
+        stats = {'messages': 0, 'skipped': 0, 'draws': 0, 'last_message_id': start_after}
+        started = time.perf_counter()
+        batch = []
+
+        for message in iter_messages(path):
+            stats['messages'] += 1
+            message_id = message.get('id') or message.get('message_id') or 0
+            if message_id and message_id <= start_after:
+                stats['skipped'] += 1
+                continue
+            text = message_text(message)
+            if '#' not in text or '⏰' in text:  # Sans numéro de jeu ou non finalisé : ignoré sans analyse
+                stats['last_message_id'] = max(stats['last_message_id'], message_id)
+                continue
+            batch.append((message_id, text))
+            if len(batch) >= self.batch_size:
+                self._import_batch(path, batch, stats)
+                batch = []
+
+        if batch:
+            self._import_batch(path, batch, stats)
+
+        elapsed = time.perf_counter() - started
+        stats['seconds'] = round(elapsed, 3)
+        stats['messages_per_second'] = round(stats['messages'] / elapsed) if elapsed else None
+        logger.info(
+            f"📥 Import terminé : {stats['draws']} tirages sur {stats['messages']} messages "
+            f"({stats['messages_per_second']} msg/s)"
+        )
+        return stats
+
+    def _import_batch(self, path: str, batch, stats: Dict):
+        predictor, archive = self.predictor, self.archive
+        parse, record_draw = predictor.parse, predictor.record_draw
+        records = []
+        draws = 0
+        with predictor.transaction(self.channel_key):
+            for message_id, text in batch:
+                parsed = parse(text, b'')  # Empreinte inutile hors du chemin des updates
+                game_number = parsed.game_number
+                if game_number:
+                    draws += record_draw(game_number, text, parsed, message_id)
+                    if archive is not None and parsed.is_complete:
+                        records.append(archive.record(
+                            'draw', game_number, message_id=message_id, first_group=parsed.first_group,
+                            second_group=parsed.second_group, has_dame=parsed.has_dame, imported=True,
+                        ))
+            stats['last_message_id'] = max(stats['last_message_id'], max(message_id for message_id, _ in batch))
+        stats['draws'] += draws
+        if records:
+            archive.extend(records)  # Une écriture par lot
+        self.save_checkpoint(path, stats['last_message_id'])
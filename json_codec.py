@@ -0,0 +1,36 @@
+"""
+Codec JSON des corps de webhook et des appels à l'API Telegram.
+Utilise orjson s'il est installé (optionnel), sinon le module json standard.
+Toutes les fonctions produisent et acceptent des bytes UTF-8.
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # Dépendance optionnelle
+    orjson = None
+
+if orjson is not None:
+    BACKEND = 'orjson'
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    def loads(data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+else:
+    BACKEND = 'json'
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    def dumps(obj: Any) -> bytes:
+        return _encoder.encode(obj).encode('utf-8')
+
+    def loads(data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+
+def dumps_str(obj: Any) -> str:
+    """Sérialise en texte (ex : reply_markup pré-sérialisé une fois pour toutes)."""
+    return dumps(obj).decode('utf-8')
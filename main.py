@@ -3,53 +3,75 @@ Point d'entrée principal (main.py)
 Gère l'initialisation de l'application Flask et l'écoute du Webhook.
 """
 
+import startup_timing  # En premier : mesure du démarrage à froid
 import os
 import logging
-from flask import Flask, jsonify, request
-from config import Config
-from bot import TelegramBot
-from handlers import process_update # La logique de traitement est appelée ici
 
+# Configurer les logs avant les imports du projet (la Config est journalisée une seule fois)
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+from flask import Flask, jsonify
+startup_timing.mark('import flask')
+from config import get_config
+from bot import TelegramBot
+from handlers import card_predictor, outbox, process_update, timeseries, watchdog # La logique de traitement est appelée ici
+from health import ServiceStatus, health_code
+from webhook import ok_response, read_update, reject_request, timeseries_response, traces_response
+startup_timing.mark('import bot/handlers')
+
 # --- Initialisation ---
-config = Config()
+config = get_config()
 
 if not config.BOT_TOKEN:
     logger.critical("❌ FATAL - BOT_TOKEN n'est pas configuré. Le bot ne peut pas démarrer.")
     config.BOT_TOKEN = ""
 
 # Créer l'instance du bot pour l'API Telegram
-bot = TelegramBot(config.BOT_TOKEN)
+bot = TelegramBot(config.BOT_TOKEN, config.TELEGRAM_API_BASE)
+outbox.bind(bot)  # Rejoue les envois de la boîte d'envoi restés en attente
+
+# État de service mis en cache (aucun appel Telegram par requête de santé)
+service_status = ServiceStatus(bot, card_predictor, "webhook", config.HEALTH_CACHE_TTL, outbox=outbox,
+                               watchdog=watchdog)
+watchdog.start()  # Webhook : pas de silence attendu, seules les updates bloquées comptent
+if config.BOT_TOKEN:
+    service_status.start()
 
 # --- Application Flask ---
 app = Flask(__name__)
 application = app # Pour Gunicorn (Web Service)
+app.config['MAX_CONTENT_LENGTH'] = config.WEBHOOK_MAX_BODY_BYTES
+startup_timing.mark('application flask')
 
 # --- Routes Standardes ---
 
 @app.route('/health', methods=['GET'])
 def health():
     """Endpoint requis par Render pour vérifier que le service est actif."""
-    return jsonify({"status": "healthy", "bot_mode": "webhook"}), 200
+    snapshot = service_status.snapshot()
+    return jsonify(snapshot), health_code(snapshot)
+
+@app.route('/debug/traces', methods=['GET'])
+def debug_traces():
+    """Traces récentes de l'enregistreur de vol de ce worker (en-tête X-Debug-Token requis)."""
+    return traces_response(config.WEBHOOK_SECRET_TOKEN)
+
+@app.route('/timeseries', methods=['GET'])
+def timeseries_route():
+    """Séries temporelles par canal et par règle, pour tableaux de bord (en-tête X-Debug-Token requis)."""
+    return timeseries_response(config.WEBHOOK_SECRET_TOKEN, timeseries)
 
 @app.route('/', methods=['GET'])
 def home():
-    """Page d'accueil."""
-    webhook_info_url = f"https://api.telegram.org/bot{config.BOT_TOKEN}/getWebhookInfo"
-    try:
-        import requests
-        response = requests.get(webhook_info_url, timeout=5)
-        webhook_info = response.json() if response.status_code == 200 else {}
-    except:
-        webhook_info = {}
-    
+    """Page d'accueil (servie depuis l'état en cache)."""
+    snapshot = service_status.snapshot()
     return jsonify({
         "message": "Telegram Bot Predictor is running (Webhook mode)", 
         "status": "active",
-        "webhook_configured": webhook_info.get('result', {}).get('url', 'Non configuré'),
-        "bot_token_configured": bool(config.BOT_TOKEN)
+        "webhook_configured": snapshot['webhook']['url'] or 'Non configuré',
+        "bot_token_configured": bool(config.BOT_TOKEN),
+        "predictor": snapshot['predictor']
     }), 200
 
 @app.route('/test_bot', methods=['GET'])
@@ -82,7 +104,7 @@ def set_webhook_route():
     
     webhook_url = f"https://{EXTERNAL_URL}/webhook"
     
-    if bot.set_webhook(webhook_url):
+    if bot.set_webhook(webhook_url, config.WEBHOOK_SECRET_TOKEN):
         return jsonify({"status": "success", "message": f"✅ Webhook configuré avec succès vers : {webhook_url}"}), 200
     else:
         return jsonify({"status": "error", "message": "❌ Échec de la configuration du Webhook (voir les logs pour l'erreur API)."}), 500
@@ -100,18 +122,17 @@ def delete_webhook_route():
 @app.route('/webhook', methods=['POST'])
 def telegram_webhook():
     """Route écoutant les updates POST envoyées par Telegram."""
+    rejection = reject_request(config.WEBHOOK_SECRET_TOKEN, config.WEBHOOK_MAX_BODY_BYTES)
+    if rejection is not None:
+        return rejection
+
     try:
         logger.info("📨 Webhook appelé - Requête reçue")
         
-        if not request.is_json:
-            logger.warning("⚠️ Requête non-JSON reçue")
-            return jsonify({"status": "ok"}), 200
-        
-        update = request.get_json()
-        
+        update = read_update()
         if not update:
-            logger.warning("⚠️ Update vide reçu")
-            return jsonify({"status": "ok"}), 200
+            return ok_response()
+        watchdog.polled()
         
         logger.info("📥 Update reçu de Telegram")
         
@@ -123,13 +144,15 @@ def telegram_webhook():
             import traceback
             logger.error(traceback.format_exc())
         
-        return jsonify({"status": "ok"}), 200
+        return ok_response()
         
     except Exception as e:
         logger.error(f"❌ Erreur critique dans telegram_webhook: {e}")
         import traceback
         logger.error(traceback.format_exc())
-        return jsonify({"status": "ok"}), 200
+        return ok_response()
+
+startup_timing.report("application webhook prête")
 
 # --- Lancement du Programme ---
 
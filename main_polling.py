@@ -4,25 +4,60 @@ Le bot interroge continuellement Telegram pour obtenir les nouvelles mises à jo
 Un serveur HTTP minimal tourne sur le port configuré pour satisfaire Render.com.
 """
 
+import startup_timing  # En premier : mesure du démarrage à froid
+import json
 import logging
 import time
 import threading
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from config import Config
-from bot import TelegramBot
-from handlers import process_update
+from urllib.parse import parse_qs, urlsplit
 
+# Configurer les logs avant les imports du projet (la Config est journalisée une seule fois)
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from config import get_config
+from bot import TelegramBot
+from handlers import card_predictor, catch_up, outbox, process_update, timeseries, watchdog
+from flight_recorder import DEBUG_TOKEN_HEADER, recorder, token_matches
+from health import ServiceStatus, health_code
+startup_timing.mark('imports')
+
 class HealthCheckHandler(BaseHTTPRequestHandler):
     """Gestionnaire HTTP minimal pour le health check de Render.com"""
     def do_GET(self):
-        self.send_response(200)
-        self.send_header('Content-type', 'text/plain')
+        url = urlsplit(self.path)
+        if url.path in ('/debug/traces', '/timeseries'):
+            self.send_debug(url.path, {name: values[0] for name, values in parse_qs(url.query).items()})
+            return
+        snapshot = service_status.snapshot()
+        self.send_json(snapshot, health_code(snapshot))
+
+    def send_json(self, payload, status: int = 200):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
         self.end_headers()
-        self.wfile.write(b'Bot Telegram en mode POLLING - OK')
-    
+        self.wfile.write(body)
+
+    def send_debug(self, path: str, args):
+        """Traces de l'enregistreur de vol (?lentes=1) ou séries temporelles (?resolution, ?series, ?count),
+        jeton X-Debug-Token requis."""
+        if not token_matches(self.headers.get(DEBUG_TOKEN_HEADER), config.WEBHOOK_SECRET_TOKEN):
+            self.send_response(403)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if path == '/debug/traces':
+            self.send_json(recorder.dump(slow_only=args.get('lentes') == '1'))
+            return
+        try:
+            count = int(args['count']) if args.get('count') else None
+            self.send_json(timeseries.query(args.get('resolution', 'hour'), args.get('series', ''), count))
+        except ValueError as e:
+            self.send_json({'error': str(e)}, 400)
+
     def log_message(self, format, *args):
         # Désactiver les logs HTTP pour ne pas polluer la console
         pass
@@ -34,14 +69,18 @@ def start_health_server(port):
     server.serve_forever()
 
 # --- Initialisation ---
-config = Config()
+config = get_config()
 
 if not config.BOT_TOKEN:
     logger.critical("❌ FATAL - BOT_TOKEN n'est pas configuré. Le bot ne peut pas démarrer.")
     exit(1)
 
 # Créer l'instance du bot
-bot = TelegramBot(config.BOT_TOKEN)
+bot = TelegramBot(config.BOT_TOKEN, config.TELEGRAM_API_BASE)
+outbox.bind(bot)  # Rejoue les envois de la boîte d'envoi restés en attente
+
+# État servi par le health check (pas de getWebhookInfo en mode polling)
+service_status = ServiceStatus(bot, card_predictor, "polling", outbox=outbox, watchdog=watchdog)
 
 def run_polling():
     """Lance le bot en mode polling (long polling)."""
@@ -57,7 +96,8 @@ def run_polling():
     # Supprimer le webhook pour activer le polling
     logger.info("🔄 Suppression du webhook (si configuré)...")
     bot.delete_webhook()
-    time.sleep(2)
+    startup_timing.mark('deleteWebhook')
+    watchdog.start(config.WATCHDOG_POLL_SECONDS)
     
     logger.info("✅ Mode Polling activé - Le bot écoute maintenant les messages...")
     logger.info("💡 Surveillance active du canal source en cours...")
@@ -70,10 +110,17 @@ def run_polling():
     while True:
         try:
             # Récupérer les mises à jour (long polling avec timeout de 30s)
+            startup_timing.report("premier getUpdates")
             updates = bot.get_updates(offset=offset, timeout=30)
+            if bot.last_error() is None:
+                watchdog.polled()
             
             if updates:
                 logger.info(f"📥 {len(updates)} nouvelle(s) mise(s) à jour reçue(s)")
+
+                # Arriéré détecté : rattrapage en masse (éditions regroupées, prédictions périmées supprimées)
+                catch_up.begin_batch(updates)
+                batch_bot = catch_up.bot_for(bot)
                 
                 for update in updates:
                     update_id = update.get('update_id')
@@ -83,8 +130,9 @@ def run_polling():
                     
                     # Traiter la mise à jour
                     try:
-                        process_update(bot, update)
-                        logger.info(f"✅ Mise à jour {update_id} traitée avec succès")
+                        process_update(batch_bot, update)
+                        if not catch_up.active:
+                            logger.info(f"✅ Mise à jour {update_id} traitée avec succès")
                     except Exception as e:
                         logger.error(f"❌ Erreur lors du traitement de la mise à jour {update_id}: {e}")
                         import traceback
@@ -92,6 +140,8 @@ def run_polling():
                     
                     # Mettre à jour l'offset pour ignorer les messages déjà traités
                     offset = update_id + 1
+
+                catch_up.end_batch(bot)
                 
                 # Réinitialiser le compteur d'erreurs après succès
                 error_count = 0
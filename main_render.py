@@ -3,27 +3,31 @@ Point d'entrée pour Render.com - MODE POLLING PUR
 Le bot fonctionne sans Flask/Webhook
 """
 
-import os
+import startup_timing  # En premier : mesure du démarrage à froid
 import logging
 import time
-from config import Config
-from bot import TelegramBot
-from handlers import process_update
 
+# Configurer les logs avant les imports du projet (la Config est journalisée une seule fois)
 logging.basicConfig(
     level=logging.INFO, 
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 
+from config import get_config
+from bot import TelegramBot
+from handlers import catch_up, outbox, process_update, watchdog
+startup_timing.mark('imports')
+
 # --- Initialisation ---
-config = Config()
+config = get_config()
 
 if not config.BOT_TOKEN:
     logger.critical("❌ FATAL - BOT_TOKEN n'est pas configuré")
     exit(1)
 
-bot = TelegramBot(config.BOT_TOKEN)
+bot = TelegramBot(config.BOT_TOKEN, config.TELEGRAM_API_BASE)
+outbox.bind(bot)  # Rejoue les envois de la boîte d'envoi restés en attente
 
 # --- Fonction de Polling ---
 def start_polling():
@@ -41,24 +45,32 @@ def start_polling():
     # Supprimer le webhook s'il existe
     logger.info("🔧 Suppression du webhook existant...")
     bot.delete_webhook()
-    time.sleep(1)
+    startup_timing.mark('deleteWebhook')
+    watchdog.start(config.WATCHDOG_POLL_SECONDS)  # Pas de route de santé ici : piles journalisées
     
     offset = 0
     logger.info("🚀 Démarrage du polling...")
     
     while True:
         try:
+            startup_timing.report("premier getUpdates")
             updates = bot.get_updates(offset=offset, timeout=30)
+            if bot.last_error() is None:
+                watchdog.polled()
             
             if updates:
+                # Arriéré détecté : rattrapage en masse (éditions regroupées, prédictions périmées supprimées)
+                catch_up.begin_batch(updates)
+                batch_bot = catch_up.bot_for(bot)
                 for update in updates:
                     try:
-                        process_update(bot, update)
+                        process_update(batch_bot, update)
                         offset = update['update_id'] + 1
                     except Exception as e:
                         logger.error(f"❌ Erreur traitement update: {e}")
                         import traceback
                         logger.error(traceback.format_exc())
+                catch_up.end_batch(bot)
             
         except Exception as e:
             logger.error(f"❌ Erreur polling: {e}")
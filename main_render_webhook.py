@@ -4,41 +4,63 @@ Le bot utilise Flask pour recevoir les webhooks de Telegram
 Notification automatique après déploiement
 """
 
+import startup_timing  # En premier : mesure du démarrage à froid
 import os
 import logging
-import time
-import requests
-from flask import Flask, request, jsonify
-from config import Config
-from bot import TelegramBot
-from handlers import process_update
 
+# Configurer les logs avant les imports du projet (la Config est journalisée une seule fois)
 logging.basicConfig(
     level=logging.INFO, 
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 
+from flask import Flask, jsonify
+startup_timing.mark('import flask')
+from config import get_config
+from bot import TelegramBot
+from handlers import card_predictor, outbox, process_update, timeseries, watchdog
+from health import ServiceStatus, health_code
+from webhook import ok_response, read_update, reject_request, timeseries_response, traces_response
+startup_timing.mark('import bot/handlers')
+
 # --- Initialisation ---
-config = Config()
+config = get_config()
 
 if not config.BOT_TOKEN:
     logger.critical("❌ FATAL - BOT_TOKEN n'est pas configuré")
     exit(1)
 
-bot = TelegramBot(config.BOT_TOKEN)
+bot = TelegramBot(config.BOT_TOKEN, config.TELEGRAM_API_BASE)
+outbox.bind(bot)  # Rejoue les envois de la boîte d'envoi restés en attente
+service_status = ServiceStatus(bot, card_predictor, "webhook", config.HEALTH_CACHE_TTL, outbox=outbox,
+                               watchdog=watchdog)
+watchdog.start()  # Webhook : pas de silence attendu, seules les updates bloquées comptent
+service_status.start()
 
 # --- Application Flask ---
 app = Flask(__name__)
 application = app  # Pour Gunicorn
+app.config['MAX_CONTENT_LENGTH'] = config.WEBHOOK_MAX_BODY_BYTES
 
 # Variable globale pour tracker si la notification a été envoyée
 notification_sent = False
 
 @app.route('/health', methods=['GET'])
 def health():
-    """Endpoint de santé requis par Render"""
-    return jsonify({"status": "healthy", "bot_mode": "webhook"}), 200
+    """Endpoint de santé requis par Render (état en cache, sans appel réseau)"""
+    snapshot = service_status.snapshot()
+    return jsonify(snapshot), health_code(snapshot)
+
+@app.route('/debug/traces', methods=['GET'])
+def debug_traces():
+    """Traces récentes de l'enregistreur de vol de ce worker (en-tête X-Debug-Token requis)."""
+    return traces_response(config.WEBHOOK_SECRET_TOKEN)
+
+@app.route('/timeseries', methods=['GET'])
+def timeseries_route():
+    """Séries temporelles par canal et par règle, pour tableaux de bord (en-tête X-Debug-Token requis)."""
+    return timeseries_response(config.WEBHOOK_SECRET_TOKEN, timeseries)
 
 @app.route('/', methods=['GET'])
 def home():
@@ -50,6 +72,7 @@ def home():
         "message": "🤖 Bot Telegram DAME - Mode Webhook",
         "status": "active",
         "webhook_url": webhook_info,
+        "webhook_registered": service_status.snapshot()['webhook']['url'],
         "bot_token_configured": bool(config.BOT_TOKEN),
         "admin_chat_id": config.ADMIN_CHAT_ID
     }), 200
@@ -59,18 +82,17 @@ def telegram_webhook():
     """Route principale pour recevoir les webhooks de Telegram"""
     global notification_sent
     
+    rejection = reject_request(config.WEBHOOK_SECRET_TOKEN, config.WEBHOOK_MAX_BODY_BYTES)
+    if rejection is not None:
+        return rejection
+
     try:
         logger.info("📨 Webhook appelé - Requête reçue")
         
-        if not request.is_json:
-            logger.warning("⚠️ Requête non-JSON reçue")
-            return jsonify({"status": "ok"}), 200
-        
-        update = request.get_json()
-        
+        update = read_update()
         if not update:
-            logger.warning("⚠️ Update vide reçu")
-            return jsonify({"status": "ok"}), 200
+            return ok_response()
+        watchdog.polled()
         
         logger.info("📥 Update reçu de Telegram")
         
@@ -99,13 +121,13 @@ def telegram_webhook():
             import traceback
             logger.error(traceback.format_exc())
         
-        return jsonify({"status": "ok"}), 200
+        return ok_response()
         
     except Exception as e:
         logger.error(f"❌ Erreur critique dans telegram_webhook: {e}")
         import traceback
         logger.error(traceback.format_exc())
-        return jsonify({"status": "ok"}), 200
+        return ok_response()
 
 @app.route('/set_webhook', methods=['GET'])
 def set_webhook_route():
@@ -117,7 +139,7 @@ def set_webhook_route():
     
     webhook_url = f"https://{render_url}/webhook"
     
-    if bot.set_webhook(webhook_url):
+    if bot.set_webhook(webhook_url, config.WEBHOOK_SECRET_TOKEN):
         return jsonify({
             "status": "success", 
             "message": f"✅ Webhook configuré : {webhook_url}"
@@ -149,16 +171,13 @@ def configure_webhook_on_startup():
     logger.info(f"🔧 Configuration automatique du webhook...")
     logger.info(f"📍 URL: {webhook_url}")
     
-    # Attendre que le serveur soit prêt
-    time.sleep(2)
-    
     # Supprimer l'ancien webhook
     bot.delete_webhook()
-    time.sleep(1)
     
     # Configurer le nouveau webhook
-    if bot.set_webhook(webhook_url):
+    if bot.set_webhook(webhook_url, config.WEBHOOK_SECRET_TOKEN):
         logger.info(f"✅ Webhook configuré avec succès")
+        startup_timing.report("webhook configuré")
         
         # Envoyer un message de test à l'admin
         if config.ADMIN_CHAT_ID:
@@ -0,0 +1,26 @@
+"""
+Compteurs de service du processus (requêtes rejetées, erreurs...).
+Simples et thread-safe ; exposés par les routes de santé.
+"""
+
+import threading
+from collections import Counter
+from typing import Dict
+
+_lock = threading.Lock()
+_counters: Counter = Counter()
+
+
+def incr(name: str, amount: int = 1):
+    with _lock:
+        _counters[name] += amount
+
+
+def get(name: str) -> int:
+    with _lock:
+        return _counters[name]
+
+
+def snapshot() -> Dict[str, int]:
+    with _lock:
+        return dict(_counters)
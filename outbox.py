@@ -0,0 +1,324 @@
+"""
+Boîte d'envoi durable du canal de prédiction.
+Chaque envoi ou édition est enregistré (SQLite, WAL) AVANT l'appel à
+Telegram, sous une clé d'idempotence : un même message logique n'est
+enregistré, donc envoyé, qu'une fois. Une première tentative est faite
+immédiatement ; en cas d'échec, un thread dédié réessaie avec un délai
+exponentiel (ou le retry_after d'un 429), et rejoue au redémarrage ce
+qu'un processus arrêté n'a pas livré.
+
+Une édition référence l'envoi dont elle modifie le message : tant que
+l'envoi n'est pas livré, elle remplace simplement son texte ; ensuite,
+seule la dernière version est livrée. Plusieurs workers peuvent partager
+le même fichier : chaque livraison est réservée par un bail.
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from typing import Dict, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+PENDING, DELIVERED, DEAD = 0, 1, 2
+STATUS_NAMES = {PENDING: 'pending', DELIVERED: 'delivered', DEAD: 'dead'}
+
+# Erreurs Telegram définitives (requête invalide, bot retiré du canal, message supprimé)
+PERMANENT_ERROR_CODES = (400, 403, 404)
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS outbox ("
+    " key TEXT PRIMARY KEY, method TEXT NOT NULL, chat_id TEXT NOT NULL, text TEXT NOT NULL,"
+    " ref TEXT, status INTEGER NOT NULL DEFAULT 0, attempts INTEGER NOT NULL DEFAULT 0,"
+    " due REAL NOT NULL, lease REAL NOT NULL DEFAULT 0, message_id INTEGER, error TEXT,"
+    " created REAL NOT NULL, updated REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, due)",
+    "CREATE INDEX IF NOT EXISTS outbox_ref ON outbox (ref)",
+)
+
+
+class Outbox:
+    """Envois et éditions durables, livrés une fois par clé d'idempotence."""
+
+    def __init__(self, path: str = ':memory:', lease_seconds: float = 90.0, base_delay: float = 1.0,
+                 max_delay: float = 300.0, max_attempts: int = 15, retention_seconds: float = 21600.0,
+                 poll_interval: float = 1.0, batch_size: int = 100, clock=time.time):
+        self.path = path or ':memory:'
+        self.lease_seconds = lease_seconds  # Supérieur au timeout HTTP du bot (30 s)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.retention_seconds = retention_seconds  # Clés livrées conservées (dédoublonnage)
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid: Optional[int] = None
+        self._bot = None
+        self._wakeup = threading.Event()
+        self._dispatcher: Optional[threading.Thread] = None
+        self._paused_until: Dict[str, float] = {}  # Canal → fin du retry_after (429)
+        self._stats: Dict[str, int] = {}
+        self._last_purge = 0.0
+
+    # --- Stockage ---
+
+    def _connect(self):
+        # Une connexion par processus (reconnexion après fork), partagée par les threads sous verrou
+        pid = os.getpid()
+        if self._conn is None or self._pid != pid:
+            import sqlite3
+
+            self._conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None, check_same_thread=False)
+            if self.path != ':memory:':
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+            self._pid = pid
+            self._dispatcher = None
+        return self._conn
+
+    def _execute(self, sql: str, params=()):
+        with self._lock:
+            return self._connect().execute(sql, params)
+
+    def get(self, key: str) -> Optional[Dict]:
+        row = self._execute(
+            "SELECT key, method, chat_id, text, ref, status, attempts, message_id, error FROM outbox WHERE key = ?",
+            (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('key', 'method', 'chat_id', 'text', 'ref', 'status', 'attempts', 'message_id', 'error'), row))
+
+    # --- Enregistrement ---
+
+    def send(self, bot, key: str, chat_id, text: str, inline: bool = True) -> Optional[int]:
+        """Enregistre l'envoi `key` puis tente de le livrer ; retourne l'ID du message s'il est livré.
+
+        Une clé déjà enregistrée n'est pas renvoyée : son ID de message (ou None) est retourné.
+        """
+        now = self.clock()
+        inserted = self._execute(
+            "INSERT OR IGNORE INTO outbox (key, method, chat_id, text, due, created, updated) "
+            "VALUES (?, 'send', ?, ?, ?, ?, ?)", (key, str(chat_id), text, now, now, now)
+        ).rowcount
+        if not inserted:
+            metrics.incr('outbox_deduplicated')
+            entry = self.get(key)
+            return entry['message_id'] if entry else None
+        metrics.incr('outbox_enqueued')
+        return self._after_enqueue(bot, key, inline)
+
+    def edit(self, bot, ref: str, text: str, inline: bool = True) -> bool:
+        """Remplace le texte du message envoyé sous la clé `ref` ; True si la nouvelle version est livrée.
+
+        Envoi pas encore livré : son texte est remplacé (un seul message, déjà à jour).
+        Sinon l'édition `edit:<ref>` est (ré)enregistrée ; seule la dernière version compte.
+        """
+        now = self.clock()
+        merged = self._execute(
+            "UPDATE outbox SET text = ?, updated = ? WHERE key = ? AND status = ? AND lease < ?",
+            (text, now, ref, PENDING, now)
+        ).rowcount
+        if merged:
+            metrics.incr('outbox_coalesced')
+            return self._after_enqueue(bot, ref, inline) is not None
+
+        sent = self._execute("SELECT chat_id FROM outbox WHERE key = ? AND method = 'send'", (ref,)).fetchone()
+        if sent is None:
+            logger.warning(f"⚠️ Boîte d'envoi : édition de {ref} sans envoi enregistré - ignorée")
+            return False
+        key = f"edit:{ref}"
+        changed = self._execute(
+            "INSERT INTO outbox (key, method, chat_id, text, ref, due, created, updated) "
+            "VALUES (?, 'edit', ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET text = excluded.text, status = ?, attempts = 0, error = NULL, "
+            "due = excluded.due, updated = excluded.updated WHERE outbox.text != excluded.text",
+            (key, sent[0], text, ref, now, now, now, PENDING)
+        ).rowcount
+        if not changed:
+            metrics.incr('outbox_deduplicated')  # Même texte déjà enregistré
+            return False
+        metrics.incr('outbox_enqueued')
+        return self._after_enqueue(bot, key, inline) is not None
+
+    def _after_enqueue(self, bot, key: str, inline: bool):
+        self.bind(bot)
+        result = self._deliver(key) if inline else None
+        if result is None:
+            self._wakeup.set()
+        return result
+
+    # --- Livraison ---
+
+    def bind(self, bot):
+        """Bot utilisé par le thread de livraison ; démarre ce thread si besoin (après un fork aussi)."""
+        if bot is not None:
+            self._bot = bot
+        with self._lock:
+            self._connect()
+            if self._dispatcher is None or not self._dispatcher.is_alive():
+                self._dispatcher = threading.Thread(target=self._dispatch_loop, name='outbox', daemon=True)
+                self._dispatcher.start()
+
+    def _claim(self, key: str, now: float) -> Optional[tuple]:
+        """Réserve une entrée due (bail) ; None si elle est livrée, réservée ailleurs ou pas encore due."""
+        with self._lock:
+            conn = self._connect()
+            claimed = conn.execute(
+                "UPDATE outbox SET lease = ? WHERE key = ? AND status = ? AND due <= ? AND lease < ?",
+                (now + self.lease_seconds, key, PENDING, now, now)
+            ).rowcount
+            if not claimed:
+                return None
+            return conn.execute(
+                "SELECT method, chat_id, text, ref, attempts FROM outbox WHERE key = ?", (key,)
+            ).fetchone()
+
+    def _deliver(self, key: str) -> Optional[int]:
+        """Une tentative de livraison ; retourne l'ID du message (envoi) ou 1 (édition) si livrée."""
+        bot = self._bot
+        now = self.clock()
+        entry = self._claim(key, now) if bot is not None else None
+        if entry is None:
+            return None
+        method, chat_id, text, ref, attempts = entry
+
+        if self._paused_until.get(chat_id, 0.0) > now:
+            return self._retry(key, attempts, text, None, self._paused_until[chat_id], count=False)
+
+        message_id = None
+        if method == 'edit':
+            target = self._execute("SELECT status, message_id FROM outbox WHERE key = ?", (ref,)).fetchone()
+            if target is None or target[0] == DEAD:
+                return self._fail(key, text, "message d'origine non livré")
+            if target[0] != DELIVERED:
+                # Envoi d'origine encore en cours (bail d'un autre worker) : attendre sa livraison
+                return self._retry(key, attempts, text, None, now + self.base_delay, count=False)
+            message_id = target[1]
+
+        try:
+            if method == 'send':
+                result = bot.send_message(chat_id, text)
+            else:
+                result = bot.edit_message_text(chat_id, message_id, text)
+        except Exception as e:
+            result = None
+            logger.error(f"❌ Boîte d'envoi : exception à la livraison de {key} : {e}")
+        error = _last_error(bot) if not result else None
+
+        if result or (method == 'edit' and error and 'not modified' in (error.get('description') or '')):
+            self._execute(
+                "UPDATE outbox SET status = ?, lease = 0, message_id = ?, error = NULL, updated = ? "
+                "WHERE key = ? AND text = ?",
+                (DELIVERED, result if method == 'send' else message_id, self.clock(), key, text)
+            )
+            # Texte remplacé pendant l'appel (édition) : reste en attente pour la dernière version
+            self._execute("UPDATE outbox SET lease = 0 WHERE key = ?", (key,))
+            metrics.incr('outbox_delivered')
+            if attempts:
+                logger.info(f"✅ Boîte d'envoi : {key} livré après {attempts + 1} tentatives")
+            return result if method == 'send' else 1
+
+        code = error.get('error_code') if error else None
+        description = (error or {}).get('description') or 'pas de réponse'
+        if code in PERMANENT_ERROR_CODES:
+            return self._fail(key, text, f"{code} {description}")
+        retry_after = (error or {}).get('retry_after')
+        if code == 429 and retry_after:
+            self._paused_until[chat_id] = now + float(retry_after)
+            return self._retry(key, attempts, text, description, now + float(retry_after))
+        delay = min(self.max_delay, self.base_delay * 2 ** attempts) * (0.5 + random.random() / 2)
+        return self._retry(key, attempts, text, description, now + delay)
+
+    def _retry(self, key: str, attempts: int, text: str, error: Optional[str], due: float, count: bool = True):
+        if count:
+            attempts += 1
+            metrics.incr('outbox_retries')
+            if attempts >= self.max_attempts:
+                return self._fail(key, text, error)
+            logger.warning(f"⚠️ Boîte d'envoi : {key} non livré ({error}), tentative {attempts + 1} "
+                           f"dans {due - self.clock():.0f} s")
+        self._execute(
+            "UPDATE outbox SET attempts = ?, due = ?, lease = 0, error = COALESCE(?, error), updated = ? WHERE key = ?",
+            (attempts, due, error, self.clock(), key)
+        )
+        return None
+
+    def _fail(self, key: str, text: str, error: Optional[str]):
+        self._execute(
+            "UPDATE outbox SET status = ?, lease = 0, error = ?, updated = ? WHERE key = ? AND text = ?",
+            (DEAD, error, self.clock(), key, text)
+        )
+        self._execute("UPDATE outbox SET lease = 0 WHERE key = ?", (key,))
+        metrics.incr('outbox_dead')
+        logger.error(f"❌ Boîte d'envoi : {key} abandonné ({error})")
+        return None
+
+    # --- Thread de livraison ---
+
+    def _dispatch_loop(self):
+        while self._pid == os.getpid():
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            try:
+                self.drain()
+            except Exception as e:
+                logger.error(f"❌ Boîte d'envoi : erreur du thread de livraison : {e}")
+
+    def drain(self) -> int:
+        """Tente toutes les entrées dues (rejeu compris) ; retourne le nombre d'entrées livrées."""
+        delivered = 0
+        now = self.clock()
+        while True:
+            keys = [row[0] for row in self._execute(
+                "SELECT key FROM outbox WHERE status = ? AND due <= ? AND lease < ? ORDER BY due LIMIT ?",
+                (PENDING, now, now, self.batch_size)
+            ).fetchall()]
+            for key in keys:
+                if self._deliver(key) is not None:
+                    delivered += 1
+            if len(keys) < self.batch_size:
+                break
+        self._refresh_stats(now)
+        return delivered
+
+    def _refresh_stats(self, now: float):
+        if now - self._last_purge >= 60.0:
+            self._last_purge = now
+            purged = self._execute(
+                "DELETE FROM outbox WHERE status != ? AND updated < ?", (PENDING, now - self.retention_seconds)
+            ).rowcount
+            if purged:
+                logger.info(f"🧹 Boîte d'envoi : {purged} entrées anciennes supprimées")
+        counts = dict(self._execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+        oldest = self._execute("SELECT MIN(created) FROM outbox WHERE status = ?", (PENDING,)).fetchone()[0]
+        self._stats = {STATUS_NAMES[status]: counts.get(status, 0) for status in STATUS_NAMES}
+        self._stats['oldest_pending_seconds'] = round(now - oldest, 1) if oldest else None
+
+    def stats(self) -> Dict:
+        """Dernier décompte (pending, delivered, dead) relevé par le thread de livraison, sans requête."""
+        return dict(self._stats)
+
+
+def _last_error(bot) -> Optional[Dict]:
+    """Dernière erreur API du thread courant (TelegramBot.last_error), si le bot la fournit."""
+    last_error = getattr(bot, 'last_error', None)
+    return last_error() if callable(last_error) else None
+
+
+def build_outbox(path: Optional[str], **options) -> Outbox:
+    """Boîte d'envoi dans le fichier `path` ; en mémoire (réessais sans durabilité) si vide."""
+    if path:
+        logger.info(f"📮 Boîte d'envoi durable : {os.path.abspath(path)}")
+    else:
+        logger.warning("⚠️ OUTBOX_PATH vide : boîte d'envoi en mémoire (non rejouée au redémarrage)")
+    return Outbox(path or ':memory:', **options)
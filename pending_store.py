@@ -0,0 +1,118 @@
+"""
+Suivi borné des messages en attente (⏰) du canal source.
+Seuls l'ID du message, les instants de réception et, pour la prédiction
+anticipée, le premier groupe analysé et les prédictions déjà émises sont
+conservés (pas le texte). Les entrées expirent après un TTL et leur nombre est plafonné, pour
+que les jeux annulés ou jamais finalisés ne s'accumulent pas.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+class PendingEntry:
+    """Message ⏰ mémorisé pour un numéro de jeu."""
+
+    __slots__ = ('message_id', 'first_seen', 'last_seen', 'first_group', 'early')
+
+    def __init__(self, message_id: int, now: float):
+        self.message_id = message_id
+        self.first_seen = now
+        self.last_seen = now
+        self.first_group: Optional[str] = None  # Premier groupe ayant servi aux prédictions anticipées
+        self.early: Optional[List[Tuple[tuple, str]]] = None  # [(clé de prédiction, 'cible:règle')]
+
+    def __getstate__(self):
+        return (self.message_id, self.first_seen, self.last_seen, self.first_group, self.early)
+
+    def __setstate__(self, state):
+        if len(state) == 3:  # État enregistré avant la prédiction anticipée
+            state = tuple(state) + (None, None)
+        self.message_id, self.first_seen, self.last_seen, self.first_group, self.early = state
+
+
+class PendingStore:
+    """Messages en attente indexés par numéro de jeu, avec TTL et plafond.
+    L'ordre d'insertion suit la dernière mise à jour : les plus anciens sont en tête.
+    """
+
+    def __init__(self, ttl_seconds: float = 600.0, max_entries: int = 200, clock=time.time):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: 'OrderedDict[int, PendingEntry]' = OrderedDict()
+
+        # Métriques cumulées
+        self.finalized_count = 0
+        self.expired_count = 0
+        self.evicted_count = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # L'horloge est une configuration du processus : rattachée par le prédicteur au chargement
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['clock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.clock = time.time
+
+    def __contains__(self, game_number: int) -> bool:
+        return game_number in self._entries
+
+    def get(self, game_number: int) -> Optional[PendingEntry]:
+        return self._entries.get(game_number)
+
+    def remember(self, game_number: int, message_id: int) -> PendingEntry:
+        """Mémorise (ou rafraîchit) le message ⏰ d'un jeu."""
+        now = self.clock()
+        self.expire(now)
+
+        entry = self._entries.get(game_number)
+        if entry is None:
+            entry = PendingEntry(message_id, now)
+            self._entries[game_number] = entry
+        else:
+            entry.message_id = message_id
+            entry.last_seen = now
+            self._entries.move_to_end(game_number)
+
+        # Plafond mémoire : évincer les plus anciens
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evicted_count += 1
+
+        return entry
+
+    def finalize(self, game_number: int) -> Optional[PendingEntry]:
+        """Retire le jeu de l'attente quand ⏰ a disparu."""
+        entry = self._entries.pop(game_number, None)
+        if entry is not None:
+            self.finalized_count += 1
+        return entry
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Supprime les entrées non rafraîchies depuis plus de ttl_seconds."""
+        now = self.clock() if now is None else now
+        limit = now - self.ttl_seconds
+        expired = 0
+        while self._entries:
+            game_number, entry = next(iter(self._entries.items()))
+            if entry.last_seen > limit:
+                break
+            del self._entries[game_number]
+            expired += 1
+        self.expired_count += expired
+        return expired
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            'pending': len(self._entries),
+            'finalized': self.finalized_count,
+            'expired': self.expired_count,
+            'evicted': self.evicted_count,
+        }
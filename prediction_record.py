@@ -0,0 +1,127 @@
+"""
+Enregistrement compact d'une prédiction.
+Un objet à __slots__ par prédiction : règle (chaîne internée), cible, jeux
+source et cible, fenêtre, statut (énumération), décalage de résolution et ID
+du message publié. Le texte affiché n'est pas stocké : il est rendu depuis un
+modèle au moment de l'envoi ou de l'édition.
+"""
+
+import re
+import sys
+from enum import IntEnum
+from typing import Dict, Optional, Tuple
+
+from rule_engine import target_label
+
+PREDICTION_TEMPLATE = "🎯{target_game}🎯: {label} statut :{status}"
+_LEGACY_OFFSET_PATTERN = re.compile(r'statut :✅(\d+)')
+
+
+class PredictionStatus(IntEnum):
+    PENDING = 0
+    CORRECT = 1
+    FAILED = 2
+    RETRACTED = 3  # Prédiction anticipée (⏰) non confirmée par le tirage final
+
+    @property
+    def label(self) -> str:
+        """Forme texte ('pending', 'correct'…) utilisée par l'archive."""
+        return self.name.lower()
+
+
+class Early(IntEnum):
+    """Origine d'une prédiction : tirage finalisé, ou message ⏰ (puis confirmée)."""
+    NO = 0
+    PENDING = 1
+    CONFIRMED = 2
+
+
+class PredictionRecord:
+    """Prédiction en mémoire ; la clé du dictionnaire des prédictions est (target_game, target)."""
+
+    __slots__ = ('rule', 'target', 'source_game', 'target_game', 'window', 'status', 'offset',
+                 'message_id', 'counts_failures', 'early')
+
+    def __init__(self, rule: str, target: str, source_game: int, target_game: int, window: int = 3,
+                 counts_failures: bool = True, early: Early = Early.NO):
+        self.rule = sys.intern(rule)  # 'Q:Q_DEFAULT_JJ' : une seule chaîne par règle
+        self.target = sys.intern(target)
+        self.source_game = source_game
+        self.target_game = target_game
+        self.window = window
+        self.status = PredictionStatus.PENDING
+        self.offset: Optional[int] = None  # Décalage de résolution (jeu résolu - jeu cible)
+        self.message_id: Optional[int] = None  # ID du message publié dans le canal de prédiction
+        self.counts_failures = counts_failures  # Règles de la stratégie (défaut/intelligent)
+        self.early = early
+
+    @property
+    def key(self) -> Tuple[int, str]:
+        return (self.target_game, self.target)
+
+    @property
+    def message_key(self) -> str:
+        """Clé d'idempotence du message de prédiction (boîte d'envoi)."""
+        return f"prediction:{self.source_game}:{self.target_game}:{self.target}"
+
+    @property
+    def is_pending(self) -> bool:
+        return self.status is PredictionStatus.PENDING
+
+    def resolve(self, game_number: int, features) -> bool:
+        """Vérifie la prédiction sur le tirage `game_number` : ✅ si la cible y figure dans la fenêtre,
+        ❌ au dernier tirage de la fenêtre. Retourne True si elle vient d'être résolue."""
+        offset = game_number - self.target_game
+        if offset < 0 or self.status is not PredictionStatus.PENDING:
+            return False  # Le tirage n'est pas encore arrivé, ou déjà résolue
+        if offset <= self.window and features.has(self.target):
+            self.status = PredictionStatus.CORRECT
+        elif offset >= self.window:
+            self.status = PredictionStatus.FAILED
+        else:
+            return False  # Pas encore trouvée, tirage suivant
+        self.offset = offset
+        return True
+
+    def text(self) -> str:
+        """Texte du message de prédiction, selon le statut courant."""
+        if self.status is PredictionStatus.CORRECT:
+            status = f"✅{self.offset}️⃣"
+        elif self.status is PredictionStatus.FAILED:
+            status = "❌"
+        elif self.status is PredictionStatus.RETRACTED:
+            status = "🚫 annulée"
+        else:
+            status = "⏳"
+        return PREDICTION_TEMPLATE.format(target_game=self.target_game, label=target_label(self.target), status=status)
+
+    def __repr__(self) -> str:
+        return (f"PredictionRecord({self.rule!r}, N{self.source_game}→N{self.target_game}, "
+                f"{self.status.label}, offset={self.offset}, message_id={self.message_id})")
+
+    # Pickle compact (état partagé entre workers) : un tuple, énumérations en entiers
+    def __getstate__(self):
+        return (self.rule, self.target, self.source_game, self.target_game, self.window, int(self.status),
+                self.offset, self.message_id, self.counts_failures, int(self.early))
+
+    def __setstate__(self, state):
+        (rule, target, self.source_game, self.target_game, self.window, status,
+         self.offset, self.message_id, self.counts_failures, early) = state
+        self.rule, self.target = sys.intern(rule), sys.intern(target)
+        self.status, self.early = PredictionStatus(status), Early(early)
+
+    @classmethod
+    def from_legacy(cls, key, prediction: Dict) -> 'PredictionRecord':
+        """Prédiction enregistrée sous forme de dict (état antérieur) → PredictionRecord."""
+        target_game = prediction.get('target_game', key[0] if isinstance(key, tuple) else key)
+        rule = prediction.get('predicted_costume_or_value') or 'Q:'
+        early = {True: Early.PENDING, 'confirmed': Early.CONFIRMED}.get(prediction.get('early'), Early.NO)
+        record = cls(rule, prediction.get('target', 'Q'), prediction.get('predicted_from', target_game - 2), target_game,
+                     prediction.get('window', 3), prediction.get('counts_failures', True), early)
+        record.status = PredictionStatus.__members__.get(prediction.get('status', 'pending').upper(),
+                                                         PredictionStatus.FAILED)
+        record.message_id = prediction.get('prediction_message_id')
+        match = _LEGACY_OFFSET_PATTERN.search(prediction.get('message_text') or '')
+        if match:
+            record.offset = int(match.group(1))
+        return record
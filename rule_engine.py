@@ -0,0 +1,504 @@
+"""
+Moteur de prédiction indépendant du rang.
+Les caractéristiques d'un tirage (cartes des deux groupes, lettres de figures,
+signaux J/K/A du message) sont extraites une seule fois ; chaque règle n'est
+qu'un prédicat sur ces caractéristiques, avec sa cible (rang ou couleur), son
+décalage (jeu N+offset) et sa fenêtre de vérification.
+
+Les règles sont déclarées comme des données (JSON ou YAML) et compilées au
+chargement : chaque clause reçoit un compteur de ses conditions fausses, tous
+rangés dans un seul entier, et chaque caractéristique utilisée une table
+valeur → écart de ces compteurs. Un tirage coûte une lecture de table et une
+addition par caractéristique non nulle du tirage, puis quelques opérations sur
+l'entier qui isolent les clauses à compteur nul : le coût ne dépend pas du
+nombre de règles, seulement du nombre de règles déclenchées. Le résultat est
+mémorisé par tirage distinct.
+"""
+
+import os
+import re
+import time
+import logging
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import json_codec
+from draw_parser import RANKS, SUITS, ParsedDraw, group_cards
+
+logger = logging.getLogger(__name__)
+
+MODES = ('default', 'intelligent', 'always')
+
+# Figures et leur nom en toutes lettres (le nom seul suffit à valider la cible)
+FIGURE_NAMES = {'A': 'As', 'K': 'Roi', 'Q': 'Dame', 'J': 'Valet'}
+
+TARGET_LABELS = {
+    'A': 'As (A)', 'K': 'Roi (K)', 'Q': 'Dame (Q)', 'J': 'Valet (J)',
+    '♥': 'Cœur (♥️)', '♠': 'Pique (♠️)', '♦': 'Carreau (♦️)', '♣': 'Trèfle (♣️)',
+}
+
+_ISOLATED_FIGURE = re.compile(r'\b[AKQJakqj]\b')
+_SECOND_GROUP_FIGURE = re.compile(r'[AKQJ]', re.IGNORECASE)
+_LETTER = re.compile(r'[A-Za-z]')
+
+# Caractéristique → paramètres admis (None : sans paramètre)
+FEATURE_PARAMS: Dict[str, Optional[Tuple[str, ...]]] = {
+    'letters': tuple('ABCDEFGHIJKLMNOPQRSTUVWXYZ'),  # Lettre du premier groupe, toutes positions (motif 'J.*J')
+    'isolated': tuple(FIGURE_NAMES),                 # Lettre de figure isolée du premier groupe (motif '\bJ\b')
+    'rank': RANKS,                                   # Cartes du premier groupe par rang
+    'suit': SUITS,                                   # Cartes du premier groupe par couleur
+    'second': RANKS,                                 # Cartes du deuxième groupe par rang
+    'second_figures': None,                          # Figure A/K/Q/J dans le deuxième groupe (0/1)
+    'signal': ('J', 'K', 'A'),                       # Signaux J/K/A sur tout le message (0/1)
+    'cards': None,                                   # Nombre de cartes du premier groupe
+}
+
+
+class DrawFeatures:
+    """Caractéristiques d'un tirage, communes à toutes les règles.
+
+    `values` ne contient que les caractéristiques non nulles : {(nom, paramètre): valeur}.
+    """
+
+    __slots__ = ('first_group', 'values')
+
+    def __init__(self, parsed: ParsedDraw):
+        first_group = parsed.first_group or ''
+        values: Dict[Tuple[str, Optional[str]], int] = {}
+        get = values.get
+
+        cards = group_cards(first_group)
+        for rank, suit in cards:
+            values[('rank', rank)] = get(('rank', rank), 0) + 1
+            values[('suit', suit)] = get(('suit', suit), 0) + 1
+        if cards:
+            values[('cards', None)] = len(cards)
+        for rank, _ in group_cards(parsed.second_group):
+            values[('second', rank)] = get(('second', rank), 0) + 1
+        for letter in _LETTER.findall(first_group):
+            key = ('letters', letter.upper())
+            values[key] = get(key, 0) + 1
+        for letter in _ISOLATED_FIGURE.findall(first_group):
+            key = ('isolated', letter.upper())
+            values[key] = get(key, 0) + 1
+        if parsed.second_group and _SECOND_GROUP_FIGURE.search(parsed.second_group):
+            values[('second_figures', None)] = 1
+        for figure, present in zip('JKA', parsed.signals):
+            if present:
+                values[('signal', figure)] = 1
+
+        self.first_group = first_group
+        self.values = values
+
+    def value(self, feature: str, param: Optional[str] = None) -> int:
+        return self.values.get((feature, param), 0)
+
+    def has(self, target: str) -> bool:
+        """Vrai si la cible (rang ou couleur) apparaît dans le premier groupe."""
+        if target in FIGURE_NAMES:
+            return ('isolated', target) in self.values or FIGURE_NAMES[target] in self.first_group
+        if target in SUITS:
+            return ('suit', target) in self.values
+        return ('rank', target) in self.values
+
+
+# --- Conditions déclaratives ---
+
+# Caractéristiques lues dans le seul premier groupe (règles évaluables sur un message ⏰)
+FIRST_GROUP_FEATURES = frozenset(('letters', 'isolated', 'rank', 'suit', 'cards'))
+
+# Les valeurs lues sont plafonnées : les seuils doivent rester en dessous
+VALUE_CAP = 15
+
+_OPERATORS = {
+    '==': lambda value, threshold: value == threshold,
+    '!=': lambda value, threshold: value != threshold,
+    '>=': lambda value, threshold: value >= threshold,
+    '<=': lambda value, threshold: value <= threshold,
+    '>': lambda value, threshold: value > threshold,
+    '<': lambda value, threshold: value < threshold,
+}
+_NEGATED = {'==': '!=', '!=': '==', '>=': '<', '<=': '>', '>': '<=', '<': '>='}
+
+_ATOM = re.compile(
+    r'^\s*(?P<negated>not\s+)?(?P<name>[a-z_]+)(?:\.(?P<param>\S+?))?'
+    r'(?:\s*(?P<op>==|!=|>=|<=|>|<)\s*(?P<value>\d+))?\s*$'
+)
+
+
+class Atom(NamedTuple):
+    """Condition élémentaire : caractéristique[paramètre] <op> seuil."""
+    feature: str
+    param: Optional[str]
+    op: str
+    value: int
+
+    def __str__(self) -> str:
+        name = f"{self.feature}.{self.param}" if self.param else self.feature
+        if self.value == 0 and self.op in ('>', '<='):
+            return name if self.op == '>' else f"not {name}"
+        return f"{name} {self.op} {self.value}"
+
+
+def parse_atom(text: str) -> Atom:
+    """'letters.J >= 2', 'signal.J', 'not second_figures'… → Atom."""
+    match = _ATOM.match(str(text))
+    if not match:
+        raise ValueError(f"Condition illisible : {text!r}")
+    name, param = match.group('name'), match.group('param')
+    if name not in FEATURE_PARAMS:
+        raise ValueError(f"Caractéristique inconnue : {name!r} (connues : {', '.join(FEATURE_PARAMS)})")
+    allowed = FEATURE_PARAMS[name]
+    if allowed is None and param is not None:
+        raise ValueError(f"{name} ne prend pas de paramètre : {text!r}")
+    if allowed is not None:
+        param = (param or '').replace('\ufe0f', '')
+        param = '♥' if param == '❤' else (param.upper() if param and param.isalpha() else param)
+        if param not in allowed:
+            raise ValueError(f"Paramètre invalide pour {name} : {text!r}")
+
+    op, value = match.group('op') or '>', int(match.group('value') or 0)
+    if value >= VALUE_CAP:
+        raise ValueError(f"Seuil trop grand (max {VALUE_CAP - 1}) : {text!r}")
+    if match.group('negated'):
+        op = _NEGATED[op]
+    return Atom(name, param, op, value)
+
+
+class Condition:
+    """Déclencheur compilé : disjonction de conjonctions d'Atom."""
+
+    __slots__ = ('clauses', 'source')
+
+    def __init__(self, clauses: Tuple[Tuple[Atom, ...], ...], source=None):
+        self.clauses = clauses
+        self.source = source
+
+    def __call__(self, features: DrawFeatures) -> bool:
+        """Évaluation directe (hors moteur), atome par atome."""
+        values = features.values
+        for clause in self.clauses:
+            if all(_OPERATORS[atom.op](min(values.get((atom.feature, atom.param), 0), VALUE_CAP), atom.value)
+                   for atom in clause):
+                return True
+        return False
+
+    def __str__(self) -> str:
+        return ' OU '.join(' ET '.join(str(atom) for atom in clause) for clause in self.clauses)
+
+
+def compile_condition(when=None, any_of=None) -> Condition:
+    """`when` : condition ou liste (ET) ; `any_of` : liste d'alternatives (OU), chacune une condition ou liste."""
+    if (when is None) == (any_of is None):
+        raise ValueError("Une règle déclare soit 'when', soit 'any'")
+    alternatives = [when] if any_of is None else list(any_of)
+    clauses = []
+    for alternative in alternatives:
+        atoms = alternative if isinstance(alternative, list) else [alternative]
+        if not atoms:
+            raise ValueError("Condition vide")
+        clauses.append(tuple(parse_atom(atom) for atom in atoms))
+    return Condition(tuple(clauses), when if any_of is None else {'any': any_of})
+
+
+class Rule(NamedTuple):
+    """Règle de prédiction : déclencheur sur le tirage N → cible attendue en N+offset."""
+    rule_id: str
+    target: str                                   # Rang ('Q', '10') ou couleur ('♥')
+    trigger: Union[Condition, Callable[[DrawFeatures], bool]]
+    offset: int = 2                               # Jeu cible N+offset
+    window: int = 3                               # Vérification de N+offset à N+offset+window
+    mode: str = 'default'                         # 'default', 'intelligent' ou 'always'
+
+    @property
+    def predicted_value(self) -> str:
+        """Forme historique 'Q:Q_DEFAULT_JJ' (cible:règle)."""
+        return f"{self.target}:{self.rule_id}"
+
+
+def target_label(target: str) -> str:
+    return TARGET_LABELS.get(target, target)
+
+
+_RULE_KEYS = {'id', 'target', 'when', 'any', 'offset', 'window', 'mode'}
+
+
+def compile_rule(entry: Dict) -> Rule:
+    """Entrée de table ({'id', 'target', 'when'|'any', 'offset', 'window', 'mode'}) → Rule."""
+    if not isinstance(entry, dict):
+        raise ValueError(f"Règle invalide : {entry!r}")
+    unknown = set(entry) - _RULE_KEYS
+    rule_id = entry.get('id')
+    if unknown:
+        raise ValueError(f"Règle {rule_id} : clés inconnues {sorted(unknown)}")
+    if not rule_id or not isinstance(rule_id, str) or ':' in rule_id:
+        raise ValueError(f"Identifiant de règle invalide : {rule_id!r}")
+
+    target = str(entry.get('target', '')).replace('\ufe0f', '').upper()
+    target = '♥' if target == '❤' else target
+    if target not in RANKS and target not in SUITS:
+        raise ValueError(f"Règle {rule_id} : cible inconnue {entry.get('target')!r}")
+    offset, window = entry.get('offset', 2), entry.get('window', 3)
+    if not isinstance(offset, int) or not isinstance(window, int) or offset < 0 or window < 0:
+        raise ValueError(f"Règle {rule_id} : offset et window doivent être des entiers positifs")
+    mode = entry.get('mode', 'default')
+    if mode not in MODES:
+        raise ValueError(f"Règle {rule_id} : mode inconnu {mode!r}")
+
+    try:
+        trigger = compile_condition(entry.get('when'), entry.get('any'))
+    except ValueError as e:
+        raise ValueError(f"Règle {rule_id} : {e}") from None
+    return Rule(rule_id, target, trigger, offset, window, mode)
+
+
+def compile_rules(table: Iterable[Dict]) -> Tuple[Rule, ...]:
+    rules = tuple(compile_rule(entry) for entry in table)
+    seen = Counter(rule.rule_id for rule in rules)
+    duplicates = sorted(rule_id for rule_id, count in seen.items() if count > 1)
+    if duplicates:
+        raise ValueError(f"Identifiants de règle en double : {', '.join(duplicates)}")
+    return rules
+
+
+# --- Règles Dame historiques (même table que rules.json) ---
+
+DAME_RULE_TABLE = (
+    {'id': 'Q_DEFAULT_JJ', 'target': 'Q', 'when': 'letters.J >= 2', 'mode': 'default'},
+    {'id': 'Q_DEFAULT_J_CLEAN', 'target': 'Q', 'when': ['isolated.J == 1', 'not second_figures'], 'mode': 'default'},
+    {'id': 'Q_INTELLIGENT_JJ', 'target': 'Q', 'when': 'letters.J >= 2', 'mode': 'intelligent'},
+    {'id': 'Q_INTELLIGENT_J', 'target': 'Q', 'when': ['signal.J', 'not signal.K', 'not signal.A'], 'mode': 'intelligent'},
+)
+
+DAME_RULES = compile_rules(DAME_RULE_TABLE)
+
+
+def load_rules(path: str) -> Tuple[Rule, ...]:
+    """Lit et compile un fichier de règles JSON ou YAML (liste, ou {'rules': [...]})."""
+    with open(path, 'rb') as handle:
+        payload = handle.read()
+    if path.endswith(('.yaml', '.yml')):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("PyYAML n'est pas installé : utilisez un fichier de règles .json") from None
+        document = yaml.safe_load(payload)
+    else:
+        document = json_codec.loads(payload)
+    if isinstance(document, dict):
+        document = document.get('rules')
+    if not isinstance(document, list) or not document:
+        raise ValueError("Le fichier de règles doit contenir une liste de règles non vide")
+    return compile_rules(document)
+
+
+# --- Évaluation ---
+
+def reads_first_group_only(rule: Rule) -> bool:
+    """Vrai si le déclencheur ne dépend que du premier groupe (déclencheur Python : inconnu, donc faux)."""
+    return isinstance(rule.trigger, Condition) and all(
+        atom.feature in FIRST_GROUP_FEATURES for clause in rule.trigger.clauses for atom in clause
+    )
+
+
+def is_monotone(rule: Rule) -> bool:
+    """Vrai si une carte ajoutée au premier groupe ne peut pas rendre le déclencheur faux
+    (uniquement des seuils minimaux '>=' / '>') : évaluable avant la troisième carte."""
+    return reads_first_group_only(rule) and all(
+        atom.op in ('>=', '>') for clause in rule.trigger.clauses for atom in clause
+    )
+
+
+class RuleEngine:
+    """Évalue toutes les règles actives sur un tirage, en un passage."""
+
+    MEMO_LIMIT = 65536
+
+    def __init__(self, rules: Iterable[Rule] = DAME_RULES):
+        self.rules: Tuple[Rule, ...] = tuple(rules)
+        for rule in self.rules:
+            if rule.mode not in MODES:
+                raise ValueError(f"Mode inconnu pour la règle {rule.rule_id} : {rule.mode}")
+        self.by_id: Dict[str, Rule] = {rule.rule_id: rule for rule in self.rules}
+        # Règles par mode courant (les règles 'always' s'ajoutent aux deux modes)
+        self._active = {
+            mode: tuple(rule for rule in self.rules if rule.mode in (mode, 'always'))
+            for mode in ('default', 'intelligent')
+        }
+        # Règles ne lisant que le premier groupe, pour la prédiction anticipée
+        self._early = {
+            mode: tuple(rule for rule in rules if reads_first_group_only(rule))
+            for mode, rules in self._active.items()
+        }
+        self._compile()
+
+    def _compile(self):
+        """Un compteur de conditions fausses par clause, sur `width` bits d'un même entier.
+
+        Le compteur d'une clause est biaisé de 2**(width-1) - 1 : il garde son bit
+        de poids fort à zéro si et seulement si aucune condition n'est fausse.
+        L'entier d'un tirage part de celui du tirage « tout à zéro » ; chaque
+        caractéristique non nulle y ajoute son écart précalculé (sans retenue
+        entre compteurs), et les clauses déclenchées sont lues d'un masque.
+        """
+        clauses: List[Tuple[int, Tuple[Atom, ...]]] = []  # (indice de la règle, conditions)
+        for index, rule in enumerate(self.rules):
+            if isinstance(rule.trigger, Condition):
+                clauses.extend((index, tuple(set(clause))) for clause in rule.trigger.clauses)
+        width = max((len(atoms) for _, atoms in clauses), default=1).bit_length() + 1
+
+        tables: Dict[Tuple[str, Optional[str]], List[int]] = {}
+        bias = high = 0
+        for position, (_, atoms) in enumerate(clauses):
+            shift = position * width
+            bias += ((1 << (width - 1)) - 1) << shift
+            high += 1 << (shift + width - 1)
+            for atom in atoms:
+                table = tables.setdefault((atom.feature, atom.param), [0] * (VALUE_CAP + 1))
+                compare = _OPERATORS[atom.op]
+                for value in range(VALUE_CAP + 1):
+                    if not compare(value, atom.value):
+                        table[value] += 1 << shift
+        self._width = width
+        self._clause_rules = tuple(index for index, _ in clauses)
+        self._zero_counts = bias + sum(table[0] for table in tables.values())
+        self._deltas = {key: tuple(count - table[0] for count in table) for key, table in tables.items()}
+
+        # Bits de poids fort des clauses de chaque mode
+        self._dynamic = tuple(index for index, rule in enumerate(self.rules)
+                              if not isinstance(rule.trigger, Condition))
+        self._mode_bits = {}
+        for mode in ('default', 'intelligent'):
+            self._mode_bits[mode] = sum(1 << (position * width + width - 1)
+                                        for position, index in enumerate(self._clause_rules)
+                                        if self.rules[index].mode in (mode, 'always'))
+        self._memo: Dict[Tuple[bool, int], Tuple[Rule, ...]] = {}
+        self._last: Tuple[Optional[DrawFeatures], int] = (None, 0)
+
+    def active_rules(self, intelligent_mode: bool) -> Tuple[Rule, ...]:
+        return self._active['intelligent' if intelligent_mode else 'default']
+
+    def feature_counts(self, features: DrawFeatures) -> int:
+        """Compteurs de conditions fausses de toutes les clauses pour ce tirage (un seul entier).
+        Le dernier tirage est retenu : le passage réel et l'évaluation en ombre du même tirage le partagent."""
+        last = self._last
+        if last[0] is features:
+            return last[1]
+        counts = self._zero_counts
+        deltas = self._deltas
+        for key, value in features.values.items():
+            delta = deltas.get(key)
+            if delta is not None:
+                counts += delta[value if value < VALUE_CAP else VALUE_CAP]
+        self._last = (features, counts)
+        return counts
+
+    def matches(self, features: DrawFeatures, intelligent_mode: bool) -> List[Rule]:
+        """Règles déclenchées, par ordre de priorité ; une seule par (cible, décalage)."""
+        counts = self.feature_counts(features)
+        if not self._dynamic:
+            key = (intelligent_mode, counts)
+            matched = self._memo.get(key)
+            if matched is None:
+                if len(self._memo) >= self.MEMO_LIMIT:
+                    self._memo.clear()
+                matched = self._memo[key] = tuple(self._select(features, counts, intelligent_mode))
+            return list(matched)
+        return self._select(features, counts, intelligent_mode)
+
+    def _select(self, features: DrawFeatures, counts: int, intelligent_mode: bool) -> List[Rule]:
+        # Indice dans self.rules : même ordre que les règles actives du mode (priorité)
+        matched, claimed = [], set()
+        for index in self.triggered(features, counts, intelligent_mode):
+            rule = self.rules[index]
+            slot = (rule.target, rule.offset)
+            if slot not in claimed:
+                claimed.add(slot)
+                matched.append(rule)
+        return matched
+
+    def triggered(self, features: DrawFeatures, counts: int, intelligent_mode: bool) -> List[int]:
+        """Indices (dans self.rules, donc par priorité) des règles déclenchées du mode, avant le choix
+        d'une règle par (cible, décalage). counts : feature_counts(features)."""
+        mode = 'intelligent' if intelligent_mode else 'default'
+        mode_bits = self._mode_bits[mode]
+        fired = (counts & mode_bits) ^ mode_bits  # Bit de poids fort à zéro : clause vraie
+        width, clause_rules = self._width, self._clause_rules
+
+        triggered: List[int] = []  # Clauses rangées par règle : indices croissants
+        while fired:
+            lowest = fired & -fired
+            index = clause_rules[(lowest.bit_length() - 1) // width]
+            if not triggered or triggered[-1] != index:
+                triggered.append(index)
+            fired ^= lowest
+        dynamic = [index for index in self._dynamic  # Déclencheurs Python : évalués à chaque tirage
+                   if self.rules[index].mode in (mode, 'always') and self.rules[index].trigger(features)]
+        return sorted(set(triggered).union(dynamic)) if dynamic else triggered
+
+    def early_matches(self, features: DrawFeatures, intelligent_mode: bool, settled: bool = True) -> List[Rule]:
+        """Règles déclenchées parmi celles qui ne lisent que le premier groupe (message ⏰).
+        Tant que ce groupe peut encore recevoir une carte, seules les règles monotones comptent.
+        """
+        matched, claimed = [], set()
+        for rule in self._early['intelligent' if intelligent_mode else 'default']:
+            slot = (rule.target, rule.offset)
+            if slot in claimed or not (settled or is_monotone(rule)):
+                continue
+            if rule.trigger(features):
+                claimed.add(slot)
+                matched.append(rule)
+        return matched
+
+    def rule_for(self, predicted_value: str) -> Optional[Rule]:
+        """Règle d'après sa forme 'cible:règle' (None si inconnue)."""
+        return self.by_id.get(predicted_value.split(':', 1)[-1])
+
+
+class RuleFile:
+    """Fichier de règles surveillé : rechargé quand il change (chaque worker vérifie de lui-même)."""
+
+    def __init__(self, path: Optional[str], check_interval: float = 2.0, clock=time.monotonic):
+        self.path = path
+        self.check_interval = check_interval
+        self.clock = clock
+        self.signature = None
+        self.loaded_at = None
+        self.error: Optional[str] = None
+        self._checked_at = float('-inf')
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def refresh(self, predictor, force: bool = False) -> bool:
+        """Recharge les règles du prédicteur si le fichier a changé ; en cas d'erreur, garde les règles en place."""
+        if not self.path:
+            return False
+        now = self.clock()
+        if not force and now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+
+        signature = self._stat()
+        if signature is None:
+            self.error = f"Fichier de règles introuvable : {self.path}"
+            return False
+        if signature == self.signature and not force:
+            return False
+        self.signature = signature
+
+        try:
+            rules = load_rules(self.path)
+        except (OSError, ValueError) as e:
+            self.error = str(e)
+            logger.error(f"❌ Règles non rechargées ({self.path}) : {e}")
+            return False
+        predictor.set_rules(rules)
+        self.error = None
+        self.loaded_at = time.time()
+        logger.info(f"📐 {len(rules)} règles chargées depuis {self.path}")
+        return True
@@ -0,0 +1,182 @@
+"""
+Comptes glissants par règle et bascule automatique du mode.
+Chaque résolution de prédiction (verify_prediction) alimente en O(1) une
+fenêtre circulaire par règle : succès par décalage, échecs et séries. Une
+fenêtre commune aux règles de la stratégie (modes default et intelligent)
+est affichée par /status ; la politique de mode suit une fenêtre propre aux
+règles par défaut, alimentée en réel ou en ombre (voir ModePolicy).
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+MISS = 255  # Code d'un échec dans la fenêtre (les succès y sont codés par leur décalage)
+MAX_OFFSET = 15  # Décalages de succès comptés séparément (au-delà : regroupés)
+
+
+class RollingCounter:
+    """Fenêtre circulaire des dernières résolutions d'une règle, avec ses comptes."""
+
+    __slots__ = ('size', 'outcomes', 'head', 'length', 'hits', 'misses', 'streak', 'best_streak',
+                 'worst_streak', 'total_hits', 'total_misses')
+
+    def __init__(self, size: int = 50):
+        self.size = size
+        self.outcomes = bytearray(size)
+        self.head = 0  # Prochaine case écrite (la plus ancienne quand la fenêtre est pleine)
+        self.length = 0
+        self.hits = [0] * (MAX_OFFSET + 1)  # Succès par décalage, dans la fenêtre
+        self.misses = 0
+        self.streak = 0  # > 0 : succès consécutifs ; < 0 : échecs consécutifs
+        self.best_streak = 0
+        self.worst_streak = 0
+        self.total_hits = 0
+        self.total_misses = 0
+
+    def push(self, offset: Optional[int]):
+        """Ajoute une résolution : succès au décalage `offset`, ou échec (None)."""
+        code = MISS if offset is None else min(max(offset, 0), MAX_OFFSET)
+        if self.length == self.size:
+            evicted = self.outcomes[self.head]
+            if evicted == MISS:
+                self.misses -= 1
+            else:
+                self.hits[evicted] -= 1
+        else:
+            self.length += 1
+        self.outcomes[self.head] = code
+        self.head = (self.head + 1) % self.size
+
+        if code == MISS:
+            self.misses += 1
+            self.total_misses += 1
+            self.streak = min(self.streak, 0) - 1
+            self.worst_streak = min(self.worst_streak, self.streak)
+        else:
+            self.hits[code] += 1
+            self.total_hits += 1
+            self.streak = max(self.streak, 0) + 1
+            self.best_streak = max(self.best_streak, self.streak)
+
+    @property
+    def hit_count(self) -> int:
+        return self.length - self.misses
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        return self.hit_count / self.length if self.length else None
+
+    def hits_by_offset(self) -> Dict[int, int]:
+        return {offset: count for offset, count in enumerate(self.hits) if count}
+
+    def summary(self) -> str:
+        """Résumé d'une ligne pour /status : '12/20 (60 %) · ✅0:5 ✅1:7 · ❌8 · série +3'."""
+        if not self.length:
+            return "aucune résolution"
+        offsets = ' '.join(f"✅{offset}:{count}" for offset, count in self.hits_by_offset().items())
+        streak = f"+{self.streak}" if self.streak > 0 else str(self.streak)
+        parts = [f"{self.hit_count}/{self.length} ({self.hit_rate * 100:.0f} %)"]
+        if offsets:
+            parts.append(offsets)
+        parts += [f"❌{self.misses}", f"série {streak}"]
+        return ' · '.join(parts)
+
+    # Pickle compact (état partagé entre workers)
+    def __getstate__(self):
+        return (self.size, bytes(self.outcomes), self.head, self.length, self.streak, self.best_streak,
+                self.worst_streak, self.total_hits, self.total_misses)
+
+    def __setstate__(self, state):
+        (self.size, outcomes, self.head, self.length, self.streak, self.best_streak,
+         self.worst_streak, self.total_hits, self.total_misses) = state
+        self.outcomes = bytearray(outcomes)
+        # Comptes de la fenêtre recalculés depuis son contenu (O(taille), au chargement seulement)
+        self.hits = [0] * (MAX_OFFSET + 1)
+        self.misses = 0
+        start = (self.head - self.length) % self.size
+        for index in range(self.length):
+            code = self.outcomes[(start + index) % self.size]
+            if code == MISS:
+                self.misses += 1
+            else:
+                self.hits[code] += 1
+
+
+class RuleStatsBook:
+    """Comptes glissants de toutes les règles, plus la fenêtre de la stratégie (politique de mode)."""
+
+    def __init__(self, window: int = 50, strategy_window: int = 20):
+        self.window = window
+        self.rules: Dict[str, RollingCounter] = {}
+        self.strategy = RollingCounter(strategy_window)  # Règles default/intelligent confondues
+        self.since_switch = 0  # Résolutions de la stratégie depuis la dernière bascule de mode
+        # Règles du mode par défaut seules, publiées ou évaluées en ombre (politique de mode)
+        self.default_rules = RollingCounter(strategy_window)
+        self.default_since_switch = 0
+
+    def record(self, rule: str, offset: Optional[int], counts_failures: bool = True, default_rule: bool = False):
+        """Enregistre une résolution (offset None : échec) ; O(1)."""
+        counter = self.rules.get(rule)
+        if counter is None:
+            counter = self.rules[rule] = RollingCounter(self.window)
+        counter.push(offset)
+        if counts_failures:
+            self.strategy.push(offset)
+            self.since_switch += 1
+        if default_rule:
+            self.record_default(offset)
+
+    def record_default(self, offset: Optional[int]):
+        """Résolution d'une règle du mode par défaut (publiée, ou en ombre pendant le Mode Intelligent)."""
+        self.default_rules.push(offset)
+        self.default_since_switch += 1
+
+    def mode_switched(self):
+        self.since_switch = 0
+        self.default_since_switch = 0
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if 'default_rules' not in state:  # État enregistré avant la fenêtre des règles par défaut
+            self.default_rules = RollingCounter(self.strategy.size)
+            self.default_since_switch = 0
+
+    def items(self) -> List[Tuple[str, RollingCounter]]:
+        return sorted(self.rules.items())
+
+
+class ModePolicy:
+    """Bascule automatique du mode selon le taux de succès glissant des règles par défaut, avec hystérésis.
+
+    Les deux bascules regardent la même fenêtre : celle des règles du mode par
+    défaut (RuleStatsBook.default_rules). En mode par défaut, elle suit les
+    prédictions publiées ; en Mode Intelligent, celles du jeu en ombre
+    autre_mode, qui évalue alors les règles par défaut sans les publier.
+    Passage en Mode Intelligent quand ce taux tombe sous `low`, retour au mode
+    par défaut quand il remonte à `high` : le Mode Intelligent dure tant que
+    les règles par défaut échouent, quels que soient ses propres résultats.
+    Jamais avant `min_samples` résolutions depuis la dernière bascule.
+    """
+
+    def __init__(self, low: float = 0.4, high: float = 0.6, min_samples: int = 10):
+        if not 0.0 <= low < high <= 1.0:
+            raise ValueError(f"Seuils de bascule invalides : low={low}, high={high} (0 ≤ low < high ≤ 1)")
+        self.low = low
+        self.high = high
+        self.min_samples = min_samples
+
+    def decide(self, book: RuleStatsBook, intelligent_mode: bool) -> Optional[bool]:
+        """Nouveau mode (True : intelligent) si une bascule s'impose, sinon None."""
+        window = book.default_rules
+        rate = window.hit_rate
+        if (rate is None or book.default_since_switch < self.min_samples
+                or window.length < min(self.min_samples, window.size)):
+            return None
+        if not intelligent_mode and rate < self.low:
+            return True
+        if intelligent_mode and rate >= self.high:
+            return False
+        return None
+
+    def describe(self) -> str:
+        return (f"règles par défaut : intelligent sous {self.low * 100:.0f} %, défaut dès {self.high * 100:.0f} %, "
+                f"{self.min_samples} résolutions minimum")
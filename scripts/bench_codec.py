@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Benchmark du codec JSON : décodage d'un corps de webhook + encodage de la
+réponse, et encodage d'un appel sendMessage, par update.
+Compare le backend actif de json_codec (orjson si installé) au module json standard.
+
+Usage : python scripts/bench_codec.py [--iterations 200000]
+"""
+import os
+import sys
+import json
+import timeit
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json_codec  # noqa: E402
+from synthetic_traffic import channel_updates  # noqa: E402
+
+OK = {"status": "ok"}
+OK_BODY = json_codec.dumps(OK)
+
+
+def stdlib_per_update(body: bytes, payload: dict):
+    json.loads(body)
+    json.dumps(OK).encode()
+    json.dumps(payload).encode()
+
+
+def codec_per_update(body: bytes, payload: dict):
+    json_codec.loads(body)
+    OK_BODY  # Réponse pré-sérialisée
+    json_codec.dumps(payload)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=200000)
+    args = parser.parse_args()
+
+    bodies = [json.dumps(update).encode() for update in channel_updates(-1003424179389, games=100)]
+    payload = {'chat_id': '-1003362820311', 'text': '🎯102🎯: Dame (Q) statut :⏳'}
+
+    print(f"Backend json_codec : {json_codec.BACKEND}")
+    for label, function in (('json standard', stdlib_per_update), (f'json_codec ({json_codec.BACKEND})', codec_per_update)):
+        count = len(bodies)
+        loops = max(1, args.iterations // count)
+        elapsed = timeit.timeit(lambda: [function(body, payload) for body in bodies], number=loops)
+        per_update_us = elapsed / (loops * count) * 1e6
+        print(f"   {label:<24} {per_update_us:7.2f} µs/update")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark mémoire des prédictions stockées : dictionnaire par prédiction
+(ancienne forme, texte du message inclus) contre PredictionRecord à __slots__
+(règle internée, statut en énumération, texte rendu à l'envoi).
+Mesure l'allocation (tracemalloc) du dictionnaire des prédictions et la
+taille de l'état picklé partagé entre workers.
+
+Usage : python scripts/bench_prediction_memory.py [--count 1000000]
+"""
+import os
+import sys
+import time
+import pickle
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prediction_record import PredictionRecord, PredictionStatus  # noqa: E402
+from rule_engine import DAME_RULES, target_label  # noqa: E402
+
+RULES = list(DAME_RULES)
+
+
+def legacy_prediction(index: int) -> tuple:
+    """Prédiction telle que make_prediction la stockait avant les PredictionRecord."""
+    rule = RULES[index % len(RULES)]
+    source_game, target_game = index, index + rule.offset
+    # Texte recalculé à chaque prédiction, comme dans l'ancien code (une chaîne par prédiction)
+    text = f"🎯{target_game}🎯: {target_label(rule.target)} statut :⏳"
+    return (target_game, rule.target), {
+        'predicted_costume_or_value': rule.predicted_value, 'status': 'correct', 'predicted_from': source_game,
+        'message_text': text, 'is_dame_prediction': rule.target == 'Q', 'target': rule.target,
+        'target_game': target_game, 'window': rule.window, 'counts_failures': rule.mode != 'always',
+        'early': False, 'verification_stopped': True, 'prediction_message_id': 100000 + index,
+    }
+
+
+def record_prediction(index: int) -> tuple:
+    rule = RULES[index % len(RULES)]
+    record = PredictionRecord(rule.predicted_value, rule.target, index, index + rule.offset, rule.window,
+                              counts_failures=rule.mode != 'always')
+    record.status, record.offset, record.message_id = PredictionStatus.CORRECT, 1, 100000 + index
+    return record.key, record
+
+
+def measure(factory, count: int):
+    tracemalloc.start()
+    started = time.perf_counter()
+    predictions = dict(factory(index) for index in range(count))
+    elapsed = time.perf_counter() - started
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    pickled = len(pickle.dumps(predictions, protocol=pickle.HIGHEST_PROTOCOL))
+    return predictions, allocated, elapsed, pickled
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"Prédictions stockées : {args.count:,}".replace(',', ' '))
+    print(f"   {'forme':<18}  {'mémoire':>10}  {'octets/préd.':>12}  {'pickle':>10}  {'création':>9}")
+    results = {}
+    for name, factory in (('dict (ancien)', legacy_prediction), ('PredictionRecord', record_prediction)):
+        predictions, allocated, elapsed, pickled = measure(factory, args.count)
+        results[name] = allocated
+        print(f"   {name:<18}  {allocated / 2**20:7.1f} Mo  {allocated / args.count:12.1f}  "
+              f"{pickled / 2**20:7.1f} Mo  {elapsed:7.2f} s")
+        del predictions
+    print(f"   Gain mémoire : ×{results['dict (ancien)'] / results['PredictionRecord']:.1f}")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmark du moteur de règles : coût d'évaluation par tirage de 4 à 200 règles.
+Les règles supplémentaires sont générées aléatoirement (cibles, seuils et
+caractéristiques variés) à la suite des quatre règles Dame.
+
+Chiffre de référence : « à froid », un moteur neuf sur des tirages jamais vus
+(sur le trafic réel, avec 200 règles presque chaque tirage est nouveau : le
+mémo ne sert guère). Le coût d'un tirage ne croît pas avec le nombre de
+règles, mais avec les règles déclenchées : les règles aléatoires déclenchent
+chacune sur ~4,5 % des tirages, soit ~9 règles par tirage à 200, et le coût
+à froid passe d'environ 1,2 µs (4 règles) à 10,5 µs (200 règles).
+La colonne « muettes » garde les mêmes règles avec une ancre jamais vraie
+(4 cartes d'un rang) : c'est le coût d'un tirage sans déclenchement. Il
+monte tant que de nouvelles caractéristiques du tirage entrent en jeu
+(≈ 1,2 µs à 4 règles, ≈ 3,4 µs à 100), puis reste plat (mesuré jusqu'à
+800 règles). Sont aussi mesurés le mémo chaud (tirages déjà vus) et une
+évaluation règle par règle ; l'extraction des caractéristiques est mesurée
+à part.
+
+Usage : python scripts/bench_rules.py [--draws 20000] [--counts 4,25,50,100,200]
+"""
+import os
+import sys
+import random
+import timeit
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from card_predictor import CardPredictor  # noqa: E402
+from draw_parser import RANKS, SUITS  # noqa: E402
+from rule_engine import DAME_RULE_TABLE, DrawFeatures, RuleEngine, compile_rules  # noqa: E402
+from synthetic_traffic import game_versions  # noqa: E402
+
+
+def random_rule(index: int, rng: random.Random, silent: bool = False) -> dict:
+    """Règle sélective comme les règles réelles : une carte précise, plus des conditions annexes
+    (silent : ancre jamais vraie, la règle ne déclenche pas)."""
+    def anchor() -> str:
+        if silent:
+            return f"rank.{rng.choice(RANKS)} >= 4"  # Jamais vrai : trois cartes au plus par groupe
+        kind = rng.choice(('rank', 'second', 'isolated'))
+        if kind == 'isolated':
+            return f"isolated.{rng.choice('AKQJ')} >= {rng.randint(1, 2)}"
+        return f"{kind}.{rng.choice(RANKS)} >= {rng.randint(1, 2)}"
+
+    def extra() -> str:
+        kind = rng.choice(('rank', 'suit', 'second', 'letters', 'signal', 'cards', 'second_figures'))
+        negated = 'not ' if rng.random() < 0.5 else ''
+        if kind in ('rank', 'second'):
+            return f"{negated}{kind}.{rng.choice(RANKS)}"
+        if kind == 'suit':
+            return f"{negated}suit.{rng.choice(SUITS)} >= {rng.randint(1, 2)}"
+        if kind == 'letters':
+            return f"letters.{rng.choice('AKQJ')} {rng.choice(('==', '>=', '<='))} {rng.randint(0, 2)}"
+        if kind == 'signal':
+            return f"{negated}signal.{rng.choice('JKA')}"
+        if kind == 'cards':
+            return f"cards == {rng.randint(2, 3)}"
+        return f"{negated}second_figures"
+
+    def clause() -> list:
+        return [anchor()] + [extra() for _ in range(rng.randint(0, 2))]
+
+    entry = {
+        'id': f"R{index:03d}",
+        'target': rng.choice(RANKS + SUITS),
+        'offset': rng.randint(1, 3),
+        'window': rng.randint(0, 3),
+        'mode': rng.choice(('default', 'intelligent', 'always')),
+    }
+    if rng.random() < 0.3:
+        entry['any'] = [clause() for _ in range(2)]
+    else:
+        entry['when'] = clause()
+    return entry
+
+
+def rule_table(count: int, seed: int = 0, silent: bool = False):
+    rng = random.Random(seed)
+    return list(DAME_RULE_TABLE) + [random_rule(index, rng, silent)
+                                    for index in range(max(0, count - len(DAME_RULE_TABLE)))]
+
+
+def per_draw_us(function, items, repeat: int) -> float:
+    elapsed = min(timeit.repeat(lambda: [function(item) for item in items], number=1, repeat=repeat))
+    return elapsed / len(items) * 1e6
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--draws', type=int, default=20000)
+    parser.add_argument('--counts', default='4,25,50,100,200')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    predictor = CardPredictor()
+    texts = [game_versions(game, rng)[-1] for game in range(1, args.draws + 1)]
+    parsed = [predictor.parse(text, b'') for text in texts]
+    features = [DrawFeatures(draw) for draw in parsed]
+
+    print(f"Tirages : {len(features)}")
+    print(f"   Extraction des caractéristiques : {per_draw_us(DrawFeatures, parsed, args.repeat):6.2f} µs/tirage")
+    print(f"   {'règles':>6}  {'à froid':>10}  {'muettes':>10}  {'mémo chaud':>10}  {'règle/règle':>12}  "
+          f"{'déclenchées':>11}  {'masques':>8}")
+
+    def cold_us(rules) -> float:
+        def cold():
+            fresh = RuleEngine(rules)
+            for draw in features:
+                fresh.matches(draw, False)
+        return min(timeit.repeat(cold, number=1, repeat=args.repeat)) / len(features) * 1e6
+
+    for count in (int(value) for value in args.counts.split(',')):
+        rules = compile_rules(rule_table(count))
+        engine = RuleEngine(rules)
+        active = engine.active_rules(False)
+
+        def naive(draw):
+            claimed, matched = set(), []
+            for rule in active:
+                slot = (rule.target, rule.offset)
+                if slot not in claimed and rule.trigger(draw):
+                    claimed.add(slot)
+                    matched.append(rule)
+            return matched
+
+        fired = 0
+        for draw in features:  # Contrôle : mêmes décisions, et mémo réchauffé
+            matched = engine.matches(draw, False)
+            assert matched == naive(draw)
+            fired += len(matched)
+        warm_us = per_draw_us(lambda draw: engine.matches(draw, False), features, args.repeat)
+        naive_us = per_draw_us(naive, features, args.repeat)
+        silent_us = cold_us(compile_rules(rule_table(count, silent=True)))
+        print(f"   {count:>6}  {cold_us(rules):7.2f} µs  {silent_us:7.2f} µs  {warm_us:7.2f} µs  {naive_us:9.2f} µs  "
+              f"{fired / len(features):11.2f}  {len(engine._memo):>8}")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark de l'évaluation en ombre : surcoût par tirage de 1 à N jeux en
+ombre (l'autre mode, puis des jeux candidats de règles aléatoires, de la
+taille du jeu réel par défaut) sur le cœur du chemin réel (analyse,
+caractéristiques, vérification, règles), puis sur le chemin complet
+(handlers.process_update, trafic et bot factice de soak_test.py).
+
+Règles réelles et candidates sont compilées dans un seul moteur
+(ShadowBank) : le passage du jeu réel sert tous les jeux, il est compté
+dans le chemin réel. Ce qui reste par jeu suit ses propres prédictions
+(création, vérification, comptes), au même coût que celles du jeu réel.
+Mesures de référence (4 règles par jeu candidat) :
+- cœur (≈ 18,5 µs par tirage sans ombre) : ≈ 2,7 à 3,6 µs par jeu ;
+- chemin complet (≈ 250 à 350 µs par jeu) : 1,3 à 3,8 % par jeu, 9 % pour
+  8 jeux (1,4 prédiction en ombre par tirage).
+Avec 25 règles par jeu (--rules 25 : ~0,9 prédiction par tirage et par
+jeu), 8 jeux coûtent 18 % du chemin complet.
+
+Usage : python scripts/bench_shadow.py [--draws 20000] [--sets 1,2,4,8] [--rules 4] [--rounds 3] [--games 1440]
+"""
+import os
+import sys
+import random
+import argparse
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import soak_test  # noqa: E402  (en premier : configuration isolée du chemin complet, avant card_predictor)
+from bench_rules import random_rule  # noqa: E402
+from card_predictor import CardPredictor  # noqa: E402
+from rule_engine import compile_rules  # noqa: E402
+from shadow import ShadowSet  # noqa: E402
+from synthetic_traffic import game_versions  # noqa: E402
+
+
+def candidate_table(rules: int, seed: int):
+    """Jeu candidat de `rules` règles aléatoires (sélectives comme les règles réelles), propre à `seed`."""
+    rng = random.Random(seed)
+    return [random_rule(index, rng) for index in range(rules)]
+
+
+def shadow_sets(count: int, rules: int):
+    sets = [ShadowSet('autre_mode', mode='other')] if count else []
+    for index in range(1, count):
+        sets.append(ShadowSet(f"candidat_{index}", compile_rules(candidate_table(rules, seed=index)), source='bench'))
+    return tuple(sets)
+
+
+def run(texts, sets) -> tuple:
+    """Traite le flux ; retourne (µs/tirage du chemin réel, µs/tirage de l'ombre, prédictions en ombre/tirage)."""
+    predictor = CardPredictor()
+    predictor.shadow_sets = sets
+    live = shadow = 0.0
+    for text in texts:
+        started = time.perf_counter()
+        parsed = predictor.parse(text, b'')
+        features = predictor.features(parsed)
+        predictor.verify_prediction(text, parsed=parsed, features=features)
+        for game_number, predicted_value in predictor.predictions_for(parsed, features):
+            predictor.make_prediction(game_number, predicted_value)
+        middle = time.perf_counter()
+        predictor.evaluate_shadows(parsed, features)
+        shadow += time.perf_counter() - middle
+        live += middle - started
+    predicted = sum(results.predicted for results in predictor.shadow_results.values())
+    return live / len(texts) * 1e6, shadow / len(texts) * 1e6, predicted / len(texts)
+
+
+def full_path_us(sets, games: int, clock, bot) -> tuple:
+    """Une journée du trafic de soak_test.py par handlers.process_update (⏰, résultats et version finalisée
+    de chaque message) ; retourne (µs par jeu, dont µs par jeu dans evaluate_shadows), mesurés sur les mêmes
+    updates : le rapport ne dépend pas de la dérive de la machine d'un tour à l'autre."""
+    predictor = soak_test.card_predictor
+    predictor.shadow_sets = sets
+    predictor.shadow_results.clear()
+    shadow = [0.0]
+
+    def timed_shadows(parsed, features):
+        started = time.perf_counter()
+        try:
+            return CardPredictor.evaluate_shadows(predictor, parsed, features)
+        finally:
+            shadow[0] += time.perf_counter() - started
+
+    predictor.evaluate_shadows = timed_shadows
+    options = argparse.Namespace(days=1, games_per_day=games, seed=1, missed=0.005, cancelled=0.01, duplicates=0.01)
+    latencies = []
+    try:
+        for _, _, _, day_latencies, _ in soak_test.simulate(options, clock, bot):
+            latencies += day_latencies
+    finally:
+        del predictor.evaluate_shadows
+    return sum(latencies) / games, shadow[0] / games * 1e6
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--draws', type=int, default=20000)
+    parser.add_argument('--sets', default='1,2,4,8')
+    parser.add_argument('--rules', type=int, default=4, help="règles par jeu candidat (jeu réel : 4)")
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--games', type=int, default=1440, help="jeux par tour du chemin complet")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    texts = [game_versions(game, rng)[-1] for game in range(1, args.draws + 1)]
+    counts = [0] + [int(value) for value in args.sets.split(',') if int(value)]
+    configurations = {count: shadow_sets(count, args.rules) for count in counts}
+
+    # Tours entrelacés, meilleur tour par configuration : la machine dérive moins d'une configuration à l'autre
+    best = {}
+    for _ in range(args.rounds):
+        for count, sets in configurations.items():
+            run(texts, sets)  # Premier passage : mémos des moteurs réchauffés, comme en service continu
+            result = run(texts, sets)
+            if count not in best or sum(result[:2]) < sum(best[count][:2]):
+                best[count] = result
+
+    base = sum(best[0][:2])
+    print(f"Tirages finalisés : {len(texts)} ({args.rules} règles par jeu candidat), sans ombre : {base:.2f} µs")
+    print(f"   {'jeux':>4}  {'chemin réel':>12}  {'ombre':>10}  {'surcoût':>10}  {'par jeu':>9}  "
+          f"{'par jeu %':>9}  {'préd./tirage':>12}")
+    for count in counts[1:]:
+        live_us, shadow_us, predicted = best[count]
+        extra = live_us + shadow_us - base  # Le passage partagé compte dans le chemin réel
+        print(f"   {count:>4}  {live_us:9.2f} µs  {shadow_us:7.2f} µs  {extra:7.2f} µs  {extra / count:6.2f} µs  "
+              f"{extra / count / base:9.0%}  {predicted:12.2f}")
+
+    # Chemin complet (process_update) : ce que le bot dépense réellement par jeu
+    clock, bot = soak_test.SimClock(), soak_test.SoakBot()
+    soak_test.card_predictor.set_clock(clock)
+    soak_test.handlers.outbox = soak_test.Outbox(':memory:', clock=clock)
+    soak_test.handlers.timeseries = soak_test.TimeSeriesStore(clock=clock)
+    full = {}
+    for _ in range(args.rounds):
+        for count, sets in configurations.items():
+            if not count:
+                continue
+            full_path_us(sets, args.games, clock, bot)  # Chauffe
+            result = full_path_us(sets, args.games, clock, bot)
+            if count not in full or result[1] / result[0] < full[count][1] / full[count][0]:
+                full[count] = result
+
+    print(f"\nChemin complet (process_update, {args.games} jeux, 3 versions par message)")
+    print(f"   {'jeux':>4}  {'par jeu':>10}  {'ombre':>9}  {'part':>6}  {'par jeu en ombre':>17}")
+    for count in counts[1:]:
+        total_us, shadow_us = full[count]
+        print(f"   {count:>4}  {total_us:7.1f} µs  {shadow_us:6.1f} µs  {shadow_us / total_us:6.1%}  "
+              f"{shadow_us / count / (total_us - shadow_us):17.1%}")
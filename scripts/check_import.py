@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Vérification et débit de l'import d'historique (history_import) sur un export
+synthétique de plusieurs jours : numérotation recommencée chaque jour, jeux
+manqués, messages hors tirage (annonces, messages de service) et textes en
+entités, comme dans un export Telegram Desktop réel.
+
+Les compteurs importés (tirages, tirages avec Dame, cycles N-2 → N) sont
+comparés à un calcul de référence jour par jour, puis l'historique doit finir
+sur le dernier jeu du dernier jour et une relance (fichier de reprise) ne
+doit rien réimporter. Le débit (messages/s) est affiché ; --min-rate le
+rend bloquant.
+
+Usage : python scripts/check_import.py [--days 3] [--games-per-day 1440] [--noise 0.2] [--min-rate 0]
+        python scripts/check_import.py --days 200 --min-rate 50000   # ≈ 300 000 messages
+"""
+import os
+import sys
+import json
+import random
+import logging
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from card_predictor import DAME_CARD_PATTERN, CardPredictor  # noqa: E402
+from history_import import HistoryImporter  # noqa: E402
+from synthetic_traffic import game_versions  # noqa: E402
+
+logging.basicConfig(level=logging.WARNING)
+
+REFERENCE = CardPredictor()  # Fonctions historiques extract_* (référence)
+NOISE_TEXTS = ("📢 Nouvelle session dans 5 minutes", "Bonne chance à tous 🍀", "", "#pub Rejoignez le canal VIP")
+
+
+def write_export(path: str, args) -> dict:
+    """Écrit l'export (format Telegram Desktop) ; retourne les compteurs de référence."""
+    rng = random.Random(args.seed)
+    expected = {'draws': 0, 'dame_draws': 0, 'cycles': 0, 'messages': 0, 'last_game': None}
+    message_id = 0
+    with open(path, 'w', encoding='utf-8') as handle:
+        handle.write('{\n "name": "Source",\n "type": "public_channel",\n "id": 1,\n "messages": [\n')
+        for _ in range(args.days):
+            first_groups = {}  # Jeux du jour : la référence ne regarde jamais la veille
+            for game_number in range(1, args.games_per_day + 1):
+                while rng.random() < args.noise:
+                    message_id += 1
+                    message = {'id': message_id, 'type': 'message', 'text': rng.choice(NOISE_TEXTS)}
+                    if rng.random() < 0.3:
+                        message = {'id': message_id, 'type': 'service', 'action': 'pin_message'}
+                    handle.write(('' if message_id == 1 else ',\n') + json.dumps(message, ensure_ascii=False))
+                if rng.random() < args.missed:
+                    continue
+                text = game_versions(game_number, rng)[-1]
+                first_group = REFERENCE.extract_first_group_content(text)
+                first_groups[game_number] = first_group
+                expected['draws'] += 1
+                if DAME_CARD_PATTERN.search(first_group):
+                    expected['dame_draws'] += 1
+                    trigger = first_groups.get(game_number - 2)
+                    if trigger is not None and not DAME_CARD_PATTERN.search(trigger):
+                        expected['cycles'] += 1
+                expected['last_game'] = game_number
+                message_id += 1
+                if rng.random() < 0.3:  # Export Desktop : numéro de jeu en entité hashtag
+                    tag = f"#N{game_number}"
+                    text = [{'type': 'hashtag', 'text': tag}, text[len(tag):]]
+                message = {'id': message_id, 'type': 'message', 'date': '2025-01-01T00:00:00', 'text': text}
+                handle.write(('' if message_id == 1 else ',\n') + json.dumps(message, ensure_ascii=False))
+        handle.write('\n ]\n}\n')
+    expected['messages'] = message_id
+    return expected
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, default=3)
+    parser.add_argument('--games-per-day', type=int, default=1440)
+    parser.add_argument('--noise', type=float, default=0.2, help="probabilité d'un message hors tirage avant un jeu")
+    parser.add_argument('--missed', type=float, default=0.005)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--min-rate', type=float, default=0, help="débit minimal exigé (messages/s)")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        export_path = os.path.join(directory, 'result.json')
+        checkpoint_path = os.path.join(directory, 'import.checkpoint')
+        expected = write_export(export_path, args)
+        size = os.path.getsize(export_path)
+
+        predictor = CardPredictor()
+        importer = HistoryImporter(predictor, checkpoint_path=checkpoint_path)
+        stats = importer.run(export_path)
+        print(f"{stats['messages']} messages ({size / 1e6:.1f} Mo, {args.days} jours) importés en "
+              f"{stats['seconds']} s : {stats['messages_per_second']} msg/s, {stats['draws']} tirages")
+
+        cycle_stats = predictor.cycle_stats
+        for name in ('draws', 'dame_draws', 'cycles'):
+            print(f"   {name:<10} importé {cycle_stats[name]:>7}  référence {expected[name]:>7}")
+            if cycle_stats[name] != expected[name]:
+                failures.append(f"{name} : {cycle_stats[name]} ≠ {expected[name]} (référence)")
+        if stats['messages'] != expected['messages']:
+            failures.append(f"messages lus : {stats['messages']} ≠ {expected['messages']}")
+        if next(reversed(predictor.draw_history), None) != expected['last_game']:
+            failures.append(f"historique : {list(predictor.draw_history)} ne finit pas sur N{expected['last_game']}")
+
+        rerun = HistoryImporter(predictor, checkpoint_path=checkpoint_path).run(export_path)
+        if rerun['draws'] or predictor.cycle_stats['draws'] != expected['draws']:
+            failures.append(f"relance : {rerun['draws']} tirages réimportés")
+
+        if args.min_rate and stats['messages_per_second'] < args.min_rate:
+            failures.append(f"débit {stats['messages_per_second']} msg/s < {args.min_rate:.0f}")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Import conforme à la référence")
+    sys.exit(1 if failures else 0)
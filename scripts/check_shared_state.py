@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Vérification de l'état partagé entre workers : deux prédicteurs (un par
+thread, chacun avec sa propre instance du backend, comme deux workers
+Gunicorn) enregistrent des tirages entrelacés sur le même canal. Aucun
+tirage ne doit être perdu et les deux prédicteurs doivent finir avec le même
+historique. Backends : SQLite (fichier temporaire) et Redis, via le client en
+mémoire de fake_redis.py.
+
+Pour Redis, le verrou expiré est aussi vérifié : un worker dont le verrou a
+été repris par un autre ne peut ni enregistrer son état, ni libérer le
+verrou de l'autre.
+
+Usage : python scripts/check_shared_state.py [--backend all|sqlite|redis] [--draws 300]
+"""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from card_predictor import CardPredictor  # noqa: E402
+from state_store import RedisStateStore, SQLiteStateStore  # noqa: E402
+from fake_redis import FakeRedis  # noqa: E402
+from synthetic_traffic import game_versions  # noqa: E402
+
+logging.basicConfig(level=logging.WARNING)
+
+CHANNEL = '-1003424179389'
+
+
+def run_worker(predictor: CardPredictor, first_game: int, draws: int, seed: int, errors: list):
+    """Enregistre un tirage par transaction : jeux first_game, first_game + 2..."""
+    rng = random.Random(seed)
+    try:
+        for index in range(draws):
+            game_number = first_game + 2 * index
+            text = game_versions(game_number, rng)[-1]
+            with predictor.transaction(CHANNEL):
+                predictor.record_draw(game_number, text, predictor.parse(text), None)
+    except Exception as e:
+        errors.append(f"worker {first_game} : {type(e).__name__}: {e}")
+
+
+def check_workers(name: str, make_store, draws: int) -> list:
+    failures = []
+    predictors = [CardPredictor(make_store()) for _ in range(2)]
+    errors = []
+    threads = [threading.Thread(target=run_worker, args=(predictor, 1 + worker, draws, worker, errors))
+               for worker, predictor in enumerate(predictors)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    failures.extend(f"{name} : {error}" for error in errors)
+
+    # Chaque prédicteur recharge l'état enregistré par l'autre à sa prochaine transaction
+    views = []
+    for predictor in predictors + [CardPredictor(make_store())]:
+        with predictor.transaction(CHANNEL):
+            views.append((predictor.cycle_stats['draws'], list(predictor.draw_history)))
+    print(f"   {name:<6} {2 * draws} transactions en {elapsed:.2f} s, tirages vus : "
+          f"{', '.join(str(count) for count, _ in views)}")
+    for count, history in views:
+        if count != 2 * draws:
+            failures.append(f"{name} : {count} tirages comptés au lieu de {2 * draws} (mise à jour perdue)")
+            break
+    if any(history != views[0][1] for _, history in views):
+        failures.append(f"{name} : historiques différents entre workers")
+    return failures
+
+
+def check_expired_lock() -> list:
+    """Verrou expiré puis repris : l'ancien détenteur n'enregistre rien et ne libère pas le verrou repris."""
+    failures = []
+    client = FakeRedis()
+    slow = RedisStateStore(client=client, lock_timeout=0.05)
+    fast = RedisStateStore(client=client)
+    lock_key = f"{fast.prefix}{CHANNEL}:lock"
+
+    slow_context = slow.begin(CHANNEL)
+    slow_tx = slow_context.__enter__()
+    time.sleep(0.1)  # Le verrou du worker lent expire
+    fast_context = fast.begin(CHANNEL)
+    fast_tx = fast_context.__enter__()
+    fast_tx.save(b'rapide')
+    try:
+        slow_tx.save(b'lent')
+        failures.append("redis : état enregistré avec un verrou expiré")
+    except TimeoutError:
+        pass
+    slow_context.__exit__(None, None, None)
+    if client.get(lock_key) is None:
+        failures.append("redis : le verrou repris a été libéré par son ancien détenteur")
+    fast_context.__exit__(None, None, None)
+    if client.get(lock_key) is not None:
+        failures.append("redis : verrou non libéré")
+    if client.get(f"{fast.prefix}{CHANNEL}") != b'rapide':
+        failures.append(f"redis : état {client.get(f'{fast.prefix}{CHANNEL}')!r} au lieu de b'rapide'")
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backend', choices=('all', 'sqlite', 'redis'), default='all')
+    parser.add_argument('--draws', type=int, default=300, help="tirages par worker")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        if args.backend in ('all', 'sqlite'):
+            path = os.path.join(directory, 'state.sqlite3')
+            failures += check_workers('sqlite', lambda: SQLiteStateStore(path), args.draws)
+        if args.backend in ('all', 'redis'):
+            client = FakeRedis()
+            failures += check_workers('redis', lambda: RedisStateStore(client=client), args.draws)
+            failures += check_expired_lock()
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ État partagé cohérent entre workers")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Client Redis en mémoire pour tester RedisStateStore sans serveur : set (nx, px),
+get, incr, delete et eval. Un serveur Redis exécute une commande (ou un script
+Lua) à la fois ; ici, un verrou rend chaque appel atomique entre threads.
+
+eval n'interprète pas le Lua : seuls les scripts de state_store (libération du
+verrou, enregistrement vérifié par jeton) sont reconnus, et rejoués en Python
+avec la même sémantique. Les valeurs sont rendues en bytes, comme redis-py.
+"""
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import state_store  # noqa: E402
+
+
+def _bytes(value) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode()
+
+
+class FakeRedis:
+    """Sous-ensemble de redis.Redis utilisé par RedisStateStore, expiration PX comprise."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.Lock()
+        self._scripts = {
+            state_store._RELEASE_SCRIPT: self._release,
+            state_store._SAVE_SCRIPT: self._save,
+        }
+
+    def _get(self, key):
+        expires = self._expires.get(key)
+        if expires is not None and self.clock() >= expires:
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return self._data.get(key)
+
+    def _set(self, key, value, px=None):
+        self._data[key] = _bytes(value)
+        self._expires.pop(key, None)
+        if px is not None:
+            self._expires[key] = self.clock() + px / 1000
+
+    def set(self, key, value, nx=False, px=None):
+        with self._lock:
+            if nx and self._get(key) is not None:
+                return None
+            self._set(key, value, px)
+            return True
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key)
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            value = int(self._get(key) or 0) + amount
+            self._data[key] = _bytes(value)
+            return value
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                if self._get(key) is not None:
+                    removed += 1
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+            return removed
+
+    def eval(self, script, numkeys, *keys_and_args):
+        handler = self._scripts.get(script)
+        if handler is None:
+            raise NotImplementedError("FakeRedis : script Lua inconnu")
+        with self._lock:
+            return handler(list(keys_and_args[:numkeys]), [_bytes(arg) for arg in keys_and_args[numkeys:]])
+
+    # --- Scripts de state_store ---
+
+    def _release(self, keys, args):
+        if self._get(keys[0]) == args[0]:
+            self._data.pop(keys[0], None)
+            self._expires.pop(keys[0], None)
+            return 1
+        return 0
+
+    def _save(self, keys, args):
+        if self._get(keys[0]) != args[0]:
+            return -1
+        self._set(keys[1], args[1])
+        value = int(self._get(keys[2]) or 0) + 1
+        self._data[keys[2]] = _bytes(value)
+        return value
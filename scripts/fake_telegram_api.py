@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Faux serveur local de l'API Bot Telegram pour les tests de charge.
+Implémente getUpdates, sendMessage, editMessageText, answerCallbackQuery,
+setWebhook, deleteWebhook, getWebhookInfo et sendDocument, avec latence,
+erreurs 429 et erreurs 500 configurables.
+
+Routes de contrôle :
+  POST /_fake/updates   Ajoute des updates (liste JSON) à la file de getUpdates
+  GET  /_fake/stats     Compteurs par méthode et latences d'acquittement
+  POST /_fake/reset     Remet la file et les compteurs à zéro
+
+Usage : python scripts/fake_telegram_api.py --port 8081 --latency-ms 40 --rate-429 0.01
+Puis lancez le bot avec TELEGRAM_API_BASE=http://127.0.0.1:8081
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class FakeTelegramState:
+    """État partagé du faux serveur (file d'updates, messages, statistiques)."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, rate_429=0.0, error_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.condition = threading.Condition()
+        self.reset()
+
+    def reset(self):
+        with self.condition:
+            self.queue = []              # [(update, enqueued_at)]
+            self.next_update_id = 1
+            self.next_message_id = 1
+            self.webhook_url = ''
+            self.calls = Counter()
+            self.injected = Counter()
+            self.ack_latencies = []      # secondes entre l'ajout et l'acquittement (offset)
+            self.messages = {}           # {(chat_id, message_id): text}
+
+    # --- File d'updates ---
+
+    def enqueue(self, updates):
+        now = time.monotonic()
+        with self.condition:
+            for update in updates:
+                update = dict(update)
+                update['update_id'] = self.next_update_id
+                self.next_update_id += 1
+                self.queue.append((update, now))
+            self.condition.notify_all()
+        return len(updates)
+
+    def get_updates(self, offset, limit, timeout):
+        deadline = time.monotonic() + min(timeout, 50)
+        with self.condition:
+            if offset:
+                # Un offset acquitte toutes les updates précédentes
+                now = time.monotonic()
+                kept = []
+                for update, enqueued_at in self.queue:
+                    if update['update_id'] < offset:
+                        self.ack_latencies.append(now - enqueued_at)
+                    else:
+                        kept.append((update, enqueued_at))
+                self.queue = kept
+            while not self.queue and time.monotonic() < deadline:
+                self.condition.wait(deadline - time.monotonic())
+            return [update for update, _ in self.queue[:limit]]
+
+    # --- Messages ---
+
+    def new_message(self, chat_id, text):
+        with self.condition:
+            message_id = self.next_message_id
+            self.next_message_id += 1
+            self.messages[(str(chat_id), message_id)] = text
+        return {'message_id': message_id, 'chat': {'id': chat_id}, 'date': int(time.time()), 'text': text}
+
+    def stats(self):
+        with self.condition:
+            latencies = sorted(self.ack_latencies)
+            return {
+                'calls': dict(self.calls),
+                'injected': dict(self.injected),
+                'queued': len(self.queue),
+                'acknowledged': len(latencies),
+                'ack_latency_ms': percentiles(latencies),
+                'messages': len(self.messages),
+            }
+
+
+def percentiles(sorted_values, points=(50, 90, 95, 99)):
+    """Percentiles (en ms) d'une liste triée de durées en secondes."""
+    if not sorted_values:
+        return {}
+    result = {}
+    for point in points:
+        index = min(len(sorted_values) - 1, int(round(point / 100 * (len(sorted_values) - 1))))
+        result[f"p{point}"] = round(sorted_values[index] * 1000, 2)
+    result['max'] = round(sorted_values[-1] * 1000, 2)
+    return result
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    state: FakeTelegramState = None
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Évite les 40 ms d'ACK retardé en keep-alive
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_params(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('application/json') and raw:
+            return json.loads(raw)
+        if content_type.startswith('application/x-www-form-urlencoded') and raw:
+            from urllib.parse import parse_qsl
+            return dict(parse_qsl(raw.decode()))
+        if content_type.startswith('multipart/form-data'):
+            return {'_multipart_bytes': len(raw)}
+        return {}
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def _dispatch(self):
+        state = self.state
+        path = self.path.split('?', 1)[0]
+
+        if path.startswith('/_fake/'):
+            params = self._read_params() if self.command == 'POST' else {}
+            if path == '/_fake/updates':
+                count = state.enqueue(params if isinstance(params, list) else params.get('updates', []))
+                return self._send_json({'ok': True, 'enqueued': count})
+            if path == '/_fake/stats':
+                return self._send_json(state.stats())
+            if path == '/_fake/reset':
+                state.reset()
+                return self._send_json({'ok': True})
+            return self._send_json({'ok': False}, 404)
+
+        parts = path.strip('/').split('/')
+        if len(parts) != 2 or not parts[0].startswith('bot'):
+            return self._send_json({'ok': False, 'error_code': 404, 'description': 'Not Found'}, 404)
+        method = parts[1]
+        params = self._read_params()
+
+        with state.condition:
+            state.calls[method] += 1
+
+        # Latence simulée
+        delay = state.latency_ms + state.rng.uniform(0, state.jitter_ms)
+        if delay:
+            time.sleep(delay / 1000)
+
+        # Erreurs injectées (getUpdates exclu pour ne pas fausser l'acquittement)
+        if method != 'getUpdates':
+            roll = state.rng.random()
+            if roll < state.rate_429:
+                with state.condition:
+                    state.injected['429'] += 1
+                return self._send_json({
+                    'ok': False, 'error_code': 429,
+                    'description': 'Too Many Requests: retry after 1',
+                    'parameters': {'retry_after': 1},
+                }, 429)
+            if roll < state.rate_429 + state.error_rate:
+                with state.condition:
+                    state.injected['500'] += 1
+                return self._send_json({'ok': False, 'error_code': 500, 'description': 'Internal Server Error'}, 500)
+
+        handler = getattr(self, f"api_{method}", None)
+        if handler is None:
+            return self._send_json({'ok': False, 'error_code': 404, 'description': 'Not Found: method not found'}, 404)
+        return self._send_json({'ok': True, 'result': handler(params)})
+
+    # --- Méthodes de l'API Bot ---
+
+    def api_getUpdates(self, params):
+        return self.state.get_updates(
+            int(params.get('offset') or 0), int(params.get('limit') or 100), float(params.get('timeout') or 0)
+        )
+
+    def api_sendMessage(self, params):
+        return self.state.new_message(params.get('chat_id'), params.get('text', ''))
+
+    def api_editMessageText(self, params):
+        key = (str(params.get('chat_id')), int(params.get('message_id') or 0))
+        with self.state.condition:
+            self.state.messages[key] = params.get('text', '')
+        return {'message_id': key[1], 'chat': {'id': params.get('chat_id')}, 'text': params.get('text', '')}
+
+    def api_answerCallbackQuery(self, params):
+        return True
+
+    def api_setWebhook(self, params):
+        self.state.webhook_url = params.get('url', '')
+        return True
+
+    def api_deleteWebhook(self, params):
+        self.state.webhook_url = ''
+        return True
+
+    def api_getWebhookInfo(self, params):
+        return {'url': self.state.webhook_url, 'pending_update_count': len(self.state.queue)}
+
+    def api_sendDocument(self, params):
+        return self.state.new_message(params.get('chat_id'), '[document]')
+
+
+def serve(host='127.0.0.1', port=8081, **options):
+    state = FakeTelegramState(**options)
+    handler = type('BoundFakeTelegramHandler', (FakeTelegramHandler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, state
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Faux serveur de l'API Bot Telegram")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--rate-429', type=float, default=0.0, help="Fraction des appels répondant 429")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction des appels répondant 500")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server, _ = serve(args.host, args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                      rate_429=args.rate_429, error_rate=args.error_rate, seed=args.seed)
+    print(f"🧪 Faux serveur Telegram sur http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Fuzz différentiel de l'analyse et des règles : le chemin optimisé (parse(),
+DrawFeatures, RuleEngine) doit décider exactement comme les fonctions
+historiques (extract_*, check_dame_in_first_group, check_dame_rule,
+should_predict), message par message.
+
+Les messages sont générés au format du canal source (#n/#N, rangs 10,
+couleurs ♥️/❤️ avec ou sans U+FE0F, Valet/Roi/Dame en toutes lettres, ⏰ ✅ 🔰)
+puis mutés (insertions, suppressions, doublons, parenthèses orphelines,
+sauts de ligne). Chaque message est comparé champ par champ, puis décision
+par décision dans les deux modes (règles intégrées et fichier de règles),
+ainsi que pour la vérification (Dame dans le premier groupe).
+
+Le corpus (scripts/parser_corpus.jsonl) est rejoué en premier : cas limites
+connus et écarts déjà trouvés, servant de tests de non-régression. Un
+nouvel écart est réduit à un message minimal et ajouté au corpus (--record).
+
+Usage : python scripts/fuzz_parser.py [--iterations 200000] [--seed 1] [--record]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from collections import Counter
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from card_predictor import CardPredictor  # noqa: E402
+from draw_parser import ParsedDraw, content_digest  # noqa: E402
+from rule_engine import DAME_RULES, DrawFeatures, RuleEngine, load_rules  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parser_corpus.jsonl')
+
+RANKS = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K']
+SUITS = ['♥️', '♥', '❤️', '❤', '♠️', '♠', '♦️', '♦', '♣️', '♣']
+FIGURE_WORDS = ['Valet', 'Roi', 'Dame', 'As', 'V', 'R', 'j', 'q', 'k', 'a']
+INDICATORS = ['⏰', '✅', '🔰', '▶️', '']
+# Alphabet des mutations : délimiteurs, figures, chiffres, couleurs et sélecteur de variante seul
+MUTATION_ALPHABET = ['(', ')', ' ', '\n', '#', 'n', 'N', '.', '-', 'J', 'j', 'Q', 'q', 'K', 'A', 'V', 'R',
+                     '1', '0', '7', '\ufe0f', '♥', '❤', '♠', '♦', '♣', '⏰', '✅', '🔰', 'Dame', 'Valet', '10']
+
+
+# --- Génération ---
+
+def random_card(rng: random.Random) -> str:
+    if rng.random() < 0.05:
+        return rng.choice(FIGURE_WORDS)
+    return rng.choice(RANKS) + rng.choice(SUITS)
+
+
+def random_group(rng: random.Random) -> str:
+    cards = [random_card(rng) for _ in range(rng.choice((0, 1, 2, 2, 3, 3, 4)))]
+    separator = rng.choice(('', '', ' ', ','))
+    return f"({separator.join(cards)})"
+
+
+def random_message(rng: random.Random) -> str:
+    """Message au format du canal source, avec ses variantes courantes."""
+    parts = []
+    if rng.random() < 0.95:
+        tag = rng.choice(('#N', '#n', '#N', '#n', '# N', '#'))
+        parts.append(f"{tag}{rng.choice((rng.randint(0, 9), rng.randint(1, 1440), rng.randint(1, 10 ** 7)))}"
+                     f"{rng.choice(('.', '', '. '))}")
+    parts.append(rng.choice(INDICATORS))
+    groups = [f"{rng.randint(0, 9)}{random_group(rng)}" for _ in range(rng.choice((0, 1, 2, 2, 2, 3)))]
+    parts.append(rng.choice((' - ', '-', ' ', '\n')).join(groups))
+    if rng.random() < 0.3:
+        parts.append(f" #T{rng.randint(0, 18)}")
+    if rng.random() < 0.3:
+        parts.append(rng.choice((' ✅', ' 🔰', ' ⏰', ' #R', ' Valet', ' Roi', ' As')))
+    return ''.join(parts)
+
+
+def mutate(text: str, rng: random.Random) -> str:
+    """Une à trois mutations aléatoires du texte."""
+    for _ in range(rng.randint(1, 3)):
+        position = rng.randint(0, len(text))
+        operation = rng.random()
+        if operation < 0.35:
+            text = text[:position] + rng.choice(MUTATION_ALPHABET) + text[position:]
+        elif operation < 0.55 and text:
+            text = text[:position] + text[position + 1:]
+        elif operation < 0.7 and text:
+            end = min(len(text), position + rng.randint(1, 8))
+            text = text[:end] + text[position:end] + text[end:]
+        elif operation < 0.85:
+            # Variante d'émoji : ajout ou retrait du sélecteur U+FE0F, ♥ ↔ ❤
+            text = text.replace('\ufe0f', '', 1) if rng.random() < 0.5 and '\ufe0f' in text else \
+                text.replace('♥', '❤', 1) if '♥' in text else text + '\ufe0f'
+        else:
+            text = text.swapcase() if rng.random() < 0.2 else text[:position] + text[position:].upper()
+    return text
+
+
+# --- Comparaison ---
+
+def legacy_parse(predictor: CardPredictor, text: str) -> ParsedDraw:
+    """Champs obtenus par les fonctions historiques extract_* (référence)."""
+    signals = predictor.extract_figure_signals(text)
+    return ParsedDraw(
+        game_number=predictor.extract_game_number(text),
+        first_group=predictor.extract_first_group_content(text),
+        second_group=predictor.extract_second_group_content(text),
+        first_two_cards=predictor.extract_first_two_cards_with_value(text),
+        signals=(signals['J'], signals['K'], signals['A']),
+        has_dame=predictor.check_dame_in_first_group(text),
+        is_pending=predictor.is_pending_message(text),
+        is_complete=predictor.has_completion_indicators(text),
+        digest=content_digest(text),
+    )
+
+
+class Differ:
+    """Compare les deux chemins sur un message ; les moteurs (et leurs mémos) vivent tout le test."""
+
+    def __init__(self):
+        self.legacy = CardPredictor()
+        self.optimized = CardPredictor()
+        self.engines = {'intégrées': RuleEngine(DAME_RULES)}
+        rules_path = os.path.join(ROOT, 'rules.json')
+        if os.path.exists(rules_path):
+            self.engines['rules.json'] = RuleEngine(load_rules(rules_path))
+        self.coverage = Counter()  # Décisions historiques positives par mode, Dames vues (couverture)
+
+    def decisions(self, predictor: CardPredictor, intelligent: bool, call) -> Tuple:
+        predictor.intelligent_mode_active = intelligent
+        predictor.processed_messages.clear()
+        return call()
+
+    def compare(self, text: str) -> List[str]:
+        """Écarts trouvés : ['champ : historique ≠ optimisé', ...]."""
+        expected = legacy_parse(self.legacy, text)
+        parsed = self.optimized.parse(text)
+        differences = [f"{field} : {old!r} ≠ {new!r}" for field, old, new in zip(ParsedDraw._fields, expected, parsed)
+                       if old != new]
+
+        features = DrawFeatures(parsed)
+        self.coverage['Dame'] += expected.has_dame
+        if expected.has_dame != features.has('Q'):
+            differences.append(f"vérification Dame : {expected.has_dame!r} ≠ {features.has('Q')!r}")
+
+        for intelligent in (False, True):
+            mode = 'intelligent' if intelligent else 'défaut'
+            predict, game_number, value = self.decisions(
+                self.legacy, intelligent, lambda: self.legacy.should_predict(text, parsed=expected))
+            old = [(game_number, value)] if predict else []
+            if predict:
+                self.coverage[value] += 1
+            for name, engine in self.engines.items():
+                self.optimized.rule_engine = engine
+                new = self.decisions(self.optimized, intelligent,
+                                     lambda: self.optimized.predictions_for(parsed, features))
+                if old != new:
+                    differences.append(f"décision {mode} ({name}) : {old!r} ≠ {new!r}")
+        return differences
+
+
+def shrink(text: str, diverges) -> str:
+    """Réduit le message tant que l'écart persiste : blocs, puis caractères."""
+    size = max(1, len(text) // 2)
+    while size >= 1:
+        index, reduced = 0, False
+        while index < len(text):
+            candidate = text[:index] + text[index + size:]
+            if candidate != text and diverges(candidate):
+                text, reduced = candidate, True
+            else:
+                index += size
+        if not reduced:
+            size //= 2
+    return text
+
+
+def load_corpus() -> List[Dict]:
+    if not os.path.exists(CORPUS_PATH):
+        return []
+    with open(CORPUS_PATH, encoding='utf-8') as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def record(case: Dict):
+    with open(CORPUS_PATH, 'a', encoding='utf-8') as handle:
+        handle.write(json.dumps(case, ensure_ascii=False) + '\n')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--record', action='store_true', help="ajouter les nouveaux écarts (réduits) au corpus")
+    parser.add_argument('--max-failures', type=int, default=20)
+    args = parser.parse_args()
+
+    differ = Differ()
+    failures = 0
+
+    corpus = load_corpus()
+    for case in corpus:
+        for difference in differ.compare(case['text']):
+            failures += 1
+            print(f"❌ Corpus {case['text']!r} ({case.get('note', '')}) : {difference}")
+    print(f"Corpus : {len(corpus)} cas rejoués, {failures} écart(s)")
+
+    rng = random.Random(args.seed)
+    known = {case['text'] for case in corpus}
+    started = time.perf_counter()
+    pool = [random_message(rng) for _ in range(64)]  # Messages valides à muter
+    for iteration in range(args.iterations):
+        if rng.random() < 0.5:
+            text = random_message(rng)
+            pool[rng.randrange(len(pool))] = text
+        else:
+            text = mutate(rng.choice(pool), rng)
+        differences = differ.compare(text)
+        if not differences:
+            continue
+        failures += 1
+        minimal = shrink(text, lambda candidate: bool(differ.compare(candidate)))
+        print(f"❌ Itération {iteration} : {minimal!r}")
+        for difference in differ.compare(minimal):
+            print(f"   {difference}")
+        if args.record and minimal not in known:
+            known.add(minimal)
+            record({'text': minimal, 'note': differ.compare(minimal)[0]})
+        if failures >= args.max_failures:
+            break
+
+    elapsed = time.perf_counter() - started
+    compared = iteration + 1 if args.iterations else 0
+    print(f"{compared} messages comparés en {elapsed:.1f} s ({compared / max(elapsed, 1e-9):.0f}/s), "
+          f"{failures} écart(s)")
+    print("Couverture : " + ', '.join(f"{name} {count}" for name, count in sorted(differ.coverage.items())))
+    sys.exit(1 if failures else 0)
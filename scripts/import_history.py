@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Préremplit l'historique des tirages à partir d'un export du canal source.
+
+Formats : export Telegram Desktop (result.json) ou JSONL (un message par ligne).
+L'état est écrit dans le backend configuré (STATE_BACKEND / STATE_URL) : avec
+le backend mémoire, l'import serait perdu à la fin du script.
+
+Usage :
+  STATE_BACKEND=sqlite python scripts/import_history.py export/result.json
+  python scripts/import_history.py dump.jsonl   # reprend après le dernier message déjà importé
+"""
+import os
+import sys
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import get_config  # noqa: E402
+from state_store import build_state_store  # noqa: E402
+from card_predictor import CardPredictor  # noqa: E402
+from history_import import HistoryImporter  # noqa: E402
+from archive import DrawArchive  # noqa: E402
+
+logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Import d'un export du canal source dans l'historique")
+    parser.add_argument('path', help="result.json (Telegram Desktop) ou fichier .jsonl")
+    parser.add_argument('--checkpoint', default=None,
+                        help="Fichier de reprise (défaut : history_import.checkpoint)")
+    parser.add_argument('--no-resume', action='store_true', help="Ignorer le fichier de reprise")
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--no-archive', action='store_true', help="Ne pas écrire les tirages dans l'archive")
+    args = parser.parse_args()
+
+    config = get_config()
+    if config.STATE_BACKEND == 'memory':
+        print("⚠️ STATE_BACKEND=memory : l'historique importé ne sera pas conservé après le script")
+
+    predictor = CardPredictor(build_state_store(config.STATE_BACKEND, config.STATE_URL))
+    importer = HistoryImporter(
+        predictor,
+        channel_key=str(config.TARGET_CHANNEL_ID),
+        checkpoint_path=args.checkpoint or 'history_import.checkpoint',
+        batch_size=args.batch_size,
+        archive=None if args.no_archive or not config.ARCHIVE_DIR else DrawArchive(
+            config.ARCHIVE_DIR, max_records=config.ARCHIVE_SEGMENT_RECORDS, block_when_full=True),
+    )
+    stats = importer.run(args.path, resume=not args.no_resume)
+
+    cycle_stats = predictor.cycle_stats
+    print(f"📥 {stats['messages']} messages lus ({stats['skipped']} déjà importés), "
+          f"{stats['draws']} tirages ajoutés en {stats['seconds']} s ({stats['messages_per_second']} msg/s)")
+    print(f"📈 Cumul : {cycle_stats['cycles']} cycles sur {cycle_stats['draws']} tirages, "
+          f"dernier message importé : {stats['last_message_id']}")
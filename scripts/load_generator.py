@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Générateur de charge : rejoue du trafic synthétique du canal source à un
+débit choisi et mesure le débit soutenu (updates/s) et les percentiles de latence.
+
+Mode webhook : POST direct des updates sur la route /webhook du bot.
+  python scripts/load_generator.py webhook --url http://127.0.0.1:10000/webhook --rate 200 --duration 30
+
+Mode polling : les updates sont ajoutées au faux serveur (scripts/fake_telegram_api.py)
+que le bot interroge via getUpdates (TELEGRAM_API_BASE=http://127.0.0.1:8081).
+La latence mesurée va de l'ajout à l'acquittement par l'offset du bot.
+  python scripts/load_generator.py polling --fake http://127.0.0.1:8081 --rate 200 --duration 30
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import http.client
+from queue import Queue
+from urllib.parse import urlsplit
+
+from synthetic_traffic import channel_updates
+from fake_telegram_api import percentiles
+
+DEFAULT_CHAT_ID = int(os.environ.get('TARGET_CHANNEL_ID') or -1003424179389)
+
+
+class JsonClient:
+    """Client HTTP à connexion persistante (un par thread)."""
+
+    def __init__(self, base_url: str, headers=None):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port
+        self.https = parts.scheme == 'https'
+        self.path = parts.path or '/'
+        self.headers = {'Content-Type': 'application/json', **(headers or {})}
+        self.conn = None
+
+    def post(self, body: bytes, path=None) -> int:
+        for attempt in (1, 2):
+            if self.conn is None:
+                cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+                self.conn = cls(self.host, self.port, timeout=60)
+            try:
+                self.conn.request('POST', path or self.path, body=body, headers=self.headers)
+                response = self.conn.getresponse()
+                response.read()
+                return response.status
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    raise
+        return 0
+
+
+def paced(updates, rate: float, duration: float):
+    """Produit les updates au débit demandé pendant `duration` secondes."""
+    start = time.monotonic()
+    for index, update in enumerate(updates):
+        due = start + index / rate
+        if due - start >= duration:
+            return
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        yield update
+
+
+def run_webhook(args):
+    work = Queue(maxsize=args.workers * 4)
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    def worker():
+        client = JsonClient(args.url, {'X-Telegram-Bot-Api-Secret-Token': args.secret} if args.secret else None)
+        while True:
+            item = work.get()
+            if item is None:
+                return
+            started = time.monotonic()
+            try:
+                status = client.post(item)
+            except OSError:
+                status = 0
+            elapsed = time.monotonic() - started
+            with lock:
+                if status == 200:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(args.workers)]
+    for thread in threads:
+        thread.start()
+
+    start = time.monotonic()
+    updates = channel_updates(args.chat_id, start_game=args.start_game, games=10 ** 9, seed=args.seed)
+    for update in paced(updates, args.rate, args.duration):
+        work.put(json.dumps(update).encode())
+    for _ in threads:
+        work.put(None)
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    report('webhook', len(latencies), errors[0], elapsed, percentiles(sorted(latencies)))
+
+
+def run_polling(args):
+    client = JsonClient(args.fake)
+    client.post(b'{}', '/_fake/reset')
+
+    start = time.monotonic()
+    sent = 0
+    batch = []
+    last_flush = start
+    updates = channel_updates(args.chat_id, start_game=args.start_game, games=10 ** 9, seed=args.seed)
+    for update in paced(updates, args.rate, args.duration):
+        batch.append(update)
+        if time.monotonic() - last_flush >= 0.01:
+            client.post(json.dumps(batch).encode(), '/_fake/updates')
+            sent += len(batch)
+            batch, last_flush = [], time.monotonic()
+    if batch:
+        client.post(json.dumps(batch).encode(), '/_fake/updates')
+        sent += len(batch)
+
+    # Attendre que le bot ait tout acquitté (le dernier lot n'est acquitté qu'au getUpdates suivant)
+    stats = {}
+    deadline = time.monotonic() + args.drain_timeout
+    while time.monotonic() < deadline:
+        stats = fetch_stats(args.fake)
+        if stats.get('acknowledged', 0) >= sent - 100 and stats.get('queued', 0) <= 100:
+            break
+        time.sleep(0.2)
+    elapsed = time.monotonic() - start
+
+    report('polling', stats.get('acknowledged', 0), sent - stats.get('acknowledged', 0), elapsed,
+           stats.get('ack_latency_ms', {}), stats.get('calls'))
+
+
+def fetch_stats(base_url: str):
+    parts = urlsplit(base_url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=10)
+    conn.request('GET', '/_fake/stats')
+    return json.loads(conn.getresponse().read())
+
+
+def report(mode, done, failed, elapsed, latency_ms, calls=None):
+    print(f"📊 Mode {mode} : {done} updates en {elapsed:.1f} s → {done / elapsed:.1f} updates/s soutenus")
+    print(f"   Échecs / non acquittées : {failed}")
+    if latency_ms:
+        print("   Latence (ms) : " + ", ".join(f"{key}={value}" for key, value in latency_ms.items()))
+    if calls:
+        print(f"   Appels API du bot : {calls}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Générateur de charge du canal source")
+    sub = parser.add_subparsers(dest='mode', required=True)
+
+    webhook = sub.add_parser('webhook')
+    webhook.add_argument('--url', required=True)
+    webhook.add_argument('--workers', type=int, default=8)
+    webhook.add_argument('--secret', default=os.environ.get('WEBHOOK_SECRET_TOKEN'),
+                         help="Jeton X-Telegram-Bot-Api-Secret-Token attendu par le bot")
+
+    polling = sub.add_parser('polling')
+    polling.add_argument('--fake', default='http://127.0.0.1:8081')
+    polling.add_argument('--drain-timeout', type=float, default=60.0)
+
+    for sub_parser in (webhook, polling):
+        sub_parser.add_argument('--rate', type=float, default=100.0, help="updates/s")
+        sub_parser.add_argument('--duration', type=float, default=30.0, help="secondes")
+        sub_parser.add_argument('--chat-id', type=int, default=DEFAULT_CHAT_ID)
+        sub_parser.add_argument('--start-game', type=int, default=1)
+        sub_parser.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args()
+    if args.mode == 'webhook':
+        run_webhook(args)
+    else:
+        run_polling(args)
+    sys.exit(0)
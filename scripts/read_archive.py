@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Lit l'archive des tirages, prédictions et résolutions (une ligne JSON par enregistrement).
+
+Usage :
+  python scripts/read_archive.py --from 1200 --to 1300
+  python scripts/read_archive.py --kind prediction --kind resolution > replay.jsonl
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import json_codec  # noqa: E402
+from archive import read_range  # noqa: E402
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Lecture de l'archive par plage de numéros de jeu")
+    parser.add_argument('--dir', default=os.environ.get('ARCHIVE_DIR') or 'archive')
+    parser.add_argument('--from', dest='first_game', type=int, default=None)
+    parser.add_argument('--to', dest='last_game', type=int, default=None)
+    parser.add_argument('--kind', action='append', choices=('draw', 'prediction', 'resolution'),
+                        help="Type d'enregistrement (répétable, défaut : tous)")
+    args = parser.parse_args()
+
+    out = sys.stdout.buffer
+    for record in read_range(args.dir, args.first_game, args.last_game, set(args.kind or ())):
+        out.write(json_codec.dumps(record) + b'\n')
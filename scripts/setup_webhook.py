@@ -3,10 +3,15 @@
 Script pour configurer automatiquement le webhook Telegram
 """
 import os
+import sys
 import requests
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import derive_webhook_secret  # noqa: E402
+
 REPLIT_DEV_DOMAIN = os.environ.get('REPLIT_DEV_DOMAIN')
 BOT_TOKEN = os.environ.get('BOT_TOKEN')
+TELEGRAM_API_BASE = (os.environ.get('TELEGRAM_API_BASE') or "https://api.telegram.org").rstrip('/')
 
 if not REPLIT_DEV_DOMAIN:
     print("❌ Erreur: REPLIT_DEV_DOMAIN n'est pas défini")
@@ -17,13 +22,17 @@ if not BOT_TOKEN:
     exit(1)
 
 webhook_url = f"https://{REPLIT_DEV_DOMAIN}/webhook"
-api_url = f"https://api.telegram.org/bot{BOT_TOKEN}/setWebhook"
+api_url = f"{TELEGRAM_API_BASE}/bot{BOT_TOKEN}/setWebhook"
 
 print(f"🔧 Configuration du webhook Telegram...")
 print(f"📍 URL du webhook: {webhook_url}")
 
 try:
-    response = requests.post(api_url, json={'url': webhook_url, 'drop_pending_updates': True})
+    # Même jeton secret que celui attendu par la route /webhook
+    secret_token = os.environ.get('WEBHOOK_SECRET_TOKEN') or derive_webhook_secret(BOT_TOKEN)
+    response = requests.post(api_url, json={
+        'url': webhook_url, 'drop_pending_updates': True, 'secret_token': secret_token
+    })
     result = response.json()
     
     if result.get('ok'):
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Test d'endurance accéléré : des semaines de trafic simulé du canal source
+passent par handlers.process_update en quelques minutes, avec un bot
+factice, une horloge simulée (prédicteur, messages ⏰, boîte d'envoi en
+mémoire) et les journaux INFO coupés. Le trafic suit le canal réel : un jeu
+par minute, numérotation recommencée chaque jour, quelques jeux jamais
+finalisés, manqués ou livrés deux fois.
+
+Chaque jour simulé, la taille des structures du prédicteur et le RSS sont
+relevés. Le test échoue (code 1) si une structure plafonnée dépasse son
+plafond, si une autre croît encore sur la seconde moitié du test, si le RSS
+dérive, ou si la latence médiane par update augmente. La fraîcheur est aussi
+vérifiée chaque jour : le dernier jeu finalisé doit être dans l'historique
+et les statistiques de cycles doivent avoir compté chaque jeu finalisé
+(une éviction par numéro de jeu garderait la fin du premier jour). L'historique encodé de /stats (DrawStats) croît par
+conception (un tirage = quelques octets) : il est affiché, pas borné.
+
+Usage : python scripts/soak_test.py [--days 28] [--games-per-day 1440] [--seed 1]
+"""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CHAT_ID = -1003424179389
+ADMIN_CHAT_ID = 42
+
+# Configuration isolée (avant l'import de handlers) : ni archive, ni fichier de règles, ni fichiers d'état
+os.environ.update({
+    'TARGET_CHANNEL_ID': str(CHAT_ID), 'PREDICTION_CHANNEL_ID': '-1003362820311', 'ADMIN_CHAT_ID': str(ADMIN_CHAT_ID),
+    'BOT_TOKEN': '0:soak', 'STATE_BACKEND': 'memory', 'ARCHIVE_DIR': '', 'RULES_FILE': '', 'OUTBOX_PATH': '',
+    'TIMESERIES_PATH': '',
+})
+logging.basicConfig(level=logging.ERROR)
+logging.disable(logging.WARNING)  # Les journaux par update domineraient le temps mesuré
+
+import handlers  # noqa: E402
+from card_predictor import card_predictor  # noqa: E402
+from outbox import STATUS_NAMES, Outbox  # noqa: E402
+from synthetic_traffic import game_versions  # noqa: E402
+from timeseries import TimeSeriesStore  # noqa: E402
+
+# Écart entre les versions d'un message (⏰, résultats, finalisé), en secondes
+VERSION_DELAYS = (0, 20, 45)
+
+
+class SimClock:
+    """Horloge simulée, avancée par le générateur de trafic."""
+
+    def __init__(self, start: float = 1_700_000_000.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class SoakBot:
+    """Bot factice : envois numérotés, éditions acceptées, rien n'est conservé."""
+
+    def __init__(self):
+        self.message_id = 0
+        self.sent = 0
+        self.edited = 0
+
+    def send_message(self, chat_id, text, parse_mode=None, reply_markup=None):
+        self.message_id += 1
+        self.sent += 1
+        return self.message_id
+
+    def edit_message_text(self, chat_id, message_id, text, parse_mode=None, reply_markup=None):
+        self.edited += 1
+        return True
+
+    def answer_callback_query(self, callback_query_id, text=""):
+        pass
+
+
+def structure_sizes() -> dict:
+    """Taille des structures susceptibles de croître avec le temps de service."""
+    return {
+        'predictions': len(card_predictor.predictions),
+        'processed_messages': len(card_predictor.processed_messages),
+        'pending_messages': len(card_predictor.pending_messages),
+        'draw_history': len(card_predictor.draw_history),
+        'last_processed': len(card_predictor.last_processed),
+        'parse_cache': len(handlers.parse_cache._entries),
+        'rule_memo': len(card_predictor.rule_engine._memo),
+        'shadow_memo': len(card_predictor._shadow_bank._memo) if card_predictor._shadow_bank else 0,
+        'shadow_predictions': sum(len(results.predictions) for results in card_predictor.shadow_results.values()),
+        'rule_stats': len(card_predictor.rule_stats.rules),
+        'cycle_triggers': len(card_predictor.cycle_stats['triggers']),
+        'outbox_rows': sum(handlers.outbox.stats().get(status, 0) for status in STATUS_NAMES.values()),
+        'timeseries': len(handlers.timeseries.names()),
+        'timeseries_kb': handlers.timeseries.memory_bytes() // 1024,
+    }
+
+
+def structure_caps() -> dict:
+    """Plafonds des structures bornées par construction : comparées à leur plafond, pas à leur tendance
+    (un test court les voit encore se remplir)."""
+    return {
+        'processed_messages': card_predictor.processed_messages.limit,
+        'pending_messages': card_predictor.pending_messages.max_entries,
+        'draw_history': card_predictor.history_limit,
+        'last_processed': card_predictor.last_processed_limit,
+        'parse_cache': handlers.parse_cache.maxsize,
+        'rule_memo': card_predictor.rule_engine.MEMO_LIMIT,
+        'shadow_memo': card_predictor.rule_engine.MEMO_LIMIT,
+        'timeseries': handlers.timeseries.max_series,
+    }
+
+
+def rss_bytes() -> int:
+    """RSS courant (Linux) ; à défaut, le pic rapporté par getrusage."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def simulate(args, clock: SimClock, bot: SoakBot):
+    """Pousse le trafic jour par jour ; produit (jour, tailles, RSS, latences en µs du jour,
+    (jeux finalisés du jour, dernier jeu finalisé))."""
+    rng = random.Random(args.seed)
+    game_interval = 86400.0 / args.games_per_day
+    message_id = update_id = 0
+    for day in range(1, args.days + 1):
+        latencies = []
+        finalized, last_finalized = 0, None
+        day_start = clock.now
+        for game_number in range(1, args.games_per_day + 1):
+            game_start = day_start + (game_number - 1) * game_interval
+            versions = game_versions(game_number, rng)
+            roll = rng.random()
+            if roll < args.missed:
+                continue  # Jeu manqué (jamais reçu)
+            if roll < args.missed + args.cancelled:
+                versions = versions[:1]  # Jeu jamais finalisé : ⏰ expire
+            else:
+                finalized, last_finalized = finalized + 1, game_number
+            message_id += 1
+            for index, text in enumerate(versions):
+                clock.now = game_start + VERSION_DELAYS[index]
+                update_id += 1
+                kind = 'channel_post' if index == 0 else 'edited_channel_post'
+                update = {'update_id': update_id,
+                          kind: {'message_id': message_id, 'chat': {'id': CHAT_ID, 'type': 'channel'},
+                                 'date': int(clock.now), 'text': text}}
+                for _ in range(2 if rng.random() < args.duplicates else 1):  # Livraison en double
+                    started = time.perf_counter()
+                    handlers.process_update(bot, update)
+                    latencies.append((time.perf_counter() - started) * 1e6)
+            if game_number % 10 == 0:
+                handlers.outbox.drain()  # Thread de livraison de la boîte d'envoi
+
+        # Commandes admin une fois par jour (chemins /status et /ombre)
+        for command in ('/status', '/ombre'):
+            update_id += 1
+            handlers.process_update(bot, {'update_id': update_id, 'message': {
+                'message_id': update_id, 'chat': {'id': ADMIN_CHAT_ID, 'type': 'private'}, 'text': command}})
+        clock.now = day_start + 86400.0
+        yield day, structure_sizes(), rss_bytes(), latencies, (finalized, last_finalized)
+
+
+def grows(samples, warmup: int, ratio: float, slack: int) -> bool:
+    """Vrai si le maximum de la seconde moitié dépasse nettement celui de la première (après chauffe)."""
+    values = samples[warmup:]
+    half = len(values) // 2
+    if half < 1:
+        return False
+    return max(values[half:]) > max(values[:half]) * ratio + slack
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, default=28)
+    parser.add_argument('--games-per-day', type=int, default=1440)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--missed', type=float, default=0.005, help="part des jeux jamais reçus")
+    parser.add_argument('--cancelled', type=float, default=0.01, help="part des jeux jamais finalisés (⏰)")
+    parser.add_argument('--duplicates', type=float, default=0.01, help="part des updates livrées deux fois")
+    parser.add_argument('--warmup', type=int, default=2, help="jours ignorés par les vérifications")
+    parser.add_argument('--max-rss-growth-mb', type=float, default=1.0, help="dérive RSS tolérée par jour")
+    parser.add_argument('--max-latency-drift', type=float, default=1.5, help="rapport de latence médiane toléré")
+    args = parser.parse_args()
+
+    clock = SimClock()
+    bot = SoakBot()
+    card_predictor.set_clock(clock)
+    handlers.outbox = Outbox(':memory:', clock=clock)
+    handlers.timeseries = TimeSeriesStore(clock=clock)
+
+    history = []
+    failures = []
+    draws = card_predictor.cycle_stats['draws']
+    started = time.perf_counter()
+    print(f"{'jour':>4}  {'updates':>7}  {'méd. µs':>8}  {'p99 µs':>8}  {'RSS Mo':>7}  structures")
+    for day, sizes, rss, latencies, (finalized, last_finalized) in simulate(args, clock, bot):
+        latencies.sort()
+        median = statistics.median(latencies)
+        p99 = latencies[int(len(latencies) * 0.99)]
+        history.append((sizes, rss, median))
+        compact = ' '.join(f"{name}={value}" for name, value in sizes.items())
+        print(f"{day:>4}  {len(latencies):>7}  {median:8.1f}  {p99:8.1f}  {rss / 1e6:7.1f}  {compact}")
+
+        # Fraîcheur : l'historique suit le dernier jour, chaque jeu finalisé est compté une fois
+        if last_finalized is not None and last_finalized not in card_predictor.draw_history:
+            failures.append(f"jour {day} : dernier jeu finalisé N{last_finalized} absent de l'historique "
+                            f"({list(card_predictor.draw_history)})")
+        counted = card_predictor.cycle_stats['draws'] - draws
+        draws = card_predictor.cycle_stats['draws']
+        if counted != finalized:
+            failures.append(f"jour {day} : {counted} tirages comptés pour {finalized} jeux finalisés")
+    elapsed = time.perf_counter() - started
+
+    caps = structure_caps()
+    for name in history[0][0]:
+        samples = [sizes[name] for sizes, _, _ in history]
+        if name in caps:
+            if max(samples) > caps[name]:
+                failures.append(f"{name} dépasse son plafond : {max(samples)} > {caps[name]}")
+        elif grows(samples, args.warmup, 1.25, 8):
+            failures.append(f"{name} croît sans borne : {samples[args.warmup]} → {samples[-1]}")
+
+    rss = [value for _, value, _ in history][args.warmup:]
+    if len(rss) >= 2:
+        per_day = (rss[-1] - rss[0]) / (len(rss) - 1) / 1e6
+        print(f"RSS : {per_day:+.2f} Mo/jour après chauffe "
+              f"(historique /stats : {len(card_predictor.draw_stats)} tirages)")
+        if per_day > args.max_rss_growth_mb:
+            failures.append(f"RSS en dérive : {per_day:+.2f} Mo/jour (> {args.max_rss_growth_mb})")
+
+    medians = [median for _, _, median in history][args.warmup:]
+    if len(medians) >= 2:
+        drift = medians[-1] / medians[0]
+        print(f"Latence médiane : {medians[0]:.1f} → {medians[-1]:.1f} µs (×{drift:.2f})")
+        if drift > args.max_latency_drift:
+            failures.append(f"Latence en dérive : ×{drift:.2f} (> ×{args.max_latency_drift})")
+
+    print(f"{args.days} jours simulés en {elapsed:.0f} s ; {bot.sent} envois, {bot.edited} éditions")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Mémoire bornée, latence stable")
+    sys.exit(1 if failures else 0)
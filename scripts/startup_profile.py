@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Profil du démarrage à froid d'un point d'entrée avec python -X importtime.
+Affiche les imports les plus coûteux (temps cumulé) et le total.
+
+Usage : python scripts/startup_profile.py [module] [--top N]
+        (module par défaut : main_render)
+"""
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def profile_imports(module: str):
+    """Importe le module dans un interpréteur neuf et retourne [(cumulé_us, self_us, nom)]."""
+    env = dict(os.environ)
+    env.setdefault('BOT_TOKEN', '0:profil')
+    # Les points d'entrée lancent le bot sous __main__ : un simple import n'ouvre aucune connexion
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        capture_output=True, text=True, cwd=ROOT, env=env, timeout=120
+    )
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        self_us, cumulative_us, name = int(parts[0]), int(parts[1]), parts[2][1:].rstrip()
+        rows.append((cumulative_us, self_us, name))
+    return rows
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    top = 15
+    if '--top' in args:
+        index = args.index('--top')
+        top = int(args[index + 1])
+        del args[index:index + 2]
+    module = args[0] if args else 'main_render'
+
+    rows = profile_imports(module)
+    if not rows:
+        print(f"❌ Aucun résultat pour {module} (erreur d'import ?)")
+        sys.exit(1)
+
+    # Les imports de premier niveau (sans indentation) donnent le total
+    total_us = sum(cumulative for cumulative, _, name in rows if not name.startswith(' '))
+
+    print(f"⏱️ Imports de {module} : {total_us / 1000:.1f} ms au total")
+    print(f"{'cumulé (ms)':>12} {'propre (ms)':>12}  module")
+    for cumulative, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative / 1000:12.1f} {self_us / 1000:12.1f}  {name.strip()}")
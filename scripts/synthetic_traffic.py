@@ -0,0 +1,59 @@
+"""
+Génération de trafic synthétique du canal source (tests de charge, soak, fuzz).
+Chaque jeu suit le cycle réel : publication ⏰, édition avec résultats, puis
+édition finale ✅ ou 🔰.
+"""
+import random
+from typing import Dict, Iterator, List
+
+RANKS = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K']
+SUITS = ['♠️', '♥️', '♦️', '♣️']
+CARD_POINTS = {'A': 1, '10': 0, 'J': 0, 'Q': 0, 'K': 0}
+
+
+def random_card(rng: random.Random) -> str:
+    return rng.choice(RANKS) + rng.choice(SUITS)
+
+
+def _points(cards: List[str]) -> int:
+    total = 0
+    for card in cards:
+        rank = card.rstrip('♠️♥️♦️♣️❤️')
+        total += CARD_POINTS.get(rank, int(rank) if rank.isdigit() else 0)
+    return total % 10
+
+
+def game_versions(game_number: int, rng: random.Random) -> List[str]:
+    """Retourne les versions successives du message d'un jeu : ⏰, résultats, finalisé."""
+    first = [random_card(rng) for _ in range(rng.choice((2, 3)))]
+    second = [random_card(rng) for _ in range(rng.choice((2, 3)))]
+    first_text, second_text = ''.join(first), ''.join(second)
+    p1, p2 = _points(first), _points(second)
+    done = rng.choice(('✅', '🔰'))
+
+    return [
+        f"#N{game_number}. ⏰{_points(first[:2])}({''.join(first[:2])}) - ({''.join(second[:1])})",
+        f"#N{game_number}. ⏰{p1}({first_text}) - {p2}({second_text})",
+        f"#N{game_number}. {done}{p1}({first_text}) - {p2}({second_text}) #T{p1 + p2}",
+    ]
+
+
+def channel_updates(chat_id: int, start_game: int = 1, games: int = 100, seed: int = 0,
+                    start_update_id: int = 1, date: int = 0) -> Iterator[Dict]:
+    """Génère les updates Telegram (channel_post puis edited_channel_post) pour `games` jeux."""
+    rng = random.Random(seed)
+    update_id = start_update_id
+    for game_number in range(start_game, start_game + games):
+        message_id = game_number
+        for index, text in enumerate(game_versions(game_number, rng)):
+            kind = 'channel_post' if index == 0 else 'edited_channel_post'
+            yield {
+                'update_id': update_id,
+                kind: {
+                    'message_id': message_id,
+                    'chat': {'id': chat_id, 'type': 'channel'},
+                    'date': date,
+                    'text': text,
+                },
+            }
+            update_id += 1
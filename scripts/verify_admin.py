@@ -9,10 +9,11 @@ import requests
 BOT_TOKEN = os.environ.get('BOT_TOKEN')
 TARGET_CHANNEL_ID = os.environ.get('TARGET_CHANNEL_ID')
 PREDICTION_CHANNEL_ID = os.environ.get('PREDICTION_CHANNEL_ID')
+TELEGRAM_API_BASE = (os.environ.get('TELEGRAM_API_BASE') or "https://api.telegram.org").rstrip('/')
 
 def check_admin_status(channel_id, channel_name):
     """Vérifie si le bot est administrateur d'un canal"""
-    api_url = f"https://api.telegram.org/bot{BOT_TOKEN}/getChatMember"
+    api_url = f"{TELEGRAM_API_BASE}/bot{BOT_TOKEN}/getChatMember"
     
     try:
         # Obtenir les informations du bot dans le canal
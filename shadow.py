@@ -0,0 +1,194 @@
+"""
+Évaluation en ombre de jeux de règles alternatifs sur le trafic réel.
+Un jeu en ombre (l'autre mode, ou des règles candidates d'un fichier) voit
+les mêmes tirages finalisés que le jeu réel et réutilise leur analyse
+(ParsedDraw, DrawFeatures). Les règles réelles et les règles candidates
+de tous les jeux sont compilées dans un seul moteur (ShadowBank) : le
+passage du jeu réel sur un tirage sert aussi tous les jeux en ombre, quel
+que soit leur nombre, chaque règle déclenchée revenant à son jeu. Les
+prédictions d'un jeu en ombre sont vérifiées comme les vraies, dans son
+propre stock, et alimentent ses propres comptes glissants ; rien n'est
+publié ni archivé. /ombre compare les jeux.
+"""
+
+import os
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from prediction_record import PredictionRecord, PredictionStatus
+from rule_engine import Condition, DrawFeatures, Rule, RuleEngine, load_rules
+from rule_stats import RuleStatsBook
+
+logger = logging.getLogger(__name__)
+
+SHADOW_MODES = ('other', 'live', 'default', 'intelligent')
+
+# Recul des numéros de jeu au-delà duquel la série est considérée comme recommencée
+GAME_RESET_GAP = 100
+
+
+class ShadowSet:
+    """Jeu de règles évalué en ombre (configuration du processus, non partagée)."""
+
+    def __init__(self, name: str, rules: Optional[Iterable[Rule]] = None, mode: str = 'live',
+                 source: str = ''):
+        if mode not in SHADOW_MODES:
+            raise ValueError(f"Mode d'ombre inconnu pour {name} : {mode}")
+        self.name = name
+        self.engine = RuleEngine(rules) if rules is not None else None  # None : règles réelles
+        self.mode = mode  # other : mode opposé au réel ; live : mode réel ; ou un mode fixe
+        self.source = source
+
+    def intelligent(self, live_mode: bool) -> bool:
+        """Mode évalué par ce jeu quand le jeu réel est dans live_mode."""
+        if self.mode == 'other':
+            return not live_mode
+        if self.mode != 'live':
+            return self.mode == 'intelligent'
+        return live_mode
+
+    def describe(self) -> str:
+        rules = 'règles réelles' if self.engine is None else f"{len(self.engine.rules)} règles ({self.source})"
+        mode = {'other': 'mode opposé au réel', 'live': 'mode réel'}.get(self.mode, f"mode {self.mode}")
+        return f"{rules}, {mode}"
+
+
+class ShadowBank:
+    """Règles réelles et règles candidates de tous les jeux en ombre compilées dans un seul moteur :
+    un passage par tirage sert le jeu réel et chaque jeu en ombre, chaque règle rattachée à son jeu
+    (configuration du processus, reconstruite si les jeux ou les règles réelles changent)."""
+
+    LIVE = -1  # Propriétaire des règles réelles
+
+    def __init__(self, shadow_sets: Tuple[ShadowSet, ...], live_engine: RuleEngine):
+        self.sets = shadow_sets
+        self.live_engine = live_engine
+        rules, owners = list(live_engine.rules), [self.LIVE] * len(live_engine.rules)
+        for position, shadow in enumerate(shadow_sets):
+            if shadow.engine is not None:
+                rules.extend(shadow.engine.rules)
+                owners.extend([position] * len(shadow.engine.rules))
+        self.engine = RuleEngine(rules)
+        self.owners = tuple(owners)
+        # Règles lues par chaque jeu, et mode évalué selon le mode réel
+        self._set_owners = tuple(self.LIVE if shadow.engine is None else position
+                                 for position, shadow in enumerate(shadow_sets))
+        self._modes = {live: tuple(shadow.intelligent(live) for shadow in shadow_sets) for live in (False, True)}
+        # Conditions compilées seulement : résultat fonction des seuls compteurs (mémorisable)
+        self._memoize = all(isinstance(rule.trigger, Condition) for rule in rules)
+        self._memo: Dict[Tuple[bool, int], Dict[int, Tuple[Rule, ...]]] = {}
+
+    def live_matches(self, features: DrawFeatures, intelligent_mode: bool) -> List[Rule]:
+        """Règles réelles déclenchées, comme live_engine.matches (même passage que les jeux en ombre)."""
+        counts = self.engine.feature_counts(features)
+        return list(self._by_owner(features, counts, intelligent_mode).get(self.LIVE, ()))
+
+    def matches(self, intelligent_mode: bool, features: DrawFeatures) -> List[Sequence[Rule]]:
+        """Règles déclenchées de chaque jeu en ombre (même ordre que self.sets), une par (cible, décalage)."""
+        counts = self.engine.feature_counts(features)  # Déjà calculés par le passage réel sur ce tirage
+        matched, by_mode = [], {}
+        for owner, mode in zip(self._set_owners, self._modes[intelligent_mode]):
+            by_owner = by_mode.get(mode)
+            if by_owner is None:
+                by_owner = by_mode[mode] = self._by_owner(features, counts, mode)
+            matched.append(by_owner.get(owner, ()))
+        return matched
+
+    def _by_owner(self, features: DrawFeatures, counts: int, mode: bool) -> Dict[int, Tuple[Rule, ...]]:
+        """Règles retenues par jeu déclenché pour ce mode (mémorisé par compteurs)."""
+        key = (mode, counts)
+        by_owner = self._memo.get(key)
+        if by_owner is None:
+            rules, owners = self.engine.rules, self.owners
+            grouped: Dict[int, List[Rule]] = {}
+            claimed = set()
+            for index in self.engine.triggered(features, counts, mode):
+                rule, owner = rules[index], owners[index]
+                slot = (owner, rule.target, rule.offset)  # Une règle par (cible, décalage) dans chaque jeu
+                if slot not in claimed:
+                    claimed.add(slot)
+                    grouped.setdefault(owner, []).append(rule)
+            by_owner = {owner: tuple(matched) for owner, matched in grouped.items()}
+            if self._memoize:
+                if len(self._memo) >= RuleEngine.MEMO_LIMIT:
+                    self._memo.clear()
+                self._memo[key] = by_owner
+        return by_owner
+
+
+class ShadowResults:
+    """Stock de prédictions et comptes d'un jeu en ombre (état partagé entre workers)."""
+
+    def __init__(self, window: int = 50):
+        self.predictions: Dict[Tuple[int, str], PredictionRecord] = {}
+        self.stats = RuleStatsBook(window, window)
+        self.draws = 0
+        self.predicted = 0
+        self.expired = 0
+        self.last_game: Optional[int] = None
+
+    def observe(self, game_number: int, features: DrawFeatures, rules: Iterable[Rule]) -> List[PredictionRecord]:
+        """Vérifie les prédictions en ombre sur ce tirage, puis enregistre celles qu'il déclenche.
+        Retourne les prédictions résolues par ce tirage."""
+        resolved = []
+        last_game = self.last_game
+        if last_game is not None:
+            if game_number <= last_game and last_game - game_number < GAME_RESET_GAP:
+                return resolved  # Tirage déjà vu (nouvelle édition)
+            if last_game - game_number >= GAME_RESET_GAP:
+                self.expired += len(self.predictions)  # Numérotation recommencée
+                self.predictions.clear()
+        self.last_game = game_number
+        self.draws += 1
+        if not self.predictions and not rules:
+            return resolved  # Cas courant : rien en attente, rien de déclenché
+
+        finished = []
+        for key, record in self.predictions.items():
+            if record.target_game > game_number:
+                continue  # Tirage cible pas encore arrivé
+            if record.resolve(game_number, features):
+                # Comptes par règle seulement : /ombre n'affiche pas de fenêtre de stratégie en ombre
+                self.stats.record(record.rule, record.offset if record.status is PredictionStatus.CORRECT else None,
+                                  counts_failures=False)
+                resolved.append(record)
+                finished.append(key)
+            elif record.target_game + record.window < game_number:
+                self.expired += 1  # Tirages manqués : la fenêtre est passée sans vérification
+                finished.append(key)
+        for key in finished:
+            del self.predictions[key]
+
+        for rule in rules:
+            key = (game_number + rule.offset, rule.target)
+            if key in self.predictions:
+                continue  # Cible déjà prédite : rien à construire
+            self.predictions[key] = PredictionRecord(rule.predicted_value, rule.target, game_number, key[0],
+                                                     rule.window, counts_failures=rule.mode != 'always')
+            self.predicted += 1
+        return resolved
+
+
+def book_totals(book: RuleStatsBook) -> Tuple[int, int, int, int]:
+    """Succès et résolutions, toutes règles confondues : fenêtres glissantes, puis depuis le début."""
+    counters = [counter for _, counter in book.items()]
+    return (sum(counter.hit_count for counter in counters), sum(counter.length for counter in counters),
+            sum(counter.total_hits for counter in counters),
+            sum(counter.total_hits + counter.total_misses for counter in counters))
+
+
+def build_shadow_sets(other_mode: bool, rule_files: Iterable[str]) -> Tuple[ShadowSet, ...]:
+    """Jeux en ombre configurés : l'autre mode (règles réelles), puis un jeu par fichier candidat.
+    Un fichier illisible ou invalide est signalé et ignoré."""
+    shadow_sets = []
+    if other_mode:
+        shadow_sets.append(ShadowSet('autre_mode', mode='other'))
+    for path in rule_files:
+        name = os.path.splitext(os.path.basename(path))[0]
+        try:
+            shadow_sets.append(ShadowSet(name, load_rules(path), mode='live', source=path))
+        except Exception as e:
+            logger.error(f"❌ Jeu en ombre {path} ignoré : {e}")
+    if shadow_sets:
+        logger.info(f"🌓 Jeux en ombre : {', '.join(shadow.name for shadow in shadow_sets)}")
+    return tuple(shadow_sets)
@@ -0,0 +1,136 @@
+"""
+Surveillance des blocages du traitement.
+Chaque update est traitée sous watchdog.processing() ; chaque getUpdates
+réussi (ou chaque webhook reçu) appelle watchdog.polled(). Un thread
+vérifie périodiquement l'âge de l'update en cours : au-delà du budget, la
+pile de tous les threads est journalisée une fois. status() sert aux routes
+de santé : 'degraded' (avec les délais) quand une update est bloquée ou,
+en polling, quand getUpdates ne revient plus — la plateforme redémarre
+alors l'instance.
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+import traceback
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def dump_stacks() -> str:
+    """Pile de tous les threads du processus (nom, identifiant, appels)."""
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    sections = []
+    for ident, frame in sys._current_frames().items():
+        stack = ''.join(traceback.format_stack(frame))
+        sections.append(f"--- Thread {names.get(ident, '?')} ({ident}) ---\n{stack}")
+    return '\n'.join(sections)
+
+
+class Watchdog:
+    """Horodatages de progression (réception, updates terminées) et détection des blocages."""
+
+    def __init__(self, stall_seconds: float = 60.0, poll_seconds: Optional[float] = None,
+                 check_interval: float = 5.0, clock=time.monotonic):
+        self.stall_seconds = stall_seconds  # Durée maximale d'une update
+        self.poll_seconds = poll_seconds  # Silence maximal de getUpdates (None : webhook, pas d'attente)
+        self.check_interval = check_interval
+        self.clock = clock
+        self.started_at = clock()
+        self.last_poll_at: Optional[float] = None  # Dernier getUpdates réussi / webhook reçu
+        self.last_update_at: Optional[float] = None  # Dernière update terminée
+        self.stalls = 0
+
+        self._lock = threading.Lock()
+        self._active: Dict[int, List] = {}  # Thread → [début, update_id, pile déjà journalisée]
+        self._pid: Optional[int] = None  # Processus du thread de vérification (None : pas démarré)
+
+    # --- Progression (chemin chaud : quelques affectations) ---
+
+    def polled(self):
+        self.last_poll_at = self.clock()
+
+    @contextmanager
+    def processing(self, update_id=None):
+        if self._pid is not None and self._pid != os.getpid():
+            self._spawn()  # Worker forké après start() : son propre thread de vérification
+        ident = threading.get_ident()
+        with self._lock:
+            self._active[ident] = [self.clock(), update_id, False]
+        try:
+            yield
+        finally:
+            with self._lock:
+                del self._active[ident]
+            self.last_update_at = self.clock()
+
+    # --- Détection ---
+
+    def start(self, poll_seconds: Optional[float] = None):
+        """Démarre le thread de vérification ; poll_seconds : silence toléré de getUpdates (polling)."""
+        if poll_seconds is not None:
+            self.poll_seconds = poll_seconds
+        if self._pid == os.getpid():
+            return
+        self._spawn()
+        logger.info(f"🐕 Watchdog actif : update bloquée au-delà de {self.stall_seconds:.0f} s"
+                    + (f", getUpdates muet au-delà de {self.poll_seconds:.0f} s" if self.poll_seconds else ""))
+
+    def _spawn(self):
+        self._pid = os.getpid()
+        threading.Thread(target=self._check_loop, name='watchdog', daemon=True).start()
+
+    def _check_loop(self):
+        while True:
+            time.sleep(self.check_interval)
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"❌ Watchdog : erreur de vérification : {e}")
+
+    def check(self) -> int:
+        """Journalise la pile des threads pour chaque update nouvellement bloquée ; retourne leur nombre."""
+        now = self.clock()
+        with self._lock:
+            stalled = [entry for entry in self._active.values()
+                       if not entry[2] and now - entry[0] > self.stall_seconds]
+            for entry in stalled:
+                entry[2] = True
+        for started_at, update_id, _ in stalled:
+            self.stalls += 1
+            metrics.incr('watchdog_stalls')
+            logger.error(f"🐕 Update {update_id} en cours depuis {now - started_at:.0f} s "
+                         f"(budget {self.stall_seconds:.0f} s) : piles des threads\n{dump_stacks()}")
+        return len(stalled)
+
+    def status(self) -> Dict:
+        """État pour les routes de santé (calculé à la demande, sans dépendre du thread)."""
+        now = self.clock()
+        with self._lock:
+            oldest = min((entry[0] for entry in self._active.values()), default=None)
+            in_flight = len(self._active)
+        processing = now - oldest if oldest is not None else None
+        since_poll = now - (self.last_poll_at if self.last_poll_at is not None else self.started_at)
+
+        reasons = []
+        if processing is not None and processing > self.stall_seconds:
+            reasons.append('processing_stalled')
+        if self.poll_seconds is not None and since_poll > self.poll_seconds:
+            reasons.append('polling_stalled')
+        return {
+            'state': 'degraded' if reasons else 'ok',
+            'reasons': reasons,
+            'in_flight': in_flight,
+            'processing_seconds': round(processing, 1) if processing is not None else None,
+            'since_last_poll_seconds': round(since_poll, 1),
+            'since_last_update_seconds': round(now - self.last_update_at, 1) if self.last_update_at else None,
+            'stall_budget_seconds': self.stall_seconds,
+            'poll_budget_seconds': self.poll_seconds,
+            'stalls': self.stalls,
+        }
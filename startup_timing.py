@@ -0,0 +1,44 @@
+"""
+Mesure du démarrage à froid (instances Render gratuites).
+Importé en premier par chaque point d'entrée : chaque étape est marquée
+puis un récapitulatif est journalisé dès que le bot est prêt (premier
+getUpdates ou webhook configuré). Pour le détail des imports, voir
+scripts/startup_profile.py (basé sur python -X importtime).
+"""
+
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+_START = time.perf_counter()
+_marks = []
+_reported = False
+
+# Objectif de temps jusqu'à la disponibilité (secondes)
+STARTUP_TARGET_SECONDS = float(os.environ.get('STARTUP_TARGET_SECONDS') or 3.0)
+
+
+def mark(phase: str):
+    """Enregistre la fin d'une étape du démarrage."""
+    _marks.append((phase, time.perf_counter()))
+
+
+def report(ready_label: str) -> float:
+    """Journalise le détail des étapes (une seule fois) et retourne le temps total."""
+    global _reported
+    total = time.perf_counter() - _START
+    if _reported:
+        return total
+    _reported = True
+
+    logger.info(f"⏱️ Démarrage : {ready_label} après {total * 1000:.0f} ms")
+    previous = _START
+    for phase, instant in _marks:
+        logger.info(f"   {phase:<24} {(instant - previous) * 1000:8.1f} ms")
+        previous = instant
+
+    if total > STARTUP_TARGET_SECONDS:
+        logger.warning(f"⚠️ Démarrage plus lent que l'objectif ({STARTUP_TARGET_SECONDS:.1f} s)")
+    return total
@@ -0,0 +1,214 @@
+"""
+Stockage de l'état du prédicteur, partagé entre plusieurs workers.
+Par défaut l'état reste en mémoire (un seul processus). Avec Gunicorn
+(-w N), un backend SQLite (WAL) ou Redis permet à tous les workers de
+partager les mêmes prédictions, échecs et mode.
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StateTransaction:
+    """Transaction ouverte sur l'état d'un canal (verrou exclusif tenu)."""
+
+    def __init__(self, version: int):
+        self.version = version
+
+    def load(self) -> Optional[bytes]:
+        """Retourne l'état sérialisé du canal (None si aucun état enregistré)."""
+        return None
+
+    def save(self, blob: bytes) -> int:
+        """Enregistre l'état sérialisé et retourne la nouvelle version."""
+        self.version += 1
+        return self.version
+
+
+class StateStore:
+    """Backend en mémoire : l'état vit dans le processus, rien n'est sérialisé."""
+
+    shared = False
+
+    @contextmanager
+    def begin(self, channel_key: str):
+        yield StateTransaction(0)
+
+
+# --- Backend SQLite (WAL) ---
+
+class _SQLiteTransaction(StateTransaction):
+
+    def __init__(self, conn, channel_key: str, version: int):
+        super().__init__(version)
+        self._conn = conn
+        self._channel_key = channel_key
+
+    def load(self) -> Optional[bytes]:
+        row = self._conn.execute(
+            "SELECT state FROM predictor_state WHERE channel = ?", (self._channel_key,)
+        ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def save(self, blob: bytes) -> int:
+        self.version += 1
+        self._conn.execute(
+            "INSERT INTO predictor_state (channel, version, state) VALUES (?, ?, ?) "
+            "ON CONFLICT(channel) DO UPDATE SET version = excluded.version, state = excluded.state",
+            (self._channel_key, self.version, blob)
+        )
+        return self.version
+
+
+class SQLiteStateStore(StateStore):
+    """État partagé dans un fichier SQLite en mode WAL.
+    BEGIN IMMEDIATE sérialise les mises à jour d'un même fichier entre processus.
+    """
+
+    shared = True
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS predictor_state ("
+            "channel TEXT PRIMARY KEY, version INTEGER NOT NULL, state BLOB NOT NULL)"
+        )
+
+    def _connect(self):
+        # Une connexion par thread (sqlite3 n'autorise pas le partage par défaut)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            import sqlite3  # Importé seulement si ce backend est choisi
+
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def begin(self, channel_key: str):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT version FROM predictor_state WHERE channel = ?", (channel_key,)
+            ).fetchone()
+            yield _SQLiteTransaction(conn, channel_key, row[0] if row else 0)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+
+# --- Backend Redis (ou tout serveur compatible) ---
+
+# Libère le verrou seulement s'il porte encore notre jeton (comparaison et suppression atomiques)
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Enregistre l'état seulement si le verrou porte encore notre jeton : un worker dont le verrou
+# a expiré (et a pu être repris par un autre) n'écrase pas l'état. Retourne la version, ou -1.
+_SAVE_SCRIPT = """
+if redis.call('get', KEYS[1]) ~= ARGV[1] then
+    return -1
+end
+redis.call('set', KEYS[2], ARGV[2])
+return redis.call('incr', KEYS[3])
+"""
+
+
+class _RedisTransaction(StateTransaction):
+
+    def __init__(self, client, lock_key: str, token: bytes, state_key: str, version_key: str, version: int):
+        super().__init__(version)
+        self._client = client
+        self._lock_key = lock_key
+        self._token = token
+        self._state_key = state_key
+        self._version_key = version_key
+
+    def load(self) -> Optional[bytes]:
+        return self._client.get(self._state_key)
+
+    def save(self, blob: bytes) -> int:
+        version = int(self._client.eval(
+            _SAVE_SCRIPT, 3, self._lock_key, self._state_key, self._version_key, self._token, blob
+        ))
+        if version < 0:
+            raise TimeoutError(f"Verrou d'état Redis perdu ({self._lock_key}) : état non enregistré")
+        self.version = version
+        return self.version
+
+
+class RedisStateStore(StateStore):
+    """État partagé dans Redis, protégé par un verrou SET NX PX par canal.
+    Libération et enregistrement vérifient le jeton du verrou (scripts Lua) ;
+    lock_timeout doit rester bien supérieur à la durée d'une transaction
+    (appels Telegram de 30 s compris). Le client peut être injecté (ex :
+    scripts/fake_redis.py pour les tests).
+    """
+
+    shared = True
+
+    def __init__(self, url: Optional[str] = None, client=None, prefix: str = "dame:state:",
+                 lock_timeout: float = 300.0, acquire_timeout: float = 30.0):
+        if client is None:
+            import redis  # Dépendance optionnelle, requise seulement pour ce backend
+            client = redis.Redis.from_url(url or "redis://localhost:6379/0")
+        self.client = client
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+        self.acquire_timeout = acquire_timeout
+
+    @contextmanager
+    def begin(self, channel_key: str):
+        import uuid
+
+        lock_key = f"{self.prefix}{channel_key}:lock"
+        token = uuid.uuid4().hex.encode()
+        deadline = time.monotonic() + self.acquire_timeout
+
+        while not self.client.set(lock_key, token, nx=True, px=int(self.lock_timeout * 1000)):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Verrou d'état Redis non obtenu pour {channel_key}")
+            time.sleep(0.005)
+
+        try:
+            version = int(self.client.get(f"{self.prefix}{channel_key}:version") or 0)
+            yield _RedisTransaction(
+                self.client, lock_key, token,
+                f"{self.prefix}{channel_key}", f"{self.prefix}{channel_key}:version", version
+            )
+        finally:
+            # Ne libérer que notre propre verrou (il a pu expirer et être repris entre-temps)
+            self.client.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+
+
+def build_state_store(backend: Optional[str], url: Optional[str] = None) -> StateStore:
+    """Construit le backend d'état demandé : memory (défaut), sqlite ou redis."""
+    backend = (backend or 'memory').lower()
+
+    if backend == 'sqlite':
+        path = url or 'predictor_state.sqlite3'
+        logger.info(f"🗄️ État partagé : SQLite WAL ({os.path.abspath(path)})")
+        return SQLiteStateStore(path)
+    if backend == 'redis':
+        logger.info(f"🗄️ État partagé : Redis ({url or 'redis://localhost:6379/0'})")
+        return RedisStateStore(url)
+    if backend != 'memory':
+        logger.warning(f"⚠️ STATE_BACKEND inconnu '{backend}', utilisation de la mémoire")
+    return StateStore()
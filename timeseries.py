@@ -0,0 +1,394 @@
+"""
+Séries temporelles longues en mémoire fixe (façon RRD) : volume d'updates,
+latence, prédictions et résolutions, par canal et par règle.
+
+Chaque série a trois résolutions (minute, heure, jour), chacune un anneau de
+cases de taille fixe allouées à la création de la série. Seule la case
+ouverte de la minute est touchée par update ; à sa clôture, elle est écrite
+dans l'anneau des minutes et consolidée dans la case ouverte de l'heure
+(sommes, maximum de latence), puis l'heure dans le jour. Le nombre de séries
+est plafonné : la mémoire ne dépend pas de la durée de service.
+
+Les séries sont propres au processus. Avec TIMESERIES_PATH, chacun les
+enregistre dans son fichier (TIMESERIES_PATH.<pid>, à chaque heure close en
+arrière-plan et à l'arrêt) ; au démarrage, un processus reprend le fichier
+d'un processus arrêté, et les lectures additionnent les fichiers des autres
+(workers Gunicorn) à ses propres séries.
+"""
+
+import os
+import time
+import atexit
+import pickle
+import logging
+import threading
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Valeurs d'une case : sommes, sauf latency_max (maximum)
+FIELDS = ('updates', 'latency_sum', 'latency_max', 'predictions', 'hits', 'misses')
+_LATENCY_MAX = FIELDS.index('latency_max')
+
+# Résolutions (nom, pas en secondes, cases) : 24 h par minute, 6 semaines par heure, 2 ans par jour
+DEFAULT_TIERS = (('minute', 60, 1440), ('hour', 3600, 1008), ('day', 86400, 732))
+
+FORMAT_VERSION = 1
+
+
+def merge(target: List[float], values) -> None:
+    """Consolide values dans target (sommes, maximum de latence)."""
+    for index, value in enumerate(values):
+        if index == _LATENCY_MAX:
+            if value > target[index]:
+                target[index] = value
+        else:
+            target[index] += value
+
+
+class Tier:
+    """Une résolution d'une série : anneau de cases horodatées et case ouverte."""
+
+    __slots__ = ('step', 'slots', 'values', 'stamps', 'open', 'open_bucket')
+
+    def __init__(self, step: int, slots: int):
+        self.step = step
+        self.slots = slots
+        self.values = array('d', bytes(8 * slots * len(FIELDS)))  # Case i : values[i * len(FIELDS):]
+        self.stamps = array('q', [-1]) * slots  # Numéro de case (temps // pas) de chaque emplacement
+        self.open = [0.0] * len(FIELDS)
+        self.open_bucket: Optional[int] = None
+
+    def close(self):
+        """Écrit la case ouverte dans l'anneau."""
+        index = self.open_bucket % self.slots
+        width = len(FIELDS)
+        self.values[index * width:(index + 1) * width] = array('d', self.open)
+        self.stamps[index] = self.open_bucket
+
+    def buckets(self) -> Dict[int, List[float]]:
+        """Cases closes de l'anneau : {numéro de case: valeurs}."""
+        width = len(FIELDS)
+        return {bucket: list(self.values[index * width:(index + 1) * width])
+                for index, bucket in enumerate(self.stamps) if bucket >= 0}
+
+
+class Series:
+    """Série à plusieurs résolutions, consolidée de la plus fine à la plus large à chaque clôture."""
+
+    def __init__(self, tiers=DEFAULT_TIERS):
+        self.tiers = [Tier(step, slots) for _, step, slots in tiers]
+
+    def add(self, now: float, values) -> None:
+        tier = self.tiers[0]
+        bucket = int(now // tier.step)
+        if tier.open_bucket is None or bucket > tier.open_bucket:
+            self._roll(0, bucket)
+        merge(tier.open, values)  # Horloge revenue en arrière : comptée dans la case ouverte
+
+    def _roll(self, level: int, bucket: int):
+        """Clôt la case ouverte du niveau (anneau, puis consolidation au niveau suivant) et ouvre bucket."""
+        tier = self.tiers[level]
+        if tier.open_bucket is not None:
+            tier.close()
+            if level + 1 < len(self.tiers):
+                parent = self.tiers[level + 1]
+                parent_bucket = tier.open_bucket * tier.step // parent.step
+                if parent.open_bucket is None or parent_bucket > parent.open_bucket:
+                    self._roll(level + 1, parent_bucket)
+                merge(parent.open, tier.open)
+        tier.open = [0.0] * len(FIELDS)
+        tier.open_bucket = bucket
+
+    def buckets(self, level: int, now: float, count: Optional[int] = None) -> List[Tuple[int, List[float]]]:
+        """Les count dernières cases du niveau (début en secondes, valeurs), cases vides omises.
+        Les cases ouvertes des niveaux plus fins, pas encore consolidées, y sont ajoutées."""
+        tier = self.tiers[level]
+        current = int(now // tier.step)
+        first = current - min(count or tier.slots, tier.slots) + 1
+        buckets = {bucket: values for bucket, values in tier.buckets().items() if first <= bucket <= current}
+        for lower in self.tiers[:level + 1]:
+            if lower.open_bucket is None:
+                continue
+            bucket = lower.open_bucket * lower.step // tier.step
+            if first <= bucket <= current:
+                merge(buckets.setdefault(bucket, [0.0] * len(FIELDS)), lower.open)
+        return [(bucket * tier.step, values) for bucket, values in sorted(buckets.items()) if any(values)]
+
+    def memory_bytes(self) -> int:
+        return sum(tier.values.itemsize * len(tier.values) + tier.stamps.itemsize * len(tier.stamps)
+                   for tier in self.tiers)
+
+
+def bucket_dict(start: int, values: List[float]) -> Dict:
+    """Case prête pour JSON : compteurs, latence moyenne et maximale (ms), taux de succès."""
+    updates, latency_sum, latency_max, predictions, hits, misses = values
+    resolved = hits + misses
+    return {
+        't': start,
+        'updates': int(updates),
+        'latency_avg_ms': round(latency_sum / updates * 1000, 2) if updates else None,
+        'latency_max_ms': round(latency_max * 1000, 2) if updates else None,
+        'predictions': int(predictions),
+        'hits': int(hits),
+        'misses': int(misses),
+        'hit_rate': round(hits / resolved, 4) if resolved else None,
+    }
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name != 'posix':
+        return True  # Sans signal 0, aucun fichier n'est repris
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class TimeSeriesStore:
+    """Séries du processus (channel:<chat_id>, rule:<règle>), plafonnées en nombre.
+    Chargées à la première utilisation dans le processus (après le fork des workers)."""
+
+    def __init__(self, path: str = '', max_series: int = 64, tiers=DEFAULT_TIERS, clock=time.time):
+        self.path = path
+        self.max_series = max_series
+        self.tiers = tuple(tuple(tier) for tier in tiers)
+        self.clock = clock
+        self.series: Dict[str, Series] = {}
+        self.dropped = 0
+        self._saved_hour: Optional[int] = None
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None  # Processus propriétaire des séries
+        self._saver: Optional[threading.Thread] = None
+        self._others: Dict[str, Tuple[float, Dict[str, Series]]] = {}  # {fichier: (mtime, séries)}
+        self._others_lock = threading.Lock()
+        if path:
+            atexit.register(self.save)
+
+    @property
+    def own_path(self) -> str:
+        return f"{self.path}.{os.getpid()}"
+
+    def _attach(self):
+        """Première utilisation dans ce processus : séries héritées d'un fork oubliées, fichier repris."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                self.series.clear()  # Séries du processus parent, enregistrées par lui
+            self._pid = os.getpid()
+            if self.path:
+                self.load()
+
+    # --- Écriture ---
+
+    def _add(self, name: str, values):
+        series = self.series.get(name)
+        if series is None:
+            if len(self.series) >= self.max_series:
+                if not self.dropped:
+                    logger.warning(f"⚠️ {self.max_series} séries temporelles atteintes : {name} ignorée")
+                self.dropped += 1
+                metrics.incr('timeseries_dropped')
+                return
+            series = self.series[name] = Series(self.tiers)
+        series.add(self.clock(), values)
+
+    def record_update(self, channel, seconds: float):
+        """Update traitée (latence de process_update) pour ce canal."""
+        self._attach()
+        with self._lock:
+            self._add(f"channel:{channel}", (1, seconds, seconds, 0, 0, 0))
+        self._save_hourly()
+
+    def record_prediction(self, rule: str, channel):
+        self._attach()
+        with self._lock:
+            self._add(f"rule:{rule}", (0, 0.0, 0.0, 1, 0, 0))
+            self._add(f"channel:{channel}", (0, 0.0, 0.0, 1, 0, 0))
+
+    def record_resolution(self, rule: str, channel, hit: bool):
+        values = (0, 0.0, 0.0, 0, 1, 0) if hit else (0, 0.0, 0.0, 0, 0, 1)
+        self._attach()
+        with self._lock:
+            self._add(f"rule:{rule}", values)
+            self._add(f"channel:{channel}", values)
+
+    # --- Lecture ---
+
+    def level(self, resolution: str) -> int:
+        for level, (name, _, _) in enumerate(self.tiers):
+            if name == resolution:
+                return level
+        raise ValueError(f"Résolution inconnue : {resolution} ({', '.join(name for name, _, _ in self.tiers)})")
+
+    def _buckets(self, level: int, now: float, count: Optional[int], match) -> Dict[str, List[Tuple[int, List[float]]]]:
+        """Cases des séries retenues par match(nom), additionnées sur ce processus et les fichiers des autres."""
+        self._attach()
+        with self._lock:
+            sources = [{name: item.buckets(level, now, count) for name, item in self.series.items() if match(name)}]
+        for series in self._other_series():
+            sources.append({name: item.buckets(level, now, count) for name, item in series.items() if match(name)})
+        if len(sources) == 1:
+            return sources[0]
+        merged: Dict[str, Dict[int, List[float]]] = {}
+        for source in sources:
+            for name, buckets in source.items():
+                target = merged.setdefault(name, {})
+                for start, values in buckets:
+                    merge(target.setdefault(start, [0.0] * len(FIELDS)), values)
+        return {name: sorted(buckets.items()) for name, buckets in merged.items()}
+
+    def query(self, resolution: str = 'hour', prefix: str = '', count: Optional[int] = None) -> Dict:
+        """Cases des séries dont le nom commence par prefix, à la résolution demandée, prêtes pour JSON."""
+        level = self.level(resolution)
+        now = self.clock()
+        buckets = self._buckets(level, now, count, lambda name: name.startswith(prefix))
+        series = {name: [bucket_dict(start, values) for start, values in buckets[name]] for name in sorted(buckets)}
+        _, step, slots = self.tiers[level]
+        return {'resolution': resolution, 'step': step, 'slots': slots, 'now': round(now), 'series': series}
+
+    def totals(self, name: str, seconds: float) -> Optional[Dict]:
+        """Totaux de la série sur les dernières secondes, à la résolution la plus fine qui les couvre."""
+        now = self.clock()
+        level = next((level for level, (_, step, slots) in enumerate(self.tiers) if step * slots >= seconds),
+                     len(self.tiers) - 1)
+        step = self.tiers[level][1]
+        buckets = self._buckets(level, now, max(1, int(seconds // step)), lambda other: other == name)
+        if name not in buckets:
+            return None
+        values = [0.0] * len(FIELDS)
+        for _, bucket in buckets[name]:
+            merge(values, bucket)
+        return bucket_dict(int(now - seconds), values)
+
+    def names(self) -> List[str]:
+        self._attach()
+        with self._lock:
+            names = set(self.series)
+        for series in self._other_series():
+            names.update(series)
+        return sorted(names)
+
+    def memory_bytes(self) -> int:
+        """Mémoire des séries de ce processus (hors fichiers des autres, relus pour les lectures)."""
+        with self._lock:
+            return sum(series.memory_bytes() for series in self.series.values())
+
+    # --- Persistance ---
+
+    def _worker_files(self) -> List[Tuple[int, str]]:
+        """Fichiers des autres processus (TIMESERIES_PATH.<pid>) : [(pid, chemin)]."""
+        if not self.path:
+            return []
+        directory = os.path.dirname(self.path) or '.'
+        prefix = os.path.basename(self.path) + '.'
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return []
+        files = []
+        for name in names:
+            suffix = name[len(prefix):] if name.startswith(prefix) else ''
+            if suffix.isdigit() and int(suffix) != os.getpid():
+                files.append((int(suffix), os.path.join(directory, name)))
+        return sorted(files)
+
+    def _other_series(self) -> List[Dict[str, Series]]:
+        """Séries enregistrées par les autres processus, relues quand leur fichier change."""
+        found = []
+        with self._others_lock:
+            paths = set()
+            for _, path in self._worker_files():
+                paths.add(path)
+                try:
+                    mtime = os.path.getmtime(path)
+                except OSError:
+                    continue
+                cached = self._others.get(path)
+                if cached is None or cached[0] != mtime:
+                    cached = self._others[path] = (mtime, self._read(path) or {})
+                found.append(cached[1])
+            for path in set(self._others) - paths:
+                del self._others[path]
+        return found
+
+    def _save_hourly(self):
+        hour = int(self.clock() // 3600)
+        if self._saved_hour is None:
+            self._saved_hour = hour
+        elif hour != self._saved_hour and self.path:
+            self._saved_hour = hour
+            # Enregistrement en arrière-plan : l'update en cours n'attend pas l'écriture
+            if self._saver is None or not self._saver.is_alive():
+                self._saver = threading.Thread(target=self.save, name='timeseries-save', daemon=True)
+                self._saver.start()
+
+    def save(self):
+        """Enregistre les séries du processus dans son fichier (écriture atomique) ;
+        une erreur est journalisée, pas levée."""
+        if not self.path or self._pid != os.getpid():
+            return  # Rien enregistré par ce processus (séries éventuelles : celles du parent)
+        with self._lock:
+            payload = pickle.dumps({
+                'version': FORMAT_VERSION, 'tiers': self.tiers,
+                'series': {name: [(tier.values.tobytes(), tier.stamps.tobytes(), tier.open, tier.open_bucket)
+                                  for tier in series.tiers] for name, series in self.series.items()},
+            }, protocol=pickle.HIGHEST_PROTOCOL)
+        path = self.own_path
+        temporary = path + '.tmp'
+        try:
+            with open(temporary, 'wb') as handle:
+                handle.write(payload)
+            os.replace(temporary, path)
+        except OSError as e:
+            logger.error(f"❌ Séries temporelles non enregistrées ({path}) : {e}")
+
+    def _read(self, path: str) -> Optional[Dict[str, Series]]:
+        """Séries d'un fichier ; absent, illisible ou d'autres résolutions : None."""
+        try:
+            with open(path, 'rb') as handle:
+                state = pickle.load(handle)
+            if state.get('version') != FORMAT_VERSION or tuple(state['tiers']) != self.tiers:
+                logger.warning(f"⚠️ Séries temporelles {path} ignorées (résolutions différentes)")
+                return None
+            loaded = {}
+            for name, tiers in list(state['series'].items())[:self.max_series]:
+                series = Series(self.tiers)
+                for tier, (values, stamps, open_values, open_bucket) in zip(series.tiers, tiers):
+                    tier.values = array('d', values)
+                    tier.stamps = array('q', stamps)
+                    tier.open, tier.open_bucket = list(open_values), open_bucket
+                loaded[name] = series
+            return loaded
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"❌ Séries temporelles {path} illisibles : {e}")
+            return None
+
+    def load(self):
+        """Recharge les séries de ce processus : son fichier, sinon celui d'un processus arrêté
+        (ou l'ancien fichier unique TIMESERIES_PATH), renommé à son nom."""
+        path = self.own_path
+        if not os.path.exists(path):
+            stale = [candidate for pid, candidate in self._worker_files() if not _pid_alive(pid)]
+            for candidate in stale + [self.path]:
+                try:
+                    os.rename(candidate, path)  # Atomique : un seul worker reprend chaque fichier
+                    break
+                except OSError:
+                    continue  # Déjà repris par un autre worker
+        loaded = self._read(path)
+        if loaded is None:
+            return
+        self.series = loaded
+        logger.info(f"📈 {len(self.series)} séries temporelles rechargées depuis {path}")
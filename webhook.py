@@ -0,0 +1,91 @@
+"""
+Utilitaires communs aux routes /webhook Flask (main.py, main_render_webhook.py).
+Les requêtes sans le bon jeton secret ou trop volumineuses sont rejetées avant
+toute lecture du corps. Le corps est décodé avec json_codec et les réponses
+statiques sont sérialisées une seule fois.
+"""
+
+import hmac
+import logging
+from typing import Any, Dict, Optional
+
+from flask import Response, request
+
+import json_codec
+import metrics
+from flight_recorder import DEBUG_TOKEN_HEADER, recorder, token_matches
+from timeseries import TimeSeriesStore
+
+logger = logging.getLogger(__name__)
+
+_OK_BODY = json_codec.dumps({"status": "ok"})
+
+
+def ok_response() -> Response:
+    """Réponse {"status": "ok"} pré-sérialisée."""
+    return Response(_OK_BODY, status=200, mimetype='application/json')
+
+
+def reject_request(secret_token: Optional[str], max_body_bytes: int) -> Optional[Response]:
+    """Contrôle l'en-tête secret et la taille annoncée ; retourne la réponse de rejet ou None.
+    Aucun log par rejet (un scan ne doit pas remplir les journaux) : seuls les compteurs bougent.
+    """
+    if secret_token:
+        received = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if not hmac.compare_digest(received.encode(), secret_token.encode()):
+            metrics.incr('webhook_rejected_secret')
+            return Response(status=403)
+
+    length = request.content_length
+    if length is None:
+        metrics.incr('webhook_rejected_length')
+        return Response(status=411)
+    if length > max_body_bytes:
+        metrics.incr('webhook_rejected_size')
+        return Response(status=413)
+    return None
+
+
+def json_response(payload: Any, status: int = 200) -> Response:
+    return Response(json_codec.dumps(payload), status=status, mimetype='application/json')
+
+
+def read_update() -> Optional[Dict]:
+    """Décode l'update Telegram de la requête courante (None si absente ou non JSON)."""
+    if not request.is_json:
+        logger.warning("⚠️ Requête non-JSON reçue")
+        return None
+
+    body = request.get_data(cache=False)
+    if not body:
+        logger.warning("⚠️ Update vide reçu")
+        return None
+
+    update = json_codec.loads(body)
+    if not update:
+        logger.warning("⚠️ Update vide reçu")
+        return None
+    return update
+
+
+def traces_response(secret_token: Optional[str]) -> Response:
+    """Traces de l'enregistreur de vol (?lentes=1 : lentes ou en erreur), si l'en-tête X-Debug-Token
+    porte le jeton secret du webhook."""
+    if not token_matches(request.headers.get(DEBUG_TOKEN_HEADER), secret_token):
+        metrics.incr('debug_rejected_token')
+        return Response(status=403)
+    return json_response(recorder.dump(slow_only=request.args.get('lentes') == '1'))
+
+
+def timeseries_response(secret_token: Optional[str], store: TimeSeriesStore) -> Response:
+    """Séries temporelles (?resolution=minute|hour|day, ?series=préfixe, ?count=cases) pour les tableaux
+    de bord, si l'en-tête X-Debug-Token porte le jeton secret du webhook."""
+    if not token_matches(request.headers.get(DEBUG_TOKEN_HEADER), secret_token):
+        metrics.incr('debug_rejected_token')
+        return Response(status=403)
+    try:
+        count = request.args.get('count', type=int)
+        return json_response(store.query(request.args.get('resolution', 'hour'), request.args.get('series', ''),
+                                         count))
+    except ValueError as e:
+        return json_response({'error': str(e)}, status=400)